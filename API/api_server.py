@@ -1,24 +1,99 @@
 # API/api_server.py
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, has_request_context, request, jsonify, stream_with_context
+from werkzeug.local import LocalProxy
+import functools
+import json
 import logging
+import math
 import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
 from dotenv import load_dotenv
 
 # Carrega as variáveis de ambiente
 load_dotenv()
 
 # Importa os módulos essenciais
-from API.trader import Trader
+from API.trader import SIMULADOR_ATIVO, Trader
+from API.tenants import (ID_VALIDO, TENANT_PADRAO, PoolTenants, SessaoTenant, TenantDesconhecido,
+                         TenantEmOutroShard, carregar_tenants, garantir_gateway)
 from API.gerenciamento import GerenciadorMultiConta
+from API.risco import MotorRisco
+from API.ordens import FilaOrdens
+from API.idempotencia import CacheIdempotencia, chave_do_sinal
+from API.limitador import BrokerSobrecarregado, PRIORIDADE_ORDEM
+from API.indicadores import CalculadoraIndicadores, interpretar_indicador, serializar
+from API.serializacao import codificar, colunar, comprimir, negociar, tipos_disponiveis
+from API.logs import AMOSTRAR, configurar_logs
+from API.metricas import ETAPAS_TRADE, REQUISICOES_HTTP, metricas
 
-# Configuração básica de logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Logs fora do caminho da requisição: fila em memória + thread que grava JSON lines em logs/
+configurar_logs()
 
 app = Flask(__name__)
 
+# Lote de trades: limite de sinais por requisição e de ordens simultâneas no broker
+LOTE_MAX_SINAIS = int(os.getenv('BATCH_MAX_SIGNALS', '50') or '50')
+executor_lote = ThreadPoolExecutor(max_workers=int(os.getenv('BATCH_MAX_WORKERS', '20') or '20'))
+
+# Candles em lote (/get_candles/bulk): itens por requisição e buscas simultâneas (pool compartilhado)
+CANDLES_LOTE_MAX_ITENS = int(os.getenv('CANDLES_BULK_MAX_ITEMS', '50') or '50')
+executor_candles = ThreadPoolExecutor(max_workers=int(os.getenv('CANDLES_BULK_MAX_WORKERS', '8') or '8'))
+
+# Respostas de candles: gzip acima deste tamanho (bytes) quando o cliente aceita; -1 desativa
+CANDLES_GZIP_MIN_BYTES = int(os.getenv('CANDLES_GZIP_MIN_BYTES', '1024') or '1024')
+
+# Stream SSE: cada cliente ocupa uma thread do worker enquanto está conectado; acima do limite responde 503
+STREAM_MAX_CLIENTES = int(os.getenv('STREAM_MAX_CLIENTS', '4') or '0')
+vagas_stream = threading.BoundedSemaphore(STREAM_MAX_CLIENTES) if STREAM_MAX_CLIENTES > 0 else None
+
+# Indicadores (/indicators): ativos por requisição e séries com estado incremental em memória
+INDICADORES_MAX_ATIVOS = int(os.getenv('INDICATORS_MAX_ASSETS', '50') or '50')
+calculadora_indicadores = CalculadoraIndicadores(max_series=int(os.getenv('INDICATORS_CACHE_SERIES', '256') or '256'))
+
+# Multi-tenant: cada tenant tem login, gerenciamento e limites de risco próprios (API/tenants.py)
+TENANTS_FILE = os.getenv('TENANTS_FILE', '')
+TENANT_GATEWAY_DIR = os.getenv('TENANT_GATEWAY_DIR', '/tmp/bot-trader-tenants')
+TENANT_GATEWAY_IDLE_SECONDS = float(os.getenv('TENANT_GATEWAY_IDLE_SECONDS', '900') or '900')
+# conta do .env (requisições sem tenant); sem ela, com TENANTS_FILE, o tenant passa a ser obrigatório
+PADRAO_CONFIGURADO = bool(os.getenv('IQ_EMAIL') or SIMULADOR_ATIVO)
+
+def _criar_sessao(tenant, trader_tenant):
+    """Gerenciamento e limites de risco de um tenant, ligados à liquidação das ordens do Trader dele."""
+    # estatísticas no SQLite do histórico: iguais em todos os workers e preservadas quando a sessão é descartada
+    caminho_estado = os.getenv('HISTORY_DB_PATH', 'logs/historico.db') or None
+    gerenciador = GerenciadorMultiConta(config_gerenciamento, caminho=caminho_estado, tenant=tenant)
+    # cada trade liquidado atualiza as estatísticas da conta
+    trader_tenant.ao_liquidar.append(lambda conta, lucro, ordem: gerenciador.registrar_resultado(conta, lucro))
+
+    # Limites de risco pré-trade (0 = sem limite); kill switch, exposição e perda do dia ficam no
+    # SQLite do histórico, compartilhados pelos workers e preservados quando a sessão do tenant é descartada
+    risco = MotorRisco({
+        'max_exposicao_percentual': float(os.getenv('RISK_MAX_EXPOSURE_PERCENT', 0) or 0),
+        'max_posicoes': int(os.getenv('RISK_MAX_OPEN_POSITIONS', 0) or 0),
+        'max_posicoes_por_ativo': int(os.getenv('RISK_MAX_POSITIONS_PER_ASSET', 0) or 0),
+        'max_perda_diaria': float(os.getenv('RISK_MAX_DAILY_LOSS', 0) or 0)
+    }, caminho=caminho_estado, tenant=tenant)
+    trader_tenant.ao_liquidar.append(lambda conta, lucro, ordem: risco.liquidar(ordem['order_id'], lucro))
+    return SessaoTenant(tenant, trader_tenant, gerenciador, risco)
+
+def _abrir_sessao_tenant(tenant, credenciais):
+    """Sobe (ou reaproveita) o gateway do tenant e cria o Trader dele, com os dados de mercado da sessão padrão."""
+    socket_gateway = garantir_gateway(tenant, credenciais, TENANT_GATEWAY_DIR, max_ocioso=TENANT_GATEWAY_IDLE_SECONDS)
+    caminho_historico = os.getenv('HISTORY_DB_PATH', 'logs/historico.db')
+    if caminho_historico:
+        caminho_historico = os.path.join(os.path.dirname(caminho_historico), f"historico-{tenant}.db")
+    trader_tenant = Trader(tenant=tenant, gateway_socket=socket_gateway, caminho_historico=caminho_historico,
+                           dados_mercado=sessao_padrao.trader)
+    # a primeira requisição do tenant espera o login como um trade espera uma reconexão
+    trader_tenant.pronto.wait(trader_tenant.espera_reconexao)
+    return _criar_sessao(tenant, trader_tenant)
+
 # --- Inicialização dos Componentes ---
 try:
-    trader = Trader()
     # Configuração de gerenciamento: valores percentuais
     config_gerenciamento = {
         'entrada_padrao': float(os.getenv('ENTRY_PERCENTAGE', 3.0)),  # % padrão da banca
@@ -26,18 +101,61 @@ try:
     }
     
     # Log das configurações carregadas
-    logging.info(f"Configurações carregadas:")
-    logging.info(f"  - ENTRY_PERCENTAGE: {os.getenv('ENTRY_PERCENTAGE', 3.0)}%")
-    logging.info(f"  - GERENCIAMENTO_PERCENT (limite): {os.getenv('GERENCIAMENTO_PERCENT', 5.0)}%")
+    logging.info("Configurações carregadas:")
+    logging.info("  - ENTRY_PERCENTAGE: %s%%", os.getenv('ENTRY_PERCENTAGE', 3.0))
+    logging.info("  - GERENCIAMENTO_PERCENT (limite): %s%%", os.getenv('GERENCIAMENTO_PERCENT', 5.0))
     
-    # Inicializa o gerenciador multi-conta
-    gerenciador_multi = GerenciadorMultiConta(config_gerenciamento)
+    sessao_padrao = _criar_sessao(TENANT_PADRAO, Trader())
+    pool_tenants = PoolTenants(
+        _abrir_sessao_tenant,
+        carregar_tenants(TENANTS_FILE) if TENANTS_FILE else {},
+        padrao=sessao_padrao,
+        shard=int(os.getenv('TENANT_SHARD', '0') or '0'),
+        shards=int(os.getenv('TENANT_SHARDS', '1') or '1'),
+        max_sessoes=int(os.getenv('TENANT_MAX_SESSIONS', '100') or '100')
+    )
+    if pool_tenants.credenciais:
+        logging.info("  - Tenants: %s configurados (shard %s de 0..%s)",
+                     len(pool_tenants.credenciais), pool_tenants.shard, pool_tenants.shards - 1)
+    ORDENS_BLOQUEADAS_RISCO = metricas.contador(
+        'bot_ordens_bloqueadas_risco_total', 'Ordens recusadas pelos limites de risco ou kill switch', ('conta',))
     
     logging.info("Bot Trader iniciado com sucesso!")
 
 except Exception as e:
-    logging.critical(f"ERRO CRÍTICO DURANTE A INICIALIZAÇÃO: {e}")
-    exit()
+    # falha de configuração: propaga em vez de exit() para o processo não reimportar o módulo em loop
+    logging.critical("ERRO CRÍTICO DURANTE A INICIALIZAÇÃO: %s", e)
+    raise
+
+# Sessão da requisição: resolvida no before_request; threads dos pools recebem a dela via _com_sessao
+_sessao_contexto = ContextVar('sessao_tenant', default=None)
+
+def _sessao_atual():
+    sessao = _sessao_contexto.get()
+    if sessao is None and has_request_context():
+        sessao = g.get('sessao_tenant')
+    return sessao or sessao_padrao
+
+def _com_sessao(funcao, sessao=None):
+    """Executa `funcao` com a sessão do tenant atual (ou `sessao`) em outra thread."""
+    sessao = sessao or _sessao_atual()
+    def executar(*args):
+        token = _sessao_contexto.set(sessao)
+        try:
+            return funcao(*args)
+        finally:
+            _sessao_contexto.reset(token)
+    return executar
+
+trader = LocalProxy(lambda: _sessao_atual().trader)
+gerenciador_multi = LocalProxy(lambda: _sessao_atual().gerenciador)
+motor_risco = LocalProxy(lambda: _sessao_atual().motor_risco)
+
+def _resposta_sobrecarga(erro):
+    """429 com Retry-After quando o limitador descarta uma leitura para preservar o orçamento das ordens."""
+    resposta = jsonify({"status": "erro", "mensagem": str(erro)})
+    resposta.headers['Retry-After'] = str(max(1, math.ceil(erro.retry_after)))
+    return resposta, 429
 
 # --- Endpoints Essenciais ---
 @app.route('/profile', methods=['GET'])
@@ -46,14 +164,17 @@ def rota_get_profile():
     try:
         tipo_conta = request.args.get('tipo_conta', 'PRACTICE')
 
-        if not trader.selecionar_conta(tipo_conta):
-            return jsonify({"status": "erro", "mensagem": "Falha ao selecionar conta"}), 400
-        moeda = trader.get_moeda_conta()
+        estado = trader.get_estado_conta(tipo_conta)
+        if not estado:
+            return jsonify({"status": "erro", "mensagem": "Falha ao consultar conta"}), 400
+        moeda = estado['moeda']
         return jsonify({
             "status": "sucesso",
             "conta": tipo_conta.upper(),
             "moeda": moeda
         })
+    except BrokerSobrecarregado as e:
+        return _resposta_sobrecarga(e)
     except Exception as e:
         return jsonify({"status": "erro", "mensagem": str(e)}), 500
 
@@ -62,11 +183,12 @@ def rota_get_saldo():
     """Consulta saldo da conta."""
     try:
         tipo_conta = request.args.get('tipo_conta', 'PRACTICE')
-        if not trader.selecionar_conta(tipo_conta):
-            return jsonify({"status": "erro", "mensagem": "Falha ao selecionar conta"}), 400
-        moeda = trader.get_moeda_conta()
-        saldo = trader.get_saldo()
-        logging.info(f"Consulta de saldo para conta {tipo_conta} ({moeda})")
+        estado = trader.get_estado_conta(tipo_conta)
+        if not estado:
+            return jsonify({"status": "erro", "mensagem": "Falha ao consultar conta"}), 400
+        moeda = estado['moeda']
+        saldo = estado['saldo']
+        logging.info("Consulta de saldo para conta %s (%s)", tipo_conta, moeda, extra=AMOSTRAR)
         
         return jsonify({
             "status": "sucesso", 
@@ -75,9 +197,31 @@ def rota_get_saldo():
             "moeda": moeda,
             "mensagem": f"Saldo atual na conta {tipo_conta.upper()}: {moeda} {saldo}"
         })
+    except BrokerSobrecarregado as e:
+        return _resposta_sobrecarga(e)
     except Exception as e:
         return jsonify({"status": "erro", "mensagem": str(e)}), 500
 
+def _formato_colunar(dados):
+    """formato=colunar (corpo ou query string) pede arrays paralelos em vez de um dict por candle."""
+    formato = request.args.get('formato') or (dados.get('formato') if isinstance(dados, dict) else None)
+    return str(formato or '').lower() == 'colunar'
+
+def _resposta_candles(corpo):
+    """Serializa no tipo negociado pelo Accept (JSON ou MessagePack) e comprime com gzip se o cliente aceitar."""
+    tipo = negociar(request.accept_mimetypes)
+    if tipo is None:
+        return jsonify({"status": "erro", "mensagem": f"Formatos disponíveis: {', '.join(tipos_disponiveis())}"}), 406
+    conteudo = codificar(corpo, tipo)
+    comprimido = False
+    if request.accept_encodings['gzip']:
+        conteudo, comprimido = comprimir(conteudo, CANDLES_GZIP_MIN_BYTES)
+    resposta = Response(conteudo, mimetype=tipo)
+    if comprimido:
+        resposta.headers['Content-Encoding'] = 'gzip'
+    resposta.vary.update(('Accept', 'Accept-Encoding'))
+    return resposta
+
 @app.route('/get_candles', methods=['POST'])
 def rota_get_candles():
     """Busca candles de um ativo."""
@@ -88,135 +232,677 @@ def rota_get_candles():
         if not dados or 'ativo' not in dados or 'timeframe' not in dados or 'quantidade' not in dados:
             return jsonify({"status": "erro", "mensagem": "Campos obrigatórios: ativo, timeframe, quantidade"}), 400
         
-        velas = trader.get_candles(dados['ativo'], dados['timeframe'], dados['quantidade'])
+        fim = dados.get('fim')
+        velas = trader.get_candles(dados['ativo'], dados['timeframe'], dados['quantidade'],
+                                   float(fim) if fim is not None else None)
         
         if not velas:
             return jsonify({"status": "erro", "mensagem": "Não foi possível buscar velas"}), 404
         
-        return jsonify({
+        if _formato_colunar(dados):
+            return _resposta_candles({"status": "sucesso", "formato": "colunar", "velas": colunar(velas)})
+        return _resposta_candles({
             "status": "sucesso", 
             "velas": velas
         })
+    except BrokerSobrecarregado as e:
+        return _resposta_sobrecarga(e)
     except Exception as e:
         return jsonify({"status": "erro", "mensagem": str(e)}), 500
 
-@app.route('/trade', methods=['POST'])
-def rota_de_trade():
-    """Executa uma operação de trade. O valor de entrada é sempre calculado como porcentagem do saldo atual, conforme informado no input HTTP."""
+def _buscar_velas(item):
+    """Busca um item (ativo, timeframe, quantidade); retorna (velas, None) ou (None, mensagem)."""
+    ativo, timeframe, quantidade = item
     try:
-        sinal = request.get_json()
-        
-        # Validações básicas
-        if not sinal or 'ativo' not in sinal or ('acao' not in sinal and 'call' not in sinal and 'put' not in sinal) or 'duracao' not in sinal:
-            return jsonify({"status": "erro", "mensagem": "Campos obrigatórios: ativo, acao/call/put, duracao"}), 400
-        
-        tipo_conta = sinal.get('tipo_conta', 'PRACTICE')
-        # aceita percentuais como: percent_banca, percent, valor_entrada (em % da banca)
-        percent_param = (
-            sinal.get('percent_banca', None)
-            if sinal.get('percent_banca', None) is not None else
-            sinal.get('percent', None)
-            if sinal.get('percent', None) is not None else
-            sinal.get('valor_entrada', None)
-        )
+        velas = trader.get_candles(ativo, timeframe, quantidade)
+    except BrokerSobrecarregado as e:
+        return None, str(e)
+    if not velas:
+        return None, "Não foi possível buscar velas"
+    return velas, None
 
-        # Seleciona a conta
-        if not trader.selecionar_conta(tipo_conta):
-            return jsonify({"status": "erro", "mensagem": "Falha ao selecionar conta"}), 400
-        moeda = trader.get_moeda_conta()
-        saldo_anterior = trader.get_saldo()
-        logging.info(f"Iniciando trade na conta {tipo_conta} ({moeda}) com saldo de {saldo_anterior} e percentual solicitado: {percent_param}")
-        
-        # Validação de saldo
-        if saldo_anterior <= 0:
-            return jsonify({
-                "status": "erro", 
-                "mensagem": f"Saldo insuficiente na conta {tipo_conta}. Saldo atual: {moeda} {saldo_anterior}"
-            }), 400
-        
-        # Define valor do investimento pela porcentagem da banca
-        if percent_param is not None:
+def _buscar_velas_em_paralelo(itens):
+    """Busca os itens no pool limitado de candles; itens repetidos vão ao broker uma única vez."""
+    unicos = list(dict.fromkeys(itens))
+    return dict(zip(unicos, executor_candles.map(_com_sessao(_buscar_velas), unicos)))
+
+@app.route('/get_candles/bulk', methods=['POST'])
+def rota_get_candles_lote():
+    """Busca candles de vários ativos/timeframes numa requisição; erro em um item não derruba os demais."""
+    try:
+        dados = request.get_json(silent=True)
+        itens = dados.get('itens') if isinstance(dados, dict) else dados
+        if not isinstance(itens, list) or not itens:
+            return jsonify({"status": "erro", "mensagem": "Envie uma lista de itens em 'itens'"}), 400
+        if len(itens) > CANDLES_LOTE_MAX_ITENS:
+            return jsonify({"status": "erro", "mensagem": f"Máximo de {CANDLES_LOTE_MAX_ITENS} itens por requisição"}), 400
+        # timeframe/quantidade do corpo valem para os itens que não os informam
+        padrao = {k: dados[k] for k in ('timeframe', 'quantidade') if isinstance(dados, dict) and k in dados}
+
+        resultados = [None] * len(itens)
+        validos = {}
+        for indice, item in enumerate(itens):
+            if isinstance(item, str):
+                item = {'ativo': item}
             try:
-                percent_value = float(percent_param)
-            except (TypeError, ValueError):
-                return jsonify({"status": "erro", "mensagem": "Percentual inválido."}), 400
-            valor_investido = gerenciador_multi.get_proxima_entrada(tipo_conta, saldo_anterior, percent_value)
-        else:
-            valor_investido = gerenciador_multi.get_proxima_entrada(tipo_conta, saldo_anterior)
-
-        # Determina a ação (call/put)
-        # Normaliza ação: aceita call/put, buy/sell, compra/venda
-        acao_raw = sinal.get('acao', sinal.get('action', sinal.get('call', sinal.get('put'))))
-        acao_map = {
-            'call': 'call', 'buy': 'call', 'comprar': 'call', 'compra': 'call',
-            'put': 'put', 'sell': 'put', 'vender': 'put', 'venda': 'put'
+                item = {**padrao, **item}
+                chave = (str(item['ativo']), int(item['timeframe']), int(item['quantidade']))
+            except (KeyError, TypeError, ValueError):
+                resultados[indice] = {"indice": indice, "status": "erro",
+                                      "mensagem": "Campos obrigatórios: ativo, timeframe, quantidade"}
+                continue
+            if chave[1] <= 0 or chave[2] <= 0:
+                resultados[indice] = {"indice": indice, "status": "erro",
+                                      "mensagem": "timeframe e quantidade devem ser maiores que zero"}
+                continue
+            validos[indice] = chave
+
+        buscados = _buscar_velas_em_paralelo(validos.values())
+        em_colunas = _formato_colunar(dados)
+        for indice, chave in validos.items():
+            velas, erro = buscados[chave]
+            resultado = {"indice": indice, "ativo": chave[0], "timeframe": chave[1], "quantidade": chave[2]}
+            if erro:
+                resultado.update({"status": "erro", "mensagem": erro})
+            else:
+                resultado.update({"status": "sucesso", "velas": colunar(velas) if em_colunas else velas})
+            resultados[indice] = resultado
+
+        sucesso = sum(1 for r in resultados if r['status'] == 'sucesso')
+        corpo = {
+            "status": "sucesso" if sucesso else "erro",
+            "total": len(itens),
+            "sucesso": sucesso,
+            "resultados": resultados
         }
-        acao_key = str(acao_raw).strip().lower() if acao_raw is not None else None
-        acao = acao_map.get(acao_key)
-        if acao not in ['call', 'put']:
-            return jsonify({"status": "erro", "mensagem": "Ação deve ser compra/venda (buy/sell) ou call/put"}), 400
-        
-        # Executa a ordem
+        if em_colunas:
+            corpo["formato"] = "colunar"
+        return _resposta_candles(corpo)
+    except Exception as e:
+        logging.error("Erro na rota /get_candles/bulk: %s", e, exc_info=True)
+        return jsonify({"status": "erro", "mensagem": str(e)}), 500
+
+@app.route('/get_candles/cache', methods=['GET'])
+def rota_get_cache_candles():
+    """Contadores do cache de candles e do histórico em disco."""
+    armazem = trader.armazem_candles.estatisticas() if trader.armazem_candles else None
+    return jsonify({"status": "sucesso", "cache": trader.cache_candles.estatisticas(), "armazem": armazem})
+
+@app.route('/indicators', methods=['POST'])
+def rota_indicadores():
+    """Calcula indicadores técnicos (sma, ema, rsi, bollinger, macd, atr) sobre os candles de vários ativos."""
+    dados = request.get_json(silent=True)
+    if not isinstance(dados, dict):
+        return jsonify({"status": "erro", "mensagem": "Envie um JSON com ativos e indicadores"}), 400
+    ativos = dados.get('ativos') or ([dados['ativo']] if dados.get('ativo') else None)
+    if not isinstance(ativos, list) or not ativos:
+        return jsonify({"status": "erro", "mensagem": "Informe 'ativos' (lista) ou 'ativo'"}), 400
+    ativos = list(dict.fromkeys(str(a) for a in ativos))
+    if len(ativos) > INDICADORES_MAX_ATIVOS:
+        return jsonify({"status": "erro", "mensagem": f"Máximo de {INDICADORES_MAX_ATIVOS} ativos por requisição"}), 400
+    especificacoes = dados.get('indicadores')
+    if not isinstance(especificacoes, list) or not especificacoes:
+        return jsonify({"status": "erro", "mensagem": "Informe 'indicadores', ex.: [\"ema:9\", \"rsi:14\", \"bollinger:20:2\"]"}), 400
+    try:
+        indicadores = list({i.chave: i for i in map(interpretar_indicador, especificacoes)}.values())
+        timeframe = int(dados.get('timeframe', 1))
+        quantidade = int(dados.get('quantidade', 200))
+        pontos = int(dados.get('pontos', 1))
+    except (TypeError, ValueError) as e:
+        return jsonify({"status": "erro", "mensagem": str(e)}), 400
+    if timeframe <= 0 or not 1 <= quantidade <= trader.cache_candles.max_candles or not 1 <= pontos <= quantidade:
+        return jsonify({"status": "erro", "mensagem": f"Use timeframe > 0, quantidade entre 1 e {trader.cache_candles.max_candles} "
+                                                      f"e pontos entre 1 e quantidade"}), 400
+
+    resultados, erros = {}, {}
+    # candles vêm do cache (só o que mudou vai ao broker); os indicadores só recalculam a cauda
+    buscados = _buscar_velas_em_paralelo([(ativo, timeframe, quantidade) for ativo in ativos])
+    for (ativo, _, _), (velas, erro) in buscados.items():
+        if erro:
+            erros[ativo] = erro
+            continue
+        saida = calculadora_indicadores.calcular(ativo, timeframe, velas, indicadores)
+        resultados[ativo] = serializar(saida, pontos)
+    if not resultados:
+        return jsonify({"status": "erro", "mensagem": "Nenhum ativo pôde ser calculado", "erros": erros}), 404
+    return jsonify({"status": "sucesso", "timeframe": timeframe, "resultados": resultados, "erros": erros})
+
+@app.route('/stream/candles', methods=['GET'])
+def rota_stream_candles():
+    """Stream (Server-Sent Events) dos candles fechados de um ativo."""
+    ativo = request.args.get('ativo')
+    timeframe = request.args.get('timeframe', type=int)
+    if not ativo or not timeframe:
+        return jsonify({"status": "erro", "mensagem": "Parâmetros obrigatórios: ativo, timeframe"}), 400
+    if vagas_stream is not None and not vagas_stream.acquire(blocking=False):
+        resposta = jsonify({"status": "erro", "mensagem": f"Limite de {STREAM_MAX_CLIENTES} clientes de stream atingido"})
+        resposta.headers['Retry-After'] = '30'
+        return resposta, 503
+    distribuidor = trader.stream_candles
+    try:
+        fila = distribuidor.assinar(ativo, timeframe)
+    except Exception as e:
+        if vagas_stream is not None:
+            vagas_stream.release()
+        return jsonify({"status": "erro", "mensagem": f"Não foi possível assinar candles: {e}"}), 503
+
+    def eventos():
+        yield ": conectado\n\n"
+        while True:
+            try:
+                vela = fila.get(timeout=15)
+            except queue.Empty:
+                yield ": keepalive\n\n"
+                continue
+            yield f"event: candle\ndata: {json.dumps(vela)}\n\n"
+
+    def encerrar():
+        # chamado ao fechar a resposta, mesmo que o gerador nunca tenha começado
+        distribuidor.cancelar(ativo, timeframe, fila)
+        if vagas_stream is not None:
+            vagas_stream.release()
+
+    resposta = Response(
+        stream_with_context(eventos()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    resposta.call_on_close(encerrar)
+    return resposta
+
+# Normaliza ação: aceita call/put, buy/sell, compra/venda
+ACAO_MAP = {
+    'call': 'call', 'buy': 'call', 'comprar': 'call', 'compra': 'call',
+    'put': 'put', 'sell': 'put', 'vender': 'put', 'venda': 'put'
+}
+
+def _interpretar_sinal(sinal):
+    """Valida e normaliza um sinal de trade. Retorna (ordem, mensagem_de_erro)."""
+    if not isinstance(sinal, dict) or 'ativo' not in sinal or ('acao' not in sinal and 'call' not in sinal and 'put' not in sinal) or 'duracao' not in sinal:
+        return None, "Campos obrigatórios: ativo, acao/call/put, duracao"
+
+    tipo_conta = str(sinal.get('tipo_conta', 'PRACTICE'))
+    if tipo_conta.upper() not in ('REAL', 'PRACTICE'):
+        return None, "Tipo de conta inválido (use REAL ou PRACTICE)"
+
+    # aceita percentuais como: percent_banca, percent, valor_entrada (em % da banca)
+    percent_param = (
+        sinal.get('percent_banca', None)
+        if sinal.get('percent_banca', None) is not None else
+        sinal.get('percent', None)
+        if sinal.get('percent', None) is not None else
+        sinal.get('valor_entrada', None)
+    )
+    if percent_param is not None:
+        try:
+            percent_param = float(percent_param)
+        except (TypeError, ValueError):
+            return None, "Percentual inválido."
+
+    acao_raw = sinal.get('acao', sinal.get('action', sinal.get('call', sinal.get('put'))))
+    acao_key = str(acao_raw).strip().lower() if acao_raw is not None else None
+    acao = ACAO_MAP.get(acao_key)
+    if acao not in ['call', 'put']:
+        return None, "Ação deve ser compra/venda (buy/sell) ou call/put"
+
+    try:
+        duracao = int(sinal['duracao'])
+    except (TypeError, ValueError):
+        return None, "Duração inválida."
+
+    # ativo fechado ou inexistente é recusado aqui, sem ida ao broker
+    ativo_ok, erro_ativo = trader.catalogo.verificar(sinal['ativo'], duracao)
+    if not ativo_ok:
+        return None, erro_ativo
+
+    return {
+        'ativo': sinal['ativo'],
+        'acao': acao,
+        'duracao': duracao,
+        'tipo_conta': tipo_conta,
+        'percentual': percent_param
+    }, None
+
+def _executar_ordem(ordem):
+    """Dimensiona pela banca e envia uma ordem já validada. Retorna (trade_info, erro, status_http)."""
+    tipo_conta = ordem['tipo_conta']
+    # durante uma reconexão espera a sessão voltar (RECONNECT_TRADE_WAIT_SECONDS) antes de recusar
+    if not trader.aguardar_conexao():
+        return None, "Conexão com o broker ainda não está pronta", 503
+
+    # saldo e moeda vêm do cache de contas (sem round-trip ao broker no caminho quente)
+    try:
+        with ETAPAS_TRADE.medir('estado_conta'):
+            estado = trader.get_estado_conta(tipo_conta, prioridade=PRIORIDADE_ORDEM)
+    except BrokerSobrecarregado as e:
+        return None, str(e), 503
+    if not estado:
+        return None, "Falha ao consultar saldo da conta", 503
+    moeda = estado['moeda']
+    saldo_anterior = estado['saldo']
+    logging.info("Iniciando trade na conta %s (%s) com saldo de %s e percentual solicitado: %s",
+                 tipo_conta, moeda, saldo_anterior, ordem['percentual'])
+
+    # Validação de saldo
+    if saldo_anterior <= 0:
+        return None, f"Saldo insuficiente na conta {tipo_conta}. Saldo atual: {moeda} {saldo_anterior}", 400
+
+    # Define valor do investimento pela porcentagem da banca
+    with ETAPAS_TRADE.medir('dimensionar'):
+        valor_investido = gerenciador_multi.get_proxima_entrada(tipo_conta, saldo_anterior, ordem['percentual'])
+
+    # Limites de risco: reserva a exposição antes de enviar
+    with ETAPAS_TRADE.medir('risco'):
+        reserva, motivo_risco = motor_risco.reservar(
+            tipo_conta, ordem['ativo'], valor_investido, saldo_anterior, ordem['duracao']
+        )
+    if reserva is None:
+        ORDENS_BLOQUEADAS_RISCO.inc(tipo_conta)
+        return None, motivo_risco, 403
+
+    # Executa a ordem
+    with ETAPAS_TRADE.medir('comprar'):
         check, order_id = trader.comprar_ativo(
-            sinal['ativo'], valor_investido, acao, int(sinal['duracao'])
+            ordem['ativo'], valor_investido, ordem['acao'], ordem['duracao'], tipo_conta
         )
-        
-        if not check:
-            return jsonify({"status": "erro", "mensagem": "Ordem rejeitada na Binária"}), 500
+    if check:
+        motor_risco.confirmar(reserva, order_id)
+    else:
+        motor_risco.cancelar(reserva)
+    trade_info = {
+        "ativo": ordem['ativo'],
+        "acao": ordem['acao'],
+        "duracao": ordem['duracao'],
+        "tipo_conta": tipo_conta,
+        "valor_investido": valor_investido,
+        "saldo_anterior": saldo_anterior,
+        "order_id": order_id
+    }
+    if not check:
+        return trade_info, "Ordem rejeitada na Binária", 500
+    return trade_info, None, 200
+
+# Fila de ordens para o modo assíncrono (/trade responde 202 e /orders/<id> acompanha)
+TRADE_ASYNC_MODE = os.getenv('TRADE_ASYNC_MODE', 'false').lower() == 'true'
+def _executar_ordem_enfileirada(ordem):
+    """Worker da fila: envia a ordem na sessão do tenant que a enfileirou."""
+    try:
+        sessao = pool_tenants.obter(ordem.get('tenant', TENANT_PADRAO), reter=True)
+    except (TenantDesconhecido, TenantEmOutroShard) as e:
+        return None, str(e)
+    try:
+        return _com_sessao(_executar_ordem, sessao)(ordem)[:2]
+    finally:
+        pool_tenants.soltar(sessao)
+
+fila_ordens = FilaOrdens(
+    _executar_ordem_enfileirada,
+    workers=int(os.getenv('ORDER_WORKERS', '4') or '4'),
+    max_fila=int(os.getenv('ORDER_QUEUE_SIZE', '1000') or '1000'),
+    # status no SQLite do histórico: o /orders/<id> responde em qualquer worker
+    historico=sessao_padrao.trader.historico
+)
+
+# Métricas lidas na hora da coleta (/metrics)
+metricas.medidor('bot_fila_ordens_pendentes', 'Ordens aguardando envio na fila assíncrona', funcao=fila_ordens.pendentes)
+metricas.medidor('bot_broker_tokens', 'Tokens disponíveis no limitador de chamadas ao broker',
+                 funcao=trader.limitador.disponivel)
+metricas.medidor('bot_ordens_abertas', 'Ordens aguardando liquidação', funcao=lambda: trader.ordens_em_aberto())
+metricas.medidor('bot_stream_clientes', 'Clientes conectados ao stream de candles',
+                 funcao=lambda: sum(trader.stream_candles.clientes().values()))
+metricas.medidor('bot_cache_candles_hit_rate', 'Taxa de acerto do cache de candles',
+                 funcao=lambda: trader.cache_candles.estatisticas()['hit_rate'])
+metricas.medidor('bot_tenants_ativos', 'Sessões de tenant abertas neste processo', funcao=lambda: len(pool_tenants))
+
+# com vários workers, cada um grava as métricas em METRICS_DIR e o /metrics de qualquer um responde com o agregado
+METRICAS_DIR = os.getenv('METRICS_DIR', '')
+METRICAS_INTERVALO = float(os.getenv('METRICS_FLUSH_SECONDS', '5') or '5')
+if METRICAS_DIR:
+    metricas.iniciar_gravacao(METRICAS_DIR, METRICAS_INTERVALO)
+
+@app.before_request
+def _iniciar_cronometro():
+    request.inicio_metricas = time.perf_counter()
+
+# rotas de infraestrutura não dependem de tenant
+ROTAS_SEM_TENANT = {'/', '/ping', '/status', '/ready', '/metrics', '/tenants'}
+
+@app.before_request
+def _resolver_tenant():
+    """Tenant da requisição: header X-Tenant-ID, ?tenant= ou campo 'tenant' do JSON (padrão: conta do .env)."""
+    if request.url_rule is None or request.path in ROTAS_SEM_TENANT:
+        return None
+    tenant = request.headers.get('X-Tenant-ID') or request.args.get('tenant')
+    if not tenant:
+        dados = request.get_json(silent=True)
+        tenant = dados.get('tenant') if isinstance(dados, dict) else None
+    tenant = str(tenant or TENANT_PADRAO)
+    if tenant == TENANT_PADRAO and pool_tenants.credenciais and not PADRAO_CONFIGURADO:
+        return jsonify({"status": "erro", "mensagem": "Informe o tenant (header X-Tenant-ID)"}), 400
+    if not ID_VALIDO.match(tenant):
+        return jsonify({"status": "erro", "mensagem": "Tenant inválido"}), 400
+    try:
+        # retida até o fim da requisição: o pool não encerra a sessão no meio dela
+        g.sessao_tenant = pool_tenants.obter(tenant, reter=True)
+    except TenantDesconhecido as e:
+        return jsonify({"status": "erro", "mensagem": str(e)}), 404
+    except TenantEmOutroShard as e:
+        # o balanceador (ou o cliente) reenvia para a instância TENANT_SHARD indicada
+        return jsonify({"status": "erro", "mensagem": str(e), "shard": e.shard}), 421, {'X-Tenant-Shard': str(e.shard)}
+    except Exception as e:
+        logging.error("Erro ao abrir a sessão do tenant %s: %s", tenant, e, exc_info=True)
+        return jsonify({"status": "erro", "mensagem": f"Sessão do tenant {tenant} indisponível: {e}"}), 503
+    return None
+
+@app.teardown_request
+def _soltar_sessao_tenant(_erro=None):
+    sessao = g.pop('sessao_tenant', None)
+    if sessao is not None:
+        pool_tenants.soltar(sessao)
+
+@app.after_request
+def _registrar_requisicao(resposta):
+    inicio = getattr(request, 'inicio_metricas', None)
+    if inicio is not None and request.url_rule is not None:
+        REQUISICOES_HTTP.observar(time.perf_counter() - inicio, request.url_rule.rule, request.method, resposta.status_code)
+    return resposta
+
+# Idempotência: reenvios do mesmo sinal (retries de webhook) recebem o resultado original.
+# As chaves ficam no histórico em SQLite: o retry que cair em outro worker também é reconhecido.
+cache_idempotencia = CacheIdempotencia(
+    ttl=float(os.getenv('IDEMPOTENCY_TTL', '120') or '120'),
+    max_itens=int(os.getenv('IDEMPOTENCY_MAX_KEYS', '10000') or '10000'),
+    historico=sessao_padrao.trader.historico
+)
+IDEMPOTENCIA_DERIVAR_CHAVE = os.getenv('IDEMPOTENCY_DERIVE_KEY', 'false').lower() == 'true'
+SINAIS_DUPLICADOS = metricas.contador(
+    'bot_sinais_duplicados_total', 'Sinais repetidos absorvidos pela chave de idempotência', ('rota', 'estado'))
+
+def idempotente(rota):
+    """
+    Chave: header Idempotency-Key, campo idempotency_key ou (com IDEMPOTENCY_DERIVE_KEY) o conteúdo do sinal.
+    Guarda respostas 2xx e 4xx; 409/429 e erros 5xx são transitórios e o reenvio executa de novo.
+    """
+    @functools.wraps(rota)
+    def envolvida(*args, **kwargs):
+        dados = request.get_json(silent=True)
+        chave = request.headers.get('Idempotency-Key') or (dados.get('idempotency_key') if isinstance(dados, dict) else None)
+        if not chave and IDEMPOTENCIA_DERIVAR_CHAVE:
+            chave = chave_do_sinal(dados)
+        if not chave:
+            return rota(*args, **kwargs)
+
+        chave_cache = f"{_sessao_atual().tenant}|{request.path}|{chave}"
+        estado, resultado = cache_idempotencia.reservar(chave_cache)
+        if estado == 'em_andamento':
+            SINAIS_DUPLICADOS.inc(request.path, estado)
+            return jsonify({
+                "status": "erro",
+                "mensagem": "Sinal duplicado: a ordem original ainda está em processamento",
+                "idempotency_key": chave
+            }), 409
+        if estado == 'concluido':
+            SINAIS_DUPLICADOS.inc(request.path, estado)
+            corpo, status_http, cabecalhos = resultado
+            resposta = app.response_class(corpo, status=status_http, headers=cabecalhos)
+            resposta.headers['Idempotency-Key'] = chave
+            resposta.headers['Idempotent-Replayed'] = 'true'
+            return resposta
+
+        try:
+            resposta = app.make_response(rota(*args, **kwargs))
+        except Exception:
+            cache_idempotencia.liberar(chave_cache)
+            raise
+        if resposta.status_code < 500 and resposta.status_code not in (409, 429):
+            cabecalhos = {k: v for k, v in resposta.headers.items() if k in ('Content-Type', 'Location')}
+            cache_idempotencia.concluir(chave_cache, (resposta.get_data(), resposta.status_code, cabecalhos))
+        else:
+            cache_idempotencia.liberar(chave_cache)
+        resposta.headers['Idempotency-Key'] = chave
+        return resposta
+    return envolvida
+
+@app.route('/trade', methods=['POST'])
+@idempotente
+def rota_de_trade():
+    """Executa uma operação de trade. O valor de entrada é sempre calculado como porcentagem do saldo atual, conforme informado no input HTTP."""
+    try:
+        with ETAPAS_TRADE.medir('interpretar'):
+            sinal = request.get_json()
+            ordem, erro = _interpretar_sinal(sinal)
+        if erro:
+            return jsonify({"status": "erro", "mensagem": erro}), 400
+
+        # Modo assíncrono: enfileira e responde na hora com o id da ordem
+        if sinal.get('async', TRADE_ASYNC_MODE):
+            try:
+                tenant = _sessao_atual().tenant
+                client_order_id = sinal.get('client_order_id')
+                # ids informados pelo cliente são únicos por tenant
+                if client_order_id and tenant != TENANT_PADRAO:
+                    client_order_id = f"{tenant}:{client_order_id}"
+                registro = fila_ordens.enviar({**ordem, 'tenant': tenant}, client_order_id)
+            except queue.Full:
+                return jsonify({"status": "erro", "mensagem": "Fila de ordens cheia, tente novamente"}), 503
+            resposta = jsonify({
+                "status": "sucesso",
+                "mensagem": "Ordem aceita e enfileirada",
+                "ordem": registro
+            })
+            return resposta, 202, {'Location': f"/orders/{registro['id']}"}
+
+        with ETAPAS_TRADE.medir('total'):
+            trade_info, erro, status_http = _executar_ordem(ordem)
+        if erro:
+            return jsonify({"status": "erro", "mensagem": erro}), status_http
 
         # Retorna resposta com informações do trade
+        trade_info['duracao'] = sinal['duracao']
         return jsonify({
             "status": "sucesso",
             "mensagem": "Trade executado com sucesso!",
-            "trade_info": {
-                "ativo": sinal['ativo'],
-                "acao": acao,
-                "duracao": sinal['duracao'],
-                "tipo_conta": tipo_conta,
-                "valor_investido": valor_investido,
-                "saldo_anterior": saldo_anterior,
-                "order_id": order_id
+            "trade_info": trade_info,
+            "saldo_atual": trade_info['saldo_anterior'],
+            "conta": ordem['tipo_conta'].upper()
+        })
+    except Exception as e:
+        logging.error("Erro na rota /trade: %s", e, exc_info=True)
+        return jsonify({"status": "erro", "mensagem": str(e)}), 500
+
+@app.route('/orders/<id_ordem>', methods=['GET'])
+def rota_get_ordem(id_ordem):
+    """Status de uma ordem enviada no modo assíncrono."""
+    tenant = _sessao_atual().tenant
+    registro = fila_ordens.obter(id_ordem)
+    if registro is None and tenant != TENANT_PADRAO:
+        registro = fila_ordens.obter(f"{tenant}:{id_ordem}")
+    if registro is None or registro['ordem'].get('tenant', TENANT_PADRAO) != tenant:
+        return jsonify({"status": "erro", "mensagem": "Ordem não encontrada"}), 404
+    return jsonify({"status": "sucesso", "ordem": registro})
+
+def _executar_ordem_lote(item):
+    """Envia uma ordem do lote e mede a latência até a resposta do broker."""
+    indice, ordem = item
+    inicio = time.perf_counter()
+    try:
+        with ETAPAS_TRADE.medir('comprar'):
+            check, order_id = trader.comprar_ativo(
+                ordem['ativo'], ordem['valor_investido'], ordem['acao'], ordem['duracao'], ordem['tipo_conta']
+            )
+    except Exception as e:
+        check, order_id = False, str(e)
+    if check:
+        motor_risco.confirmar(ordem['reserva'], order_id)
+    else:
+        motor_risco.cancelar(ordem['reserva'])
+    resultado = {
+        "indice": indice,
+        "ativo": ordem['ativo'],
+        "acao": ordem['acao'],
+        "tipo_conta": ordem['tipo_conta'].upper(),
+        "valor_investido": ordem['valor_investido'],
+        "latencia_ms": round((time.perf_counter() - inicio) * 1000, 2)
+    }
+    if check:
+        resultado.update({"status": "sucesso", "order_id": order_id})
+    else:
+        resultado.update({"status": "erro", "mensagem": "Ordem rejeitada na Binária"})
+    return indice, resultado
+
+@app.route('/trade/batch', methods=['POST'])
+@idempotente
+def rota_de_trade_lote():
+    """Executa vários sinais de uma vez: lê cada conta uma única vez e envia as ordens em paralelo."""
+    try:
+        dados = request.get_json()
+        sinais = dados.get('sinais') if isinstance(dados, dict) else dados
+        if not isinstance(sinais, list) or not sinais:
+            return jsonify({"status": "erro", "mensagem": "Envie uma lista de sinais em 'sinais'"}), 400
+        if len(sinais) > LOTE_MAX_SINAIS:
+            return jsonify({"status": "erro", "mensagem": f"Máximo de {LOTE_MAX_SINAIS} sinais por lote"}), 400
+        if not trader.aguardar_conexao():
+            return jsonify({"status": "erro", "mensagem": "Conexão com o broker ainda não está pronta"}), 503
+        padrao = dados if isinstance(dados, dict) else {}
+
+        resultados = [None] * len(sinais)
+        ordens = []
+        contas = {}
+        for indice, sinal in enumerate(sinais):
+            # campos do lote (ex.: tipo_conta, percent) valem para sinais que não os informam
+            if isinstance(sinal, dict):
+                sinal = {**{k: v for k, v in padrao.items() if k != 'sinais'}, **sinal}
+            ordem, erro = _interpretar_sinal(sinal)
+            if erro:
+                resultados[indice] = {"indice": indice, "status": "erro", "mensagem": erro}
+                continue
+
+            # um único snapshot por conta para dimensionar todo o lote
+            conta = ordem['tipo_conta'].upper()
+            if conta not in contas:
+                try:
+                    estado = trader.get_estado_conta(conta, prioridade=PRIORIDADE_ORDEM)
+                except BrokerSobrecarregado:
+                    estado = None
+                contas[conta] = {'estado': estado, 'disponivel': estado['saldo'] if estado else 0}
+            snapshot = contas[conta]
+            if not snapshot['estado'] or snapshot['estado']['saldo'] <= 0:
+                resultados[indice] = {"indice": indice, "status": "erro", "mensagem": f"Saldo indisponível na conta {conta}"}
+                continue
+
+            valor = gerenciador_multi.get_proxima_entrada(conta, snapshot['estado']['saldo'], ordem['percentual'])
+            if valor > snapshot['disponivel']:
+                resultados[indice] = {"indice": indice, "status": "erro", "mensagem": "Saldo insuficiente para este sinal no lote"}
+                continue
+            # banca pelo saldo de antes do lote, como o /trade faz com o saldo lido antes da ordem
+            reserva, motivo_risco = motor_risco.reservar(
+                conta, ordem['ativo'], valor, snapshot['estado']['saldo'], ordem['duracao'])
+            if reserva is None:
+                ORDENS_BLOQUEADAS_RISCO.inc(conta)
+                resultados[indice] = {"indice": indice, "status": "erro", "mensagem": motivo_risco}
+                continue
+            snapshot['disponivel'] -= valor
+            ordem['valor_investido'] = valor
+            ordem['reserva'] = reserva
+            ordens.append((indice, ordem))
+
+        logging.info("Lote recebido: %d sinais, %d ordens válidas", len(sinais), len(ordens))
+        for indice, resultado in executor_lote.map(_com_sessao(_executar_ordem_lote), ordens):
+            resultados[indice] = resultado
+
+        executadas = sum(1 for r in resultados if r['status'] == 'sucesso')
+        return jsonify({
+            "status": "sucesso" if executadas else "erro",
+            "total": len(sinais),
+            "executadas": executadas,
+            "saldos_anteriores": {
+                conta: (s['estado']['saldo'] if s['estado'] else None) for conta, s in contas.items()
             },
-            "saldo_atual": saldo_anterior,
-            "conta": tipo_conta.upper()
+            "resultados": resultados
         })
     except Exception as e:
-        logging.error(f"Erro na rota /trade: {e}", exc_info=True)
+        logging.error("Erro na rota /trade/batch: %s", e, exc_info=True)
         return jsonify({"status": "erro", "mensagem": str(e)}), 500
 
 @app.route('/history', methods=['GET'])
 def rota_get_historico():
-    """Histórico de trades (stub sem persistência)."""
-    return jsonify({"status": "sucesso", "historico": []})
+    """Histórico de trades com filtros e paginação por cursor."""
+    if not trader.historico:
+        return jsonify({"status": "sucesso", "historico": [], "proximo_cursor": None})
+    try:
+        tipo_conta = request.args.get('tipo_conta')
+        limite = min(max(request.args.get('limite', 50, type=int), 1), 500)
+        historico, proximo_cursor = trader.historico.consultar(
+            tipo_conta=tipo_conta.upper() if tipo_conta else None,
+            ativo=request.args.get('ativo'),
+            status=request.args.get('status'),
+            inicio=request.args.get('inicio', type=float),
+            fim=request.args.get('fim', type=float),
+            limite=limite,
+            cursor=request.args.get('cursor', type=int)
+        )
+        return jsonify({"status": "sucesso", "historico": historico, "proximo_cursor": proximo_cursor})
+    except Exception as e:
+        return jsonify({"status": "erro", "mensagem": str(e)}), 500
 
 @app.route('/management', methods=['GET'])
 def rota_get_estado_gerenciador():
-    """Estado do gerenciador (stub)."""
+    """Estatísticas da conta, mantidas incrementalmente a cada trade liquidado."""
     tipo_conta = request.args.get('tipo_conta', 'PRACTICE')
-    if not trader.selecionar_conta(tipo_conta):
-        return jsonify({"status": "erro", "mensagem": "Falha ao selecionar conta"}), 400
-    _ = trader.get_saldo()
+    if tipo_conta.upper() not in ('REAL', 'PRACTICE'):
+        return jsonify({"status": "erro", "mensagem": "Tipo de conta inválido (use REAL ou PRACTICE)"}), 400
+    estado = gerenciador_multi.get_estatisticas(tipo_conta)
+    estado['nivel_atual'] = 1
     return jsonify({
         "status": "sucesso", 
-        "estado": {
-            "total_wins": 0,
-            "total_losses": 0,
-            "nivel_atual": 1,
-            "winrate": 0.0
-        }
+        "conta": tipo_conta.upper(),
+        "estado": estado
     })
 
 @app.route('/management/reset', methods=['POST'])
 def rota_resetar_historico():
-    """Reset de gerenciamento (stub)."""
-    dados = request.get_json() or {}
+    """Zera as estatísticas da conta (o histórico de trades é mantido)."""
+    dados = request.get_json(silent=True) or {}
     tipo_conta = dados.get('tipo_conta', 'PRACTICE')
-    if not trader.selecionar_conta(tipo_conta):
-        return jsonify({"status": "erro", "mensagem": "Falha ao selecionar conta"}), 400
-    _ = trader.get_saldo()
-    return jsonify({"status": "sucesso", "mensagem": f"Gerenciamento resetado para {tipo_conta}."})
+    if tipo_conta.upper() not in ('REAL', 'PRACTICE'):
+        return jsonify({"status": "erro", "mensagem": "Tipo de conta inválido (use REAL ou PRACTICE)"}), 400
+    gerenciador_multi.resetar_estatisticas(tipo_conta)
+    return jsonify({
+        "status": "sucesso",
+        "mensagem": f"Gerenciamento resetado para {tipo_conta.upper()}.",
+        "estado": gerenciador_multi.get_estatisticas(tipo_conta)
+    })
+
+@app.route('/risk', methods=['GET'])
+def rota_get_risco():
+    """Limites, kill switch, exposição aberta e resultado do dia por conta."""
+    return jsonify({"status": "sucesso", **motor_risco.estado()})
+
+@app.route('/risk/limits', methods=['POST'])
+def rota_atualizar_limites_risco():
+    """Altera limites de risco em tempo de execução (0 = sem limite)."""
+    dados = request.get_json(silent=True)
+    if not isinstance(dados, dict) or not dados:
+        return jsonify({"status": "erro", "mensagem": "Informe os limites a alterar"}), 400
+    try:
+        limites = motor_risco.atualizar_limites(**dados)
+    except (TypeError, ValueError) as e:
+        return jsonify({"status": "erro", "mensagem": str(e)}), 400
+    logging.warning("Limites de risco alterados: %s", dados)
+    return jsonify({"status": "sucesso", "limites": limites})
 
-# Endpoint mantido acima: /management/reset (stub)
+@app.route('/risk/kill_switch', methods=['POST'])
+def rota_kill_switch():
+    """Suspende (ativo=true) ou libera (ativo=false) novas ordens, em todas as contas ou em uma."""
+    dados = request.get_json(silent=True) or {}
+    tipo_conta = dados.get('tipo_conta')
+    if tipo_conta and tipo_conta.upper() not in ('REAL', 'PRACTICE'):
+        return jsonify({"status": "erro", "mensagem": "Tipo de conta inválido (use REAL ou PRACTICE)"}), 400
+    if dados.get('ativo', True):
+        motor_risco.ativar_kill_switch(dados.get('motivo'), tipo_conta)
+    else:
+        motor_risco.desativar_kill_switch(tipo_conta)
+    return jsonify({"status": "sucesso", **motor_risco.estado()})
 
 @app.route('/ping', methods=['GET'])
 @app.route('/status', methods=['GET'])
@@ -227,17 +913,50 @@ def rota_de_ping():
         "mensagem": "pong"
     })
 
+@app.route('/assets', methods=['GET'])
+def rota_get_ativos():
+    """Catálogo de ativos (aberto por tipo de opção e payout), servido da memória."""
+    tipo = request.args.get('tipo')
+    if tipo and tipo not in ('turbo', 'binary'):
+        return jsonify({"status": "erro", "mensagem": "Tipo inválido (use turbo ou binary)"}), 400
+    abertos = request.args.get('abertos', 'false').lower() == 'true'
+    ativos = trader.catalogo.listar(apenas_abertos=abertos, tipo=tipo)
+    return jsonify({
+        "status": "sucesso",
+        "total": len(ativos),
+        "idade_segundos": trader.catalogo.idade(),
+        "ativos": ativos
+    })
+
+@app.route('/ready', methods=['GET'])
+def rota_ready():
+    """Prontidão: conectado ao broker e com saldos/moeda já carregados."""
+    if pool_tenants.credenciais and not PADRAO_CONFIGURADO:
+        # só tenants: as sessões abrem sob demanda, o processo está pronto para recebê-las
+        return jsonify({"status": "sucesso", "pronto": True, "tenants": pool_tenants.estado()})
+    estado = trader.status_conexao()
+    return jsonify({"status": "sucesso" if estado['pronto'] else "erro", **estado}), 200 if estado['pronto'] else 503
+
+@app.route('/tenants', methods=['GET'])
+def rota_tenants():
+    """Shard desta instância e sessões de tenant abertas neste processo (sem credenciais)."""
+    return jsonify({"status": "sucesso", **pool_tenants.estado()})
+
+@app.route('/metrics', methods=['GET'])
+def rota_metricas():
+    """Métricas no formato texto do Prometheus (de todos os workers, com METRICS_DIR)."""
+    texto = metricas.exportar(METRICAS_DIR or None, validade=3 * METRICAS_INTERVALO)
+    return Response(texto, mimetype='text/plain; version=0.0.4')
+
 @app.route('/get_saldos', methods=['GET'])
 def rota_get_saldos():
     """Consulta saldo de ambas as contas."""
     try:
-        # Saldo PRACTICE
-        trader.selecionar_conta('PRACTICE')
-        saldo_practice = trader.get_saldo()
-        
-        # Saldo REAL
-        trader.selecionar_conta('REAL')
-        saldo_real = trader.get_saldo()
+        # Ambas as contas vêm do mesmo cache (uma única leitura no broker quando expirado)
+        estado_practice = trader.get_estado_conta('PRACTICE') or {}
+        estado_real = trader.get_estado_conta('REAL') or {}
+        saldo_practice = estado_practice.get('saldo') or 0
+        saldo_real = estado_real.get('saldo') or 0
         
         return jsonify({
             "status": "sucesso",
@@ -253,6 +972,8 @@ def rota_get_saldos():
             },
             "mensagem": f"PRACTICE: ${saldo_practice} | REAL: ${saldo_real}"
         })
+    except BrokerSobrecarregado as e:
+        return _resposta_sobrecarga(e)
     except Exception as e:
         return jsonify({"status": "erro", "mensagem": str(e)}), 500
 
@@ -265,15 +986,25 @@ def api_status():
         "mensagem": "Bot Trader API funcionando",
         "endpoints": {
             "trade": "/trade",
+            "trade_batch": "/trade/batch",
+            "orders": "/orders/<id>",
             "balance": "/balance", 
             "history": "/history",
             "management": "/management",
             "reset_management": "/management/reset",
+            "assets": "/assets",
+            "candles_bulk": "/get_candles/bulk",
+            "indicators": "/indicators",
+            "risk": "/risk",
+            "tenants": "/tenants",
+            "ready": "/ready",
+            "metrics": "/metrics",
             "status": "/status"
         }
     })
 
 if __name__ == "__main__":
+    trader.pronto.wait(60)
     trader.selecionar_conta('REAL')
     banca_real = trader.get_saldo()
     proxima_entrada = gerenciador_multi.get_proxima_entrada('REAL', banca_real)
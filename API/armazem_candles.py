@@ -0,0 +1,246 @@
+# API/armazem_candles.py
+import fcntl
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+# registro de largura fixa (48 bytes); cada arquivo guarda os candles em ordem crescente de 'from'
+REGISTRO = np.dtype([('from', '<i8'), ('open', '<f8'), ('max', '<f8'), ('min', '<f8'), ('close', '<f8'), ('volume', '<i8')])
+
+# a IQ Option devolve no máximo 1000 candles por chamada
+MAX_POR_CHAMADA = 1000
+
+
+def de_velas(velas):
+    """Candles do broker -> registros ordenados por 'from', sem repetidos (vale o último recebido)."""
+    registros = np.array(
+        [(v['from'], v['open'], v['max'], v['min'], v['close'], v.get('volume') or 0) for v in velas or ()],
+        dtype=REGISTRO
+    )
+    if len(registros) > 1:
+        registros = registros[np.argsort(registros['from'], kind='stable')]
+        registros = registros[np.append(registros['from'][1:] != registros['from'][:-1], True)]
+    return registros
+
+
+def para_velas(registros, tamanho):
+    """Registros -> lista de dicts no formato do broker ('to' = 'from' + tamanho do candle)."""
+    colunas = [registros[campo].tolist() for campo in REGISTRO.names]
+    return [
+        {'from': inicio, 'to': inicio + tamanho, 'open': abertura, 'max': maxima, 'min': minima,
+         'close': fechamento, 'volume': volume}
+        for inicio, abertura, maxima, minima, fechamento, volume in zip(*colunas)
+    ]
+
+
+class SerieDisco:
+    """Arquivo de uma série (ativo, timeframe) e o mmap da versão atual dele."""
+    def __init__(self, ativo, timeframe, caminho):
+        self.ativo = ativo
+        self.timeframe = timeframe
+        self.tamanho = timeframe * 60
+        self.caminho = caminho
+        self.lock = threading.Lock()
+        self.inicio_alcancado = False  # o broker não tem candles anteriores ao primeiro gravado
+        self._mapa = (None, np.empty(0, dtype=REGISTRO))
+
+    def registros(self):
+        """Todos os registros gravados, como visão somente leitura do mmap (sem cópia)."""
+        try:
+            info = os.stat(self.caminho)
+        except FileNotFoundError:
+            return np.empty(0, dtype=REGISTRO)
+        total = info.st_size // REGISTRO.itemsize
+        assinatura, mapa = self._mapa
+        if assinatura != (info.st_ino, total):
+            # arquivo cresceu ou foi substituído: mapeia de novo (mapas antigos seguem válidos)
+            mapa = np.memmap(self.caminho, dtype=REGISTRO, mode='r', shape=(total,)) if total else mapa[:0]
+            self._mapa = ((info.st_ino, total), mapa)
+        return mapa
+
+    def gravar_cauda(self, novos):
+        """
+        Sobrescreve o último candle gravado (pode ter sido gravado ainda aberto) e acrescenta os mais novos.
+        O arquivo nunca encolhe, então leitores com o mapa antigo não leem além do fim.
+        """
+        atuais = self.registros()
+        posicao = len(atuais)
+        if posicao:
+            ultimo = atuais['from'][-1]
+            novos = novos[novos['from'] >= ultimo]
+            if len(novos) and novos['from'][0] == ultimo:
+                posicao -= 1
+        if not len(novos):
+            return 0
+        descritor = os.open(self.caminho, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.pwrite(descritor, novos.tobytes(), posicao * REGISTRO.itemsize)
+        finally:
+            os.close(descritor)
+        return len(novos)
+
+    def gravar_inicio(self, antigos):
+        """Insere candles anteriores ao primeiro gravado: grava uma cópia nova e troca o arquivo de uma vez."""
+        atuais = self.registros()
+        if len(atuais):
+            antigos = antigos[antigos['from'] < atuais['from'][0]]
+        if not len(antigos):
+            return 0
+        temporario = f"{self.caminho}.{os.getpid()}.tmp"
+        with open(temporario, 'wb') as arquivo:
+            arquivo.write(antigos.tobytes())
+            arquivo.write(atuais.view(np.uint8))
+        os.replace(temporario, self.caminho)
+        return len(antigos)
+
+    def descartar(self):
+        try:
+            os.unlink(self.caminho)
+        except FileNotFoundError:
+            pass
+        self.inicio_alcancado = False
+
+
+class ArmazemCandles:
+    """
+    Histórico de candles em disco: um arquivo binário de largura fixa por (ativo, timeframe), lido via mmap.
+    Uma consulta só vai ao broker pela cauda que falta desde o último candle gravado e, se pedir mais do que
+    há em disco, pelos candles anteriores ao primeiro (paginando pelo fim da janela do get_candles).
+    O passado é completado aos poucos em background até `historico_alvo` candles por série.
+    """
+    def __init__(self, diretorio, historico_alvo=10000, max_paginas=20):
+        os.makedirs(diretorio, exist_ok=True)
+        self.diretorio = diretorio
+        self.historico_alvo = historico_alvo
+        self.max_paginas = max_paginas  # chamadas ao broker por consulta, em cada direção
+        self._series = {}
+        self._lock = threading.Lock()
+        self.consultas = 0
+        self.candles_buscados = 0
+        self.paginas_antigas = 0
+
+    def _serie(self, ativo, timeframe):
+        chave = (ativo, timeframe)
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                nome = re.sub(r'[^A-Za-z0-9_.-]', '_', ativo)
+                serie = self._series[chave] = SerieDisco(ativo, timeframe, os.path.join(self.diretorio, f"{nome}_{timeframe}.bin"))
+            return serie
+
+    @contextmanager
+    def _escrita(self, serie):
+        """Um escritor por série: lock da thread e flock entre processos (workers do gunicorn)."""
+        with serie.lock:
+            with open(serie.caminho + '.lock', 'a') as trava:
+                fcntl.flock(trava, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(trava, fcntl.LOCK_UN)
+
+    def obter(self, ativo, timeframe, quantidade, buscar, fim=None, agora=None):
+        """
+        Retorna os últimos `quantidade` candles com 'from' <= `fim` (padrão: agora), como visão do mmap.
+        `buscar(quantidade, fim)` consulta o broker e devolve candles em ordem crescente de 'from'.
+        """
+        agora = agora or time.time()
+        limite = agora if fim is None else min(fim, agora)
+        serie = self._serie(ativo, timeframe)
+        with self._escrita(serie):
+            registros = serie.registros()
+            if not len(registros) or limite >= registros['from'][-1]:
+                self._atualizar_cauda(serie, buscar, min(quantidade, MAX_POR_CHAMADA), agora)
+            for _ in range(self.max_paginas):
+                registros = serie.registros()
+                faltam = quantidade - int(np.searchsorted(registros['from'], limite, side='right'))
+                if faltam <= 0 or serie.inicio_alcancado or not len(registros):
+                    break
+                if not self._paginar_antigos(serie, buscar, min(faltam, MAX_POR_CHAMADA)):
+                    break
+            self.consultas += 1
+        registros = serie.registros()
+        ate = int(np.searchsorted(registros['from'], limite, side='right'))
+        return registros[max(ate - quantidade, 0):ate]
+
+    def _atualizar_cauda(self, serie, buscar, quantidade, agora):
+        registros = serie.registros()
+        if len(registros):
+            ultimo = int(registros['from'][-1])
+            if (agora - ultimo) // serie.tamanho >= MAX_POR_CHAMADA * self.max_paginas:
+                # lacuna longa demais (ex.: serviço parado por dias): a série recomeça do presente
+                logging.warning("Histórico de %s M%s desatualizado demais; recomeçando a série.", serie.ativo, serie.timeframe)
+                serie.descartar()
+                registros = serie.registros()
+        if not len(registros):
+            self._gravar_cauda(serie, buscar(quantidade, agora))
+            return
+        # pagina para frente a partir do último candle gravado (que é buscado de novo, pode ter fechado)
+        inicio = int(registros['from'][-1])
+        while True:
+            fim_pagina = min(agora, inicio + (MAX_POR_CHAMADA - 1) * serie.tamanho)
+            novos = buscar(int((fim_pagina - inicio) // serie.tamanho) + 1, fim_pagina)
+            if not novos:
+                return
+            self._gravar_cauda(serie, novos)
+            if fim_pagina >= agora:
+                return
+            inicio = max(int(serie.registros()['from'][-1]), int(fim_pagina))
+
+    def _gravar_cauda(self, serie, velas):
+        self.candles_buscados += len(velas or ())
+        return serie.gravar_cauda(de_velas(velas))
+
+    def _paginar_antigos(self, serie, buscar, quantidade):
+        """Busca até `quantidade` candles anteriores ao primeiro gravado; retorna quantos entraram."""
+        primeiro = int(serie.registros()['from'][0])
+        antigos = buscar(quantidade, primeiro - 1)
+        self.candles_buscados += len(antigos or ())
+        self.paginas_antigas += 1
+        gravados = serie.gravar_inicio(de_velas(antigos))
+        if not gravados:
+            serie.inicio_alcancado = True
+        return gravados
+
+    def pendentes(self):
+        """Séries já consultadas com menos candles em disco que o alvo, da mais curta para a mais longa."""
+        with self._lock:
+            series = list(self._series.values())
+        tamanhos = [(len(s.registros()), s) for s in series if not s.inicio_alcancado]
+        return [s for n, s in sorted(tamanhos, key=lambda t: t[0]) if 0 < n < self.historico_alvo]
+
+    def preencher(self, buscar):
+        """
+        Um passo do preenchimento em background: uma página de candles antigos para a série com menos histórico.
+        `buscar(ativo, timeframe, quantidade, fim)`; retorna (ativo, timeframe, gravados) ou None.
+        """
+        for serie in self.pendentes():
+            with self._escrita(serie):
+                faltam = self.historico_alvo - len(serie.registros())
+                if faltam <= 0 or serie.inicio_alcancado:
+                    continue
+                gravados = self._paginar_antigos(
+                    serie, lambda n, fim: buscar(serie.ativo, serie.timeframe, n, fim), min(faltam, MAX_POR_CHAMADA))
+            return serie.ativo, serie.timeframe, gravados
+        return None
+
+    def estatisticas(self):
+        with self._lock:
+            series = list(self._series.values())
+        candles = sum(len(s.registros()) for s in series)
+        return {
+            'diretorio': self.diretorio,
+            'series': len(series),
+            'candles_em_disco': candles,
+            'bytes_em_disco': candles * REGISTRO.itemsize,
+            'historico_alvo': self.historico_alvo,
+            'series_pendentes': len(self.pendentes()),
+            'consultas': self.consultas,
+            'candles_buscados': self.candles_buscados,
+            'paginas_antigas': self.paginas_antigas
+        }
@@ -0,0 +1,91 @@
+# API/ativos.py
+import logging
+import threading
+import time
+
+# até 5 minutos a IQ Option abre a opção como turbo; acima disso, binária
+DURACAO_MAX_TURBO = 5
+
+
+def tipo_opcao(duracao):
+    return 'turbo' if int(duracao) <= DURACAO_MAX_TURBO else 'binary'
+
+
+class CatalogoAtivos:
+    """
+    Catálogo em memória dos ativos negociáveis: aberto/fechado por tipo de opção e payout.
+    É trocado inteiro a cada atualização, então leituras não usam lock.
+    Mais velho que `idade_maxima` segundos (atualização falhando), deixa de recusar ordens.
+    """
+    def __init__(self, idade_maxima=None):
+        self._ativos = {}
+        self._maiusculos = {}
+        self.atualizado_em = None
+        self.idade_maxima = idade_maxima
+        self._avisado = False
+        self._lock = threading.Lock()
+
+    def atualizar(self, abertos, payouts=None):
+        """
+        `abertos`: {'turbo': {ativo: bool}, 'binary': {ativo: bool}}.
+        `payouts`: {ativo: {'turbo': 0.87, 'binary': 0.85}} (fração).
+        """
+        payouts = payouts or {}
+        ativos = {}
+        for tipo in ('turbo', 'binary'):
+            for ativo, aberto in (abertos.get(tipo) or {}).items():
+                info = ativos.setdefault(ativo, {'ativo': ativo, 'turbo': False, 'binary': False, 'payout': {}})
+                info[tipo] = bool(aberto)
+        for ativo, info in ativos.items():
+            info['aberto'] = info['turbo'] or info['binary']
+            info['payout'] = {t: p for t, p in (payouts.get(ativo) or {}).items() if t in ('turbo', 'binary')}
+        with self._lock:
+            self._ativos = ativos
+            self._maiusculos = {a.upper(): a for a in ativos}
+            self.atualizado_em = time.time()
+            self._avisado = False
+        return len(ativos)
+
+    def verificar(self, ativo, duracao):
+        """
+        Retorna (ok, motivo). Com o catálogo ainda vazio ou vencido a ordem segue para o broker,
+        para uma falha na atualização não bloquear os trades.
+        """
+        ativos = self._ativos
+        if not ativos or self.vencido():
+            return True, None
+        info = ativos.get(ativo)
+        if info is None:
+            sugestao = self._maiusculos.get(str(ativo).upper())
+            dica = f" (quis dizer {sugestao}?)" if sugestao else ""
+            return False, f"Ativo desconhecido: {ativo}{dica}"
+        tipo = tipo_opcao(duracao)
+        if not info[tipo]:
+            return False, f"Ativo {ativo} fechado para opções {'turbo' if tipo == 'turbo' else 'binárias'} no momento"
+        return True, None
+
+    def vencido(self):
+        if not self.idade_maxima or self.atualizado_em is None:
+            return False
+        idade = time.time() - self.atualizado_em
+        if idade <= self.idade_maxima:
+            return False
+        if not self._avisado:
+            self._avisado = True
+            logging.warning("Catálogo de ativos sem atualização há %.0fs: ordens seguem sem verificação de ativo", idade)
+        return True
+
+    def obter(self, ativo):
+        info = self._ativos.get(ativo)
+        return dict(info) if info else None
+
+    def listar(self, apenas_abertos=False, tipo=None):
+        ativos = self._ativos.values()
+        if tipo:
+            ativos = [a for a in ativos if a.get(tipo)]
+        elif apenas_abertos:
+            ativos = [a for a in ativos if a['aberto']]
+        return sorted((dict(a) for a in ativos), key=lambda a: a['ativo'])
+
+    def idade(self):
+        return round(time.time() - self.atualizado_em, 1) if self.atualizado_em else None
@@ -0,0 +1,83 @@
+# API/candles.py
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class CacheCandles:
+    """
+    Cache em memória de candles por (ativo, timeframe).
+    Cada série é um buffer circular; numa nova consulta só os candles mais novos
+    que o último em cache são buscados no broker. Séries menos usadas são descartadas (LRU).
+    """
+    def __init__(self, max_series=64, max_candles=1000):
+        self.max_series = max_series
+        self.max_candles = max_candles
+        self._series = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.candles_buscados = 0
+
+    def obter(self, ativo, timeframe, quantidade, buscar, agora=None):
+        """
+        Retorna os últimos `quantidade` candles.
+        `buscar(quantidade, fim)` consulta o broker e devolve candles em ordem crescente de 'from'.
+        """
+        agora = agora or time.time()
+        tamanho = timeframe * 60
+        chave = (ativo, timeframe)
+        if quantidade > self.max_candles:
+            return self._buscar_completo(chave, quantidade, buscar, agora, guardar=False)
+
+        with self._lock:
+            serie = self._series.get(chave)
+            ultimo = serie[-1]['from'] if serie else None
+            disponiveis = len(serie) if serie else 0
+            if serie is not None:
+                self._series.move_to_end(chave)
+
+        if ultimo is None or disponiveis < quantidade:
+            return self._buscar_completo(chave, quantidade, buscar, agora)
+
+        # o último candle em cache pode ainda estar aberto: é buscado de novo junto com os novos
+        faltando = int((agora - ultimo) // tamanho) + 1
+        if faltando >= quantidade:
+            return self._buscar_completo(chave, quantidade, buscar, agora)
+        novos = buscar(faltando, agora)
+        if not novos:
+            return None
+        with self._lock:
+            self.hits += 1
+            self.candles_buscados += len(novos)
+            serie = self._series.get(chave)
+            if serie is None:
+                return None
+            inicio = novos[0]['from']
+            while serie and serie[-1]['from'] >= inicio:
+                serie.pop()
+            serie.extend(novos)
+            return list(serie)[-quantidade:]
+
+    def _buscar_completo(self, chave, quantidade, buscar, agora, guardar=True):
+        candles = buscar(quantidade, agora)
+        with self._lock:
+            self.misses += 1
+            self.candles_buscados += len(candles or [])
+            if candles and guardar:
+                self._series[chave] = deque(candles, maxlen=self.max_candles)
+                self._series.move_to_end(chave)
+                while len(self._series) > self.max_series:
+                    self._series.popitem(last=False)
+        return candles
+
+    def estatisticas(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'candles_buscados': self.candles_buscados,
+                'series': len(self._series)
+            }
@@ -0,0 +1,90 @@
+# API/contas.py
+import threading
+import time
+
+# Tipos de balance da IQ Option -> nome da conta
+TIPOS_CONTA = {1: 'REAL', 4: 'PRACTICE', 2: 'TOURNAMENT'}
+
+
+class EstadoContas:
+    """
+    Cache em memória do estado de cada conta (saldo, moeda e balance id).
+    É alimentado por leituras completas do broker, por pushes de saldo e pelos
+    trades executados, e expira cada entrada após `ttl_segundos`.
+    """
+    def __init__(self, ttl_segundos=30.0):
+        self.ttl_segundos = float(ttl_segundos)
+        self._contas = {}
+        self._lock = threading.Lock()
+
+    def atualizar(self, tipo_conta, saldo=None, moeda=None, balance_id=None):
+        """Grava o estado conhecido de uma conta e renova sua validade."""
+        conta = tipo_conta.upper()
+        agora = time.time()
+        with self._lock:
+            estado = self._contas.setdefault(conta, {
+                'conta': conta, 'saldo': None, 'moeda': None, 'balance_id': None
+            })
+            if saldo is not None:
+                estado['saldo'] = saldo
+            if moeda is not None:
+                estado['moeda'] = moeda
+            if balance_id is not None:
+                estado['balance_id'] = balance_id
+            estado['atualizado_em'] = agora
+            estado['valido_ate'] = agora + self.ttl_segundos
+
+    def atualizar_por_balances(self, balances):
+        """Atualiza todas as contas a partir da lista `balances` do broker."""
+        for balance in balances or []:
+            conta = TIPOS_CONTA.get(balance.get('type'))
+            if conta:
+                self.atualizar(conta, balance.get('amount'), balance.get('currency'), balance.get('id'))
+
+    def atualizar_por_balance_id(self, balance_id, saldo):
+        """Aplica um push de saldo identificado apenas pelo balance id."""
+        with self._lock:
+            conta = next((c for c, e in self._contas.items() if e['balance_id'] == balance_id), None)
+        if conta is None:
+            return False
+        self.atualizar(conta, saldo=saldo)
+        return True
+
+    def debitar(self, tipo_conta, valor, liquida_em=None):
+        """Desconta uma entrada do saldo em cache e limita a validade até a liquidação do trade."""
+        conta = tipo_conta.upper()
+        with self._lock:
+            estado = self._contas.get(conta)
+            if not estado or estado['saldo'] is None:
+                return
+            estado['saldo'] = round(estado['saldo'] - valor, 2)
+            if liquida_em is not None:
+                estado['valido_ate'] = min(estado['valido_ate'], liquida_em)
+
+    def obter(self, tipo_conta, max_idade=None):
+        """Retorna uma cópia do estado da conta, ou None se ausente/expirado."""
+        conta = tipo_conta.upper()
+        agora = time.time()
+        with self._lock:
+            estado = self._contas.get(conta)
+            if not estado or estado['saldo'] is None:
+                return None
+            if agora >= estado['valido_ate']:
+                return None
+            if max_idade is not None and agora - estado['atualizado_em'] > max_idade:
+                return None
+            return dict(estado)
+
+    def balance_id(self, tipo_conta):
+        """Retorna o balance id conhecido da conta, mesmo que o saldo esteja expirado."""
+        with self._lock:
+            estado = self._contas.get(tipo_conta.upper())
+            return estado['balance_id'] if estado else None
+
+    def invalidar(self, tipo_conta=None):
+        """Força a próxima leitura a consultar o broker."""
+        with self._lock:
+            contas = [tipo_conta.upper()] if tipo_conta else list(self._contas)
+            for conta in contas:
+                if conta in self._contas:
+                    self._contas[conta]['valido_ate'] = 0
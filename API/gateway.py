@@ -0,0 +1,410 @@
+# API/gateway.py
+"""
+Gateway do broker: um único processo mantém a conexão IQ_Option e a SessaoBroker,
+e os workers HTTP (gunicorn) chamam a sessão por um Unix socket local.
+
+Protocolo binário: cada quadro é um cabeçalho fixo `!IIB` (tamanho do payload,
+id da requisição, tipo) seguido do payload em `marshal`. Requisições levam
+(metodo, args); respostas levam o retorno ou a mensagem de erro. Os ids permitem
+várias chamadas simultâneas na mesma conexão.
+
+    python -m API.gateway        # escuta em BROKER_GATEWAY_SOCKET
+"""
+import itertools
+import logging
+import marshal
+import os
+import random
+import signal
+import socket
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from API.sessao import SessaoBroker
+
+CABECALHO = struct.Struct('!IIB')
+REQUISICAO, RESPOSTA, ERRO = 0, 1, 2
+TAMANHO_MAXIMO = 64 * 1024 * 1024
+
+# métodos da SessaoBroker que os workers podem chamar
+METODOS_SESSAO = frozenset({
+    'carregar_balance_ids', 'usar_conta', 'saldos', 'candles', 'comprar', 'resultado_ordem', 'catalogo_ativos',
+    'iniciar_stream_candles', 'parar_stream_candles', 'ler_stream_candles'
+})
+
+
+class ErroGateway(Exception):
+    """Erro levantado no processo do gateway e repassado ao worker."""
+
+
+def _ler_quadro(arquivo):
+    cabecalho = arquivo.read(CABECALHO.size)
+    if len(cabecalho) < CABECALHO.size:
+        return None
+    tamanho, id_requisicao, tipo = CABECALHO.unpack(cabecalho)
+    if tamanho > TAMANHO_MAXIMO:
+        raise ValueError(f"Quadro de {tamanho} bytes excede o limite")
+    payload = arquivo.read(tamanho)
+    if len(payload) < tamanho:
+        return None
+    return id_requisicao, tipo, payload
+
+
+def _quadro(id_requisicao, tipo, payload):
+    return CABECALHO.pack(len(payload), id_requisicao, tipo) + payload
+
+
+class ServidorGateway:
+    """Atende as chamadas dos workers sobre uma única sessão com o broker."""
+    def __init__(self, api, caminho, workers=32):
+        self.api = api
+        self.sessao = SessaoBroker(api)
+        self.caminho = caminho
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gateway")
+        self._lock_conexao = threading.Lock()
+        self._lock_conexoes = threading.Lock()
+        self._socket = None
+        self._parar = threading.Event()
+        # sinalizado pelo on_close/on_error do websocket para reconectar sem esperar o keepalive
+        self.queda = threading.Event()
+        # workers conectados agora e quando o último desconectou (gateways de tenant encerram ociosos)
+        self.conexoes = 0
+        self._ocioso_desde = time.monotonic()
+        # streams de candles por (ativo, tamanho) -> conexões (workers) que os assinaram;
+        # o stream só para no broker quando o último worker desiste dele
+        self._streams = {}
+        self._lock_streams = threading.Lock()
+
+    def conectar(self):
+        """Conecta (ou reconecta) ao broker; idempotente para vários workers chamando juntos."""
+        with self._lock_conexao:
+            if self.api.check_connect():
+                return True, None
+            check, reason = self.api.connect()
+            if check:
+                self._vigiar_websocket()
+                self.sessao.carregar_balance_ids()
+                if self.sessao._conta_ativa:
+                    self.sessao.usar_conta(self.sessao._conta_ativa, forcar=True)
+                self._restaurar_streams()
+                logging.info("Gateway conectado ao broker.")
+            else:
+                logging.critical("Gateway falhou ao conectar ao broker: %s", reason)
+            return bool(check), None if reason is None else str(reason)
+
+    def _vigiar_websocket(self):
+        wss = getattr(getattr(getattr(self.api, 'api', None), 'websocket_client', None), 'wss', None)
+        if wss is None or getattr(wss, '_vigiado_pelo_gateway', False):
+            return
+        for evento in ('on_close', 'on_error'):
+            original = getattr(wss, evento, None)
+
+            def ao_cair(*args, _original=original, **kwargs):
+                try:
+                    if _original:
+                        _original(*args, **kwargs)
+                finally:
+                    self.queda.set()
+            setattr(wss, evento, ao_cair)
+        wss._vigiado_pelo_gateway = True
+
+    def _resolver(self, metodo, conexao=None):
+        if metodo == 'sessao.iniciar_stream_candles':
+            return lambda ativo, tamanho, *args: self.iniciar_stream(conexao, ativo, tamanho, *args)
+        if metodo == 'sessao.parar_stream_candles':
+            return lambda ativo, tamanho: self.parar_stream(conexao, ativo, tamanho)
+        if metodo == 'conectar':
+            return self.conectar
+        if metodo == 'check_connect':
+            return self.api.check_connect
+        if metodo == 'get_profile_ansyc':
+            return self.api.get_profile_ansyc
+        prefixo, _, nome = metodo.partition('.')
+        if prefixo == 'sessao' and nome in METODOS_SESSAO:
+            return getattr(self.sessao, nome)
+        raise AttributeError(f"Método não permitido no gateway: {metodo}")
+
+    def iniciar_stream(self, conexao, ativo, tamanho, *args):
+        """Assina no broker (sempre repassado: após uma reconexão o worker reassina) e conta o worker."""
+        self.sessao.iniciar_stream_candles(ativo, tamanho, *args)
+        with self._lock_streams:
+            self._streams.setdefault((ativo, tamanho), set()).add(conexao)
+
+    def parar_stream(self, conexao, ativo, tamanho):
+        """Tira o worker do stream; só o último a sair encerra a assinatura no broker."""
+        with self._lock_streams:
+            assinantes = self._streams.get((ativo, tamanho))
+            if assinantes is None:
+                return
+            assinantes.discard(conexao)
+            if assinantes:
+                return
+            del self._streams[(ativo, tamanho)]
+        self.sessao.parar_stream_candles(ativo, tamanho)
+
+    def _soltar_streams(self, conexao):
+        """Worker desconectado (encerrado ou reciclado): sai de todos os streams que assinava."""
+        with self._lock_streams:
+            chaves = [chave for chave, assinantes in self._streams.items() if conexao in assinantes]
+        for ativo, tamanho in chaves:
+            try:
+                self.parar_stream(conexao, ativo, tamanho)
+            except Exception as e:
+                logging.error("Falha ao encerrar stream %s/%s: %s", ativo, tamanho, e)
+
+    def _restaurar_streams(self):
+        with self._lock_streams:
+            chaves = list(self._streams)
+        for ativo, tamanho in chaves:
+            try:
+                self.sessao.iniciar_stream_candles(ativo, tamanho)
+            except Exception as e:
+                logging.error("Falha ao restaurar stream %s/%s: %s", ativo, tamanho, e)
+
+    def streams(self):
+        with self._lock_streams:
+            return {f"{ativo}/{tamanho}": len(assinantes) for (ativo, tamanho), assinantes in self._streams.items()}
+
+    def iniciar(self):
+        """Abre o Unix socket (somente o usuário do processo acessa) e aceita conexões em background."""
+        if os.path.exists(self.caminho):
+            os.unlink(self.caminho)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.bind(self.caminho)
+        os.chmod(self.caminho, 0o600)
+        self._socket.listen(128)
+        threading.Thread(target=self._aceitar, name="gateway-accept", daemon=True).start()
+        logging.info("Gateway do broker escutando em %s", self.caminho)
+
+    def encerrar(self):
+        self._parar.set()
+        if self._socket is not None:
+            self._socket.close()
+        if os.path.exists(self.caminho):
+            os.unlink(self.caminho)
+
+    def _aceitar(self):
+        while not self._parar.is_set():
+            try:
+                conexao, _ = self._socket.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._atender, args=(conexao,), name="gateway-conexao", daemon=True).start()
+
+    def ocioso_ha(self):
+        """Segundos sem nenhum worker conectado (0 enquanto houver algum)."""
+        return 0.0 if self.conexoes else time.monotonic() - self._ocioso_desde
+
+    def _atender(self, conexao):
+        lock_envio = threading.Lock()
+        arquivo = conexao.makefile('rb')
+        with self._lock_conexoes:
+            self.conexoes += 1
+        try:
+            while True:
+                quadro = _ler_quadro(arquivo)
+                if quadro is None:
+                    break
+                id_requisicao, _, payload = quadro
+                self._executor.submit(self._executar, conexao, lock_envio, id_requisicao, payload)
+        except Exception as e:
+            logging.error("Conexão com worker encerrada: %s", e)
+        finally:
+            arquivo.close()
+            conexao.close()
+            self._soltar_streams(conexao)
+            with self._lock_conexoes:
+                self.conexoes -= 1
+                self._ocioso_desde = time.monotonic()
+
+    def _executar(self, conexao, lock_envio, id_requisicao, payload):
+        try:
+            metodo, args = marshal.loads(payload)
+            resposta = _quadro(id_requisicao, RESPOSTA, marshal.dumps(self._resolver(metodo, conexao)(*args)))
+        except Exception as e:
+            resposta = _quadro(id_requisicao, ERRO, marshal.dumps(f"{type(e).__name__}: {e}"))
+        try:
+            with lock_envio:
+                conexao.sendall(resposta)
+        except OSError:
+            pass
+
+
+class _ProxySessao:
+    """Expõe os métodos da SessaoBroker remota com a mesma assinatura da local."""
+    def __init__(self, cliente):
+        self._cliente = cliente
+
+    def __getattr__(self, nome):
+        if nome not in METODOS_SESSAO:
+            raise AttributeError(nome)
+        return lambda *args: self._cliente.chamar(f"sessao.{nome}", *args)
+
+
+class ClienteGateway:
+    """
+    Substitui o IQ_Option dentro do worker: connect/check_connect/get_profile_ansyc
+    e a sessão vão ao gateway. Uma conexão por processo, compartilhada entre as threads.
+    """
+    # sem canal de push de saldo no worker: o cache de contas se renova pelo TTL
+    api = None
+
+    def __init__(self, caminho, timeout=30.0):
+        self.caminho = caminho
+        self.timeout = timeout
+        self.sessao = _ProxySessao(self)
+        self._socket = None
+        self._pid = None
+        self._pendentes = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def _conexao(self):
+        # após um fork (gunicorn --preload) o socket herdado não é usado
+        if self._socket is None or self._pid != os.getpid():
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.caminho)
+            self._socket, self._pid = sock, os.getpid()
+            self._pendentes = {}
+            threading.Thread(target=self._ler_respostas, args=(sock,), name="gateway-cliente", daemon=True).start()
+        return self._socket
+
+    def chamar(self, metodo, *args):
+        payload = marshal.dumps((metodo, args))
+        espera = [threading.Event(), None, None]
+        with self._lock:
+            id_requisicao = next(self._ids) & 0xFFFFFFFF
+            try:
+                sock = self._conexao()
+                self._pendentes[id_requisicao] = espera
+                sock.sendall(_quadro(id_requisicao, REQUISICAO, payload))
+            except OSError as e:
+                self._pendentes.pop(id_requisicao, None)
+                self._socket = None
+                raise ConnectionError(f"Gateway do broker indisponível: {e}")
+        if not espera[0].wait(self.timeout):
+            with self._lock:
+                self._pendentes.pop(id_requisicao, None)
+            raise TimeoutError(f"Gateway sem resposta para {metodo} em {self.timeout}s")
+        if espera[1] == ERRO:
+            raise ErroGateway(espera[2])
+        return espera[2]
+
+    def _ler_respostas(self, sock):
+        arquivo = sock.makefile('rb')
+        try:
+            while True:
+                quadro = _ler_quadro(arquivo)
+                if quadro is None:
+                    break
+                id_requisicao, tipo, payload = quadro
+                with self._lock:
+                    espera = self._pendentes.pop(id_requisicao, None)
+                if espera is not None:
+                    espera[1], espera[2] = tipo, marshal.loads(payload)
+                    espera[0].set()
+        except Exception as e:
+            logging.error("Erro lendo respostas do gateway: %s", e)
+        finally:
+            arquivo.close()
+            with self._lock:
+                if self._socket is sock:
+                    self._socket = None
+                    pendentes, self._pendentes = self._pendentes, {}
+                else:
+                    pendentes = {}
+            for espera in pendentes.values():
+                espera[1], espera[2] = ERRO, "Conexão com o gateway encerrada"
+                espera[0].set()
+            sock.close()
+
+    def fechar(self):
+        """Fecha a conexão com o gateway (a próxima chamada reabre)."""
+        with self._lock:
+            sock, self._socket = self._socket, None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+
+    def connect(self):
+        return tuple(self.chamar('conectar'))
+
+    def check_connect(self):
+        try:
+            return self.chamar('check_connect')
+        except (ConnectionError, TimeoutError):
+            return False
+
+    def get_profile_ansyc(self):
+        return self.chamar('get_profile_ansyc')
+
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv()
+    from API.logs import configurar_logs
+    tenant = os.getenv('TENANT_ID')
+    configurar_logs(f"gateway-{tenant}" if tenant else 'gateway',
+                    formato=f"%(asctime)s - %(levelname)s - [gateway{f' {tenant}' if tenant else ''}] %(message)s")
+    from API.trader import IQ_Option, SIMULADOR_ATIVO
+
+    caminho = os.getenv('BROKER_GATEWAY_SOCKET', '/tmp/bot-trader-gateway.sock')
+    email, senha = os.getenv('IQ_EMAIL'), os.getenv('IQ_PASSWORD')
+    if SIMULADOR_ATIVO:
+        email, senha = email or 'simulador', senha or 'simulador'
+    if not email or not senha:
+        logging.critical("Credenciais IQ Option não configuradas!")
+        sys.exit(1)
+
+    servidor = ServidorGateway(IQ_Option(email, senha), caminho)
+    check, reason = servidor.conectar()
+    if not check:
+        sys.exit(1)
+    servidor.sessao.usar_conta("PRACTICE")
+    servidor.iniciar()
+
+    parar = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: (parar.set(), servidor.queda.set()))
+    signal.signal(signal.SIGINT, lambda *_: (parar.set(), servidor.queda.set()))
+    intervalo = int(os.getenv('KEEPALIVE_SECONDS', '15') or '15')
+    # gateways de tenant sobem sob demanda e encerram depois deste tempo sem workers conectados
+    max_ocioso = float(os.getenv('BROKER_GATEWAY_IDLE_SECONDS', '0') or '0')
+    if max_ocioso > 0:
+        verificacao = max(int(max_ocioso // 4), 1)
+        intervalo = min(intervalo, verificacao) if intervalo > 0 else verificacao
+    base = float(os.getenv('CONNECT_RETRY_SECONDS', '2') or '2')
+    teto = float(os.getenv('CONNECT_RETRY_MAX_SECONDS', '60') or '60')
+    tentativa = 0
+    try:
+        while not parar.is_set():
+            # quedas chegam pelo websocket; o intervalo é só a checagem de segurança
+            servidor.queda.wait(intervalo if intervalo > 0 else None)
+            servidor.queda.clear()
+            if max_ocioso > 0 and servidor.ocioso_ha() > max_ocioso:
+                logging.info("Gateway sem workers há %.0fs; encerrando.", servidor.ocioso_ha())
+                break
+            while not parar.is_set():
+                try:
+                    if servidor.api.check_connect():
+                        break
+                    logging.warning("Conexão com o broker caiu; reconectando...")
+                    if servidor.conectar()[0]:
+                        break
+                except Exception as e:
+                    logging.error("Falha ao reconectar o gateway: %s", e)
+                tentativa += 1
+                espera = min(base * 2 ** (tentativa - 1), teto)
+                parar.wait(espera / 2 + random.uniform(0, espera / 2))
+            tentativa = 0
+    finally:
+        servidor.encerrar()
+
+
+if __name__ == '__main__':
+    main()
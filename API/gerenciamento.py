@@ -1,4 +1,8 @@
+import json
 import logging
+import os
+import sqlite3
+import threading
 
 class GerenciamentoPorcentagem:
     def __init__(self, banca_inicial, config):
@@ -20,10 +24,76 @@ class GerenciamentoPorcentagem:
         valor_entrada = max(valor_entrada, 2.0)
         return round(valor_entrada, 2)
 
+class EstatisticasConta:
+    """Estatísticas acumuladas de uma conta, atualizadas em O(1) a cada trade liquidado."""
+    def __init__(self):
+        self.resetar()
+
+    def resetar(self):
+        self.total_wins = 0
+        self.total_losses = 0
+        self.total_empates = 0
+        self.sequencia_atual = 0  # positiva = wins seguidos, negativa = losses seguidos
+        self.maior_sequencia_wins = 0
+        self.maior_sequencia_losses = 0
+        self.lucro_total = 0.0
+        self.pico_lucro = 0.0
+        self.drawdown_maximo = 0.0
+
+    def registrar(self, lucro):
+        if lucro > 0:
+            self.total_wins += 1
+            self.sequencia_atual = self.sequencia_atual + 1 if self.sequencia_atual > 0 else 1
+            self.maior_sequencia_wins = max(self.maior_sequencia_wins, self.sequencia_atual)
+        elif lucro < 0:
+            self.total_losses += 1
+            self.sequencia_atual = self.sequencia_atual - 1 if self.sequencia_atual < 0 else -1
+            self.maior_sequencia_losses = max(self.maior_sequencia_losses, -self.sequencia_atual)
+        else:
+            self.total_empates += 1
+        self.lucro_total = round(self.lucro_total + lucro, 2)
+        self.pico_lucro = max(self.pico_lucro, self.lucro_total)
+        self.drawdown_maximo = max(self.drawdown_maximo, round(self.pico_lucro - self.lucro_total, 2))
+
+    @classmethod
+    def de_campos(cls, campos):
+        estatisticas = cls()
+        estatisticas.__dict__.update(campos)
+        return estatisticas
+
+    def to_dict(self):
+        decididos = self.total_wins + self.total_losses
+        return {
+            'total_wins': self.total_wins,
+            'total_losses': self.total_losses,
+            'total_empates': self.total_empates,
+            'winrate': round(self.total_wins / decididos * 100, 2) if decididos else 0.0,
+            'sequencia_atual': self.sequencia_atual,
+            'maior_sequencia_wins': self.maior_sequencia_wins,
+            'maior_sequencia_losses': self.maior_sequencia_losses,
+            'lucro_total': self.lucro_total,
+            'drawdown_atual': round(self.pico_lucro - self.lucro_total, 2),
+            'drawdown_maximo': self.drawdown_maximo
+        }
+
 class GerenciadorMultiConta:
-    def __init__(self, config):
+    """
+    Dimensionamento das entradas e estatísticas por conta.
+    Com `caminho`, as estatísticas ficam num SQLite compartilhado pelos workers (separadas por `tenant`),
+    então o /management mostra o mesmo em qualquer worker; sem ele, num banco em memória do processo.
+    """
+    def __init__(self, config, caminho=None, tenant='default'):
         self.config = config
         self.gerenciadores = {}
+        self.tenant = tenant
+        if caminho and os.path.dirname(caminho):
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        self._conn = sqlite3.connect(caminho or ':memory:', timeout=10, isolation_level=None, check_same_thread=False)
+        if caminho:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS estatisticas "
+                           "(tenant TEXT NOT NULL, conta TEXT NOT NULL, campos TEXT NOT NULL, PRIMARY KEY (tenant, conta))")
+        self._lock_estatisticas = threading.Lock()
     
     def _get_gerenciador(self, tipo_conta, banca_atual):
         if tipo_conta not in self.gerenciadores:
@@ -33,7 +103,7 @@ class GerenciadorMultiConta:
     def get_proxima_entrada(self, tipo_conta, banca_atual, porcentagem=None):
         gerenciador = self._get_gerenciador(tipo_conta, banca_atual)
         valor = gerenciador.calcular_entrada(banca_atual, porcentagem)
-        logging.info(f"Entrada {tipo_conta}: R$ {valor}")
+        logging.info("Entrada %s: R$ %s", tipo_conta, valor)
         return valor
     
     def get_configuracao_atual(self, tipo_conta, banca_atual):
@@ -43,4 +113,33 @@ class GerenciadorMultiConta:
                 'entrada_padrao': gerenciador.entrada_padrao,
                 'limite_maximo': gerenciador.limite_maximo
             }
-        return None
\ No newline at end of file
+        return None
+
+    def _carregar(self, conta):
+        linha = self._conn.execute("SELECT campos FROM estatisticas WHERE tenant = ? AND conta = ?",
+                                   (self.tenant, conta)).fetchone()
+        return EstatisticasConta.de_campos(json.loads(linha[0])) if linha else EstatisticasConta()
+
+    def registrar_resultado(self, tipo_conta, lucro):
+        """Contabiliza um trade liquidado (lucro > 0 win, < 0 loss, 0 empate)."""
+        conta = tipo_conta.upper()
+        with self._lock_estatisticas:
+            # leitura e gravação na mesma transação: liquidações simultâneas em workers diferentes não se perdem
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                estatisticas = self._carregar(conta)
+                estatisticas.registrar(lucro)
+                self._conn.execute("INSERT OR REPLACE INTO estatisticas (tenant, conta, campos) VALUES (?, ?, ?)",
+                                   (self.tenant, conta, json.dumps(vars(estatisticas))))
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def get_estatisticas(self, tipo_conta):
+        with self._lock_estatisticas:
+            return self._carregar(tipo_conta.upper()).to_dict()
+
+    def resetar_estatisticas(self, tipo_conta):
+        with self._lock_estatisticas:
+            self._conn.execute("DELETE FROM estatisticas WHERE tenant = ? AND conta = ?", (self.tenant, tipo_conta.upper()))
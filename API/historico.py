@@ -0,0 +1,231 @@
+# API/historico.py
+import json
+import logging
+import marshal
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS trades (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    criado_em REAL NOT NULL,
+    tipo_conta TEXT NOT NULL,
+    ativo TEXT NOT NULL,
+    acao TEXT,
+    duracao INTEGER,
+    valor REAL,
+    order_id TEXT,
+    status TEXT,
+    mensagem TEXT,
+    latencia_ms REAL,
+    lucro REAL
+);
+CREATE INDEX IF NOT EXISTS idx_trades_conta ON trades(tipo_conta);
+CREATE INDEX IF NOT EXISTS idx_trades_ativo ON trades(ativo);
+CREATE INDEX IF NOT EXISTS idx_trades_criado_em ON trades(criado_em);
+CREATE INDEX IF NOT EXISTS idx_trades_order_id ON trades(order_id);
+CREATE TABLE IF NOT EXISTS ordens (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    atualizado_em REAL NOT NULL,
+    registro TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_ordens_atualizado_em ON ordens(atualizado_em);
+CREATE TABLE IF NOT EXISTS idempotencia (
+    chave TEXT PRIMARY KEY,
+    expira_em REAL NOT NULL,
+    resultado BLOB
+);
+CREATE INDEX IF NOT EXISTS idx_idempotencia_expira_em ON idempotencia(expira_em);
+"""
+
+COLUNAS = ('criado_em', 'tipo_conta', 'ativo', 'acao', 'duracao', 'valor',
+           'order_id', 'status', 'mensagem', 'latencia_ms', 'lucro')
+
+
+class HistoricoTrades:
+    """
+    Histórico persistente de ordens em SQLite (modo WAL).
+    As gravações entram numa fila e são escritas em lote por uma thread própria,
+    então o caminho do trade nunca espera o disco.
+    """
+    def __init__(self, caminho, tamanho_lote=200, intervalo=0.5, retencao_ordens=86400):
+        self.caminho = caminho
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo
+        self.retencao_ordens = retencao_ordens  # status de ordens assíncronas finalizadas, em segundos
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        with self._conectar() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            colunas = {linha[1] for linha in conn.execute("PRAGMA table_info(trades)")}
+            if colunas and 'lucro' not in colunas:
+                conn.execute("ALTER TABLE trades ADD COLUMN lucro REAL")
+            conn.executescript(ESQUEMA)
+        self._fila = queue.Queue()
+        self._leitura = threading.local()
+        self._writer = threading.Thread(target=self._escrever_loop, name="historico", daemon=True)
+        self._writer.start()
+
+    def _conectar(self):
+        conn = sqlite3.connect(self.caminho, timeout=10)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def registrar(self, **trade):
+        """Enfileira uma ordem para gravação (não bloqueia)."""
+        trade.setdefault('criado_em', time.time())
+        self._fila.put(('inserir', tuple(trade.get(c) for c in COLUNAS)))
+
+    def liquidar(self, order_id, lucro):
+        """Enfileira o resultado de uma ordem liquidada (ganho, perda ou empate)."""
+        status = 'ganho' if lucro > 0 else 'perda' if lucro < 0 else 'empate'
+        self._fila.put(('liquidar', (status, lucro, str(order_id))))
+
+    def criar_ordem(self, registro):
+        """
+        Grava na hora o status inicial de uma ordem assíncrona, visível para todos os workers.
+        Retorna False se o id já existe (ex.: client_order_id reenviado para outro worker).
+        """
+        conn = self._conexao_leitura()
+        with conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO ordens (id, status, atualizado_em, registro) VALUES (?, ?, ?, ?)",
+                (registro['id'], registro['status'], time.time(), json.dumps(registro, default=str))
+            )
+        return cursor.rowcount == 1
+
+    def atualizar_ordem(self, registro):
+        """Enfileira a mudança de status de uma ordem assíncrona."""
+        self._fila.put(('ordem', (registro['status'], time.time(), json.dumps(registro, default=str), registro['id'])))
+
+    def remover_ordem(self, id_ordem):
+        conn = self._conexao_leitura()
+        with conn:
+            conn.execute("DELETE FROM ordens WHERE id = ?", (id_ordem,))
+
+    def obter_ordem(self, id_ordem):
+        linha = self._conexao_leitura().execute("SELECT registro FROM ordens WHERE id = ?", (id_ordem,)).fetchone()
+        return json.loads(linha[0]) if linha else None
+
+    def reservar_chave(self, chave, ttl, max_itens=None):
+        """
+        Reserva uma chave de idempotência para todos os workers (ver CacheIdempotencia.reservar).
+        Gravação síncrona: o reenvio que cair em outro worker logo em seguida já a enxerga.
+        Na mesma transação apaga as chaves vencidas e, acima de `max_itens`, as concluídas que
+        expiram primeiro (reservas em andamento só saem ao expirar), como o cache em memória.
+        """
+        agora = time.time()
+        conn = self._conexao_leitura()
+        with conn:
+            conn.execute("DELETE FROM idempotencia WHERE expira_em <= ?", (agora,))
+            cursor = conn.execute("INSERT OR IGNORE INTO idempotencia (chave, expira_em) VALUES (?, ?)",
+                                  (chave, agora + ttl))
+            if cursor.rowcount == 1:
+                if max_itens:
+                    conn.execute("""
+                        DELETE FROM idempotencia WHERE chave IN (
+                            SELECT chave FROM idempotencia WHERE resultado IS NOT NULL ORDER BY expira_em
+                            LIMIT max(0, (SELECT COUNT(*) FROM idempotencia) - ?))""", (max_itens,))
+                return 'novo', None
+            linha = conn.execute("SELECT resultado FROM idempotencia WHERE chave = ?", (chave,)).fetchone()
+        if linha is None or linha[0] is None:
+            return 'em_andamento', None
+        return 'concluido', marshal.loads(linha[0])
+
+    def concluir_chave(self, chave, resultado, ttl):
+        conn = self._conexao_leitura()
+        with conn:
+            conn.execute("UPDATE idempotencia SET resultado = ?, expira_em = ? WHERE chave = ?",
+                         (marshal.dumps(resultado), time.time() + ttl, chave))
+
+    def liberar_chave(self, chave):
+        conn = self._conexao_leitura()
+        with conn:
+            conn.execute("DELETE FROM idempotencia WHERE chave = ?", (chave,))
+
+    def aguardar_gravacao(self, timeout=5.0):
+        """Bloqueia até a fila de gravação esvaziar (uso em testes e desligamento)."""
+        limite = time.time() + timeout
+        while self._fila.unfinished_tasks and time.time() < limite:
+            time.sleep(0.01)
+        return not self._fila.unfinished_tasks
+
+    def encerrar(self):
+        """Grava o que está na fila e encerra a thread de escrita."""
+        if self._writer.is_alive():
+            self._fila.put(('parar', None))
+
+    def _escrever_loop(self):
+        conn = self._conectar()
+        sql_inserir = f"INSERT INTO trades ({', '.join(COLUNAS)}) VALUES ({', '.join('?' for _ in COLUNAS)})"
+        sql_liquidar = "UPDATE trades SET status = ?, lucro = ? WHERE order_id = ?"
+        sql_ordem = "UPDATE ordens SET status = ?, atualizado_em = ?, registro = ? WHERE id = ?"
+        limpeza = 0.0
+        parar = False
+        while not parar:
+            lote = [self._fila.get()]
+            limite = time.time() + self.intervalo
+            while len(lote) < self.tamanho_lote:
+                restante = limite - time.time()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(self._fila.get(timeout=restante))
+                except queue.Empty:
+                    break
+            try:
+                with conn:
+                    conn.executemany(sql_inserir, [p for tipo, p in lote if tipo == 'inserir'])
+                    conn.executemany(sql_liquidar, [p for tipo, p in lote if tipo == 'liquidar'])
+                    conn.executemany(sql_ordem, [p for tipo, p in lote if tipo == 'ordem'])
+                    if self.retencao_ordens and time.time() - limpeza > 3600:
+                        limpeza = time.time()
+                        conn.execute("DELETE FROM ordens WHERE atualizado_em < ? AND status IN ('submitted', 'rejected')",
+                                     (limpeza - self.retencao_ordens,))
+                        conn.execute("DELETE FROM idempotencia WHERE expira_em < ?", (limpeza,))
+            except Exception as e:
+                logging.error("Erro ao gravar histórico (%s trades): %s", len(lote), e)
+            finally:
+                for _ in lote:
+                    self._fila.task_done()
+            parar = any(tipo == 'parar' for tipo, _ in lote)
+        conn.close()
+
+    def consultar(self, tipo_conta=None, ativo=None, status=None, inicio=None, fim=None, limite=50, cursor=None):
+        """
+        Retorna (trades, proximo_cursor), do mais recente para o mais antigo.
+        O cursor é o id do último trade da página anterior (paginação por chave, sem OFFSET).
+        """
+        filtros, parametros = [], []
+        for coluna, valor in (('tipo_conta', tipo_conta), ('ativo', ativo), ('status', status)):
+            if valor is not None:
+                filtros.append(f"{coluna} = ?")
+                parametros.append(valor)
+        if inicio is not None:
+            filtros.append("criado_em >= ?")
+            parametros.append(inicio)
+        if fim is not None:
+            filtros.append("criado_em < ?")
+            parametros.append(fim)
+        if cursor is not None:
+            filtros.append("id < ?")
+            parametros.append(cursor)
+        where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+        sql = f"SELECT id, {', '.join(COLUNAS)} FROM trades {where} ORDER BY id DESC LIMIT ?"
+        linhas = self._conexao_leitura().execute(sql, parametros + [limite]).fetchall()
+        trades = [dict(zip(('id',) + COLUNAS, linha)) for linha in linhas]
+        proximo = trades[-1]['id'] if len(trades) == limite else None
+        return trades, proximo
+
+    def _conexao_leitura(self):
+        # conexão da thread: consultas e os registros síncronos de ordens assíncronas
+        conn = getattr(self._leitura, 'conn', None)
+        if conn is None:
+            conn = self._conectar()
+            self._leitura.conn = conn
+        return conn
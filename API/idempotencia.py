@@ -0,0 +1,82 @@
+# API/idempotencia.py
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+def chave_do_sinal(dados):
+    """Deriva uma chave do conteúdo do sinal (JSON canônico); None se não houver corpo."""
+    if dados is None:
+        return None
+    canonico = json.dumps(dados, sort_keys=True, separators=(',', ':'), default=str)
+    return 'sha256:' + hashlib.sha256(canonico.encode()).hexdigest()
+
+
+class CacheIdempotencia:
+    """
+    Cache limitado com TTL de requisições já vistas, por chave de idempotência.
+    Estados: em andamento (reservada, sem resultado) ou concluída (com o resultado guardado).
+    Com `historico` (HistoricoTrades) as chaves ficam no SQLite, compartilhadas entre os workers,
+    e o resultado precisa ser serializável por marshal.
+    """
+    def __init__(self, ttl=120.0, max_itens=10000, historico=None):
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self.historico = historico
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def reservar(self, chave):
+        """
+        Retorna ('novo', None) e reserva a chave, ('em_andamento', None) se a original ainda
+        está executando, ou ('concluido', resultado) com o resultado guardado.
+        """
+        if self.historico is not None:
+            return self.historico.reservar_chave(chave, self.ttl, self.max_itens)
+        agora = time.time()
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is not None and item['expira_em'] > agora:
+                if item['resultado'] is None:
+                    return 'em_andamento', None
+                return 'concluido', item['resultado']
+            self._itens.pop(chave, None)
+            self._itens[chave] = {'resultado': None, 'expira_em': agora + self.ttl}
+            self._limpar(agora)
+            return 'novo', None
+
+    def concluir(self, chave, resultado):
+        if self.historico is not None:
+            return self.historico.concluir_chave(chave, resultado, self.ttl)
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is not None:
+                item['resultado'] = resultado
+                item['expira_em'] = time.time() + self.ttl
+                # mantém a ordem do dicionário igual à ordem de expiração
+                self._itens.move_to_end(chave)
+
+    def liberar(self, chave):
+        """Descarta a reserva (resultado não deve ser reaproveitado, ex.: nada foi enviado)."""
+        if self.historico is not None:
+            return self.historico.liberar_chave(chave)
+        with self._lock:
+            self._itens.pop(chave, None)
+
+    def __len__(self):
+        return len(self._itens)
+
+    def _limpar(self, agora):
+        # os primeiros itens são os que expiram antes; reservas em andamento só saem ao expirar
+        excesso = len(self._itens) - self.max_itens
+        remover = []
+        for chave, item in self._itens.items():
+            if item['expira_em'] > agora and excesso <= 0:
+                break
+            if item['expira_em'] <= agora or item['resultado'] is not None:
+                remover.append(chave)
+                excesso -= 1
+        for chave in remover:
+            del self._itens[chave]
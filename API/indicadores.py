@@ -0,0 +1,327 @@
+# API/indicadores.py
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# tamanho dos blocos do filtro exponencial vetorizado (mantém q**-BLOCO dentro do float64)
+BLOCO = 64
+
+
+def _filtro(x, alpha, inicial):
+    """
+    y[t] = (1 - alpha) * y[t-1] + alpha * x[t], com y[-1] = inicial (EMA/média de Wilder).
+    Vetorizado por blocos: y[k] = q^(k+1) * (inicial + alpha * Σ x[i] / q^(i+1)).
+    """
+    x = np.asarray(x, dtype=float)
+    q = 1.0 - alpha
+    if q <= 0:
+        return x.copy()
+    y = np.empty(len(x))
+    carry = inicial
+    for inicio in range(0, len(x), BLOCO):
+        bloco = x[inicio:inicio + BLOCO]
+        pesos = q ** np.arange(1, len(bloco) + 1)
+        y_bloco = pesos * (carry + alpha * np.cumsum(bloco / pesos))
+        y[inicio:inicio + len(bloco)] = y_bloco
+        carry = y_bloco[-1]
+    return y
+
+
+def _vazio(n):
+    return np.full(n, np.nan)
+
+
+def _ema_serie(x, periodo):
+    """EMA semeada pela média simples dos primeiros `periodo` valores (NaN antes disso)."""
+    y = _vazio(len(x))
+    if len(x) >= periodo:
+        y[periodo - 1] = x[:periodo].mean()
+        y[periodo:] = _filtro(x[periodo:], 2.0 / (periodo + 1), y[periodo - 1])
+    return y
+
+
+class Indicador:
+    """
+    `calcular(dados)` processa a série inteira; `continuar(dados, inicio, estado)` recalcula só
+    a partir de `inicio`, usando o estado em `inicio - 1`. Ambos retornam (saídas, internos):
+    arrays alinhados aos candles processados, de onde o estado de qualquer posição é lido.
+    """
+    parametros = ()
+
+    def __init__(self, *valores):
+        self.valores = valores
+
+    @property
+    def chave(self):
+        return ':'.join([self.nome] + [f"{v:g}" for v in self.valores])
+
+    # candles necessários antes da posição recalculada por `continuar`
+    @property
+    def minimo(self):
+        return 1
+
+
+class SMA(Indicador):
+    nome, padrao = 'sma', (20,)
+
+    @property
+    def minimo(self):
+        return int(self.valores[0])
+
+    def _janela(self, c):
+        periodo = int(self.valores[0])
+        y = _vazio(len(c))
+        if len(c) >= periodo:
+            y[periodo - 1:] = sliding_window_view(c, periodo).mean(axis=1)
+        return y
+
+    def calcular(self, d):
+        return {'valor': self._janela(d['close'])}, ()
+
+    def continuar(self, d, inicio, estado):
+        # sem estado recursivo: basta a janela que termina em cada candle recalculado
+        recuo = self.minimo - 1
+        return {'valor': self._janela(d['close'][inicio - recuo:])[recuo:]}, ()
+
+
+class Bollinger(SMA):
+    nome, padrao = 'bollinger', (20, 2)
+
+    def _bandas(self, c):
+        periodo, desvios = int(self.valores[0]), float(self.valores[1])
+        media, desvio = _vazio(len(c)), _vazio(len(c))
+        if len(c) >= periodo:
+            janelas = sliding_window_view(c, periodo)
+            media[periodo - 1:] = janelas.mean(axis=1)
+            desvio[periodo - 1:] = janelas.std(axis=1)
+        return {'superior': media + desvios * desvio, 'media': media, 'inferior': media - desvios * desvio}
+
+    def calcular(self, d):
+        return self._bandas(d['close']), ()
+
+    def continuar(self, d, inicio, estado):
+        recuo = self.minimo - 1
+        return {k: v[recuo:] for k, v in self._bandas(d['close'][inicio - recuo:]).items()}, ()
+
+
+class EMA(Indicador):
+    nome, padrao = 'ema', (20,)
+
+    def calcular(self, d):
+        y = _ema_serie(d['close'], int(self.valores[0]))
+        return {'valor': y}, (y,)
+
+    def continuar(self, d, inicio, estado):
+        y = _filtro(d['close'][inicio:], 2.0 / (int(self.valores[0]) + 1), estado[0])
+        return {'valor': y}, (y,)
+
+
+class RSI(Indicador):
+    nome, padrao = 'rsi', (14,)
+
+    @staticmethod
+    def _rsi(ganho, perda):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(perda == 0, 100.0, 100.0 - 100.0 / (1.0 + ganho / perda))
+
+    def calcular(self, d):
+        c, periodo = d['close'], int(self.valores[0])
+        ganho, perda = _vazio(len(c)), _vazio(len(c))
+        if len(c) > periodo:
+            delta = np.diff(c)
+            ganhos, perdas = np.clip(delta, 0, None), np.clip(-delta, 0, None)
+            ganho[periodo], perda[periodo] = ganhos[:periodo].mean(), perdas[:periodo].mean()
+            ganho[periodo + 1:] = _filtro(ganhos[periodo:], 1.0 / periodo, ganho[periodo])
+            perda[periodo + 1:] = _filtro(perdas[periodo:], 1.0 / periodo, perda[periodo])
+        return {'valor': self._rsi(ganho, perda)}, (ganho, perda)
+
+    def continuar(self, d, inicio, estado):
+        c, periodo = d['close'], int(self.valores[0])
+        delta = np.diff(c[inicio - 1:])
+        ganho = _filtro(np.clip(delta, 0, None), 1.0 / periodo, estado[0])
+        perda = _filtro(np.clip(-delta, 0, None), 1.0 / periodo, estado[1])
+        return {'valor': self._rsi(ganho, perda)}, (ganho, perda)
+
+
+class MACD(Indicador):
+    nome, padrao = 'macd', (12, 26, 9)
+
+    def calcular(self, d):
+        c = d['close']
+        rapida, lenta, sinal = (int(v) for v in self.valores)
+        ema_rapida, ema_lenta = _ema_serie(c, rapida), _ema_serie(c, lenta)
+        macd = ema_rapida - ema_lenta
+        linha_sinal = _vazio(len(c))
+        validos = macd[lenta - 1:]
+        if len(validos) >= sinal:
+            linha_sinal[lenta - 1:] = _ema_serie(validos, sinal)
+        saidas = {'macd': macd, 'sinal': linha_sinal, 'histograma': macd - linha_sinal}
+        return saidas, (ema_rapida, ema_lenta, linha_sinal)
+
+    def continuar(self, d, inicio, estado):
+        c = d['close'][inicio:]
+        rapida, lenta, sinal = (int(v) for v in self.valores)
+        ema_rapida = _filtro(c, 2.0 / (rapida + 1), estado[0])
+        ema_lenta = _filtro(c, 2.0 / (lenta + 1), estado[1])
+        macd = ema_rapida - ema_lenta
+        linha_sinal = _filtro(macd, 2.0 / (sinal + 1), estado[2])
+        saidas = {'macd': macd, 'sinal': linha_sinal, 'histograma': macd - linha_sinal}
+        return saidas, (ema_rapida, ema_lenta, linha_sinal)
+
+
+class ATR(Indicador):
+    nome, padrao = 'atr', (14,)
+
+    @staticmethod
+    def _true_range(d, inicio):
+        anterior = d['close'][inicio - 1:-1]
+        maxima, minima = d['max'][inicio:], d['min'][inicio:]
+        return np.maximum(maxima - minima, np.maximum(np.abs(maxima - anterior), np.abs(minima - anterior)))
+
+    def calcular(self, d):
+        periodo = int(self.valores[0])
+        atr = _vazio(len(d['close']))
+        if len(atr) > periodo:
+            tr = self._true_range(d, 1)
+            atr[periodo] = tr[:periodo].mean()
+            atr[periodo + 1:] = _filtro(tr[periodo:], 1.0 / periodo, atr[periodo])
+        return {'valor': atr}, (atr,)
+
+    def continuar(self, d, inicio, estado):
+        atr = _filtro(self._true_range(d, inicio), 1.0 / int(self.valores[0]), estado[0])
+        return {'valor': atr}, (atr,)
+
+
+INDICADORES = {cls.nome: cls for cls in (SMA, EMA, RSI, Bollinger, MACD, ATR)}
+
+
+def interpretar_indicador(especificacao):
+    """'rsi', 'ema:9', 'bollinger:20:2', 'macd:12:26:9' -> instância do indicador (ValueError se inválido)."""
+    nome, *valores = str(especificacao).strip().lower().split(':')
+    cls = INDICADORES.get(nome)
+    if cls is None:
+        raise ValueError(f"Indicador desconhecido: {nome} (disponíveis: {', '.join(INDICADORES)})")
+    if len(valores) > len(cls.padrao):
+        raise ValueError(f"Parâmetros demais para {nome}: use {nome}:{':'.join(map(str, cls.padrao))}")
+    try:
+        numeros = [float(v) for v in valores]
+    except ValueError:
+        raise ValueError(f"Parâmetros inválidos em {especificacao}")
+    numeros += list(cls.padrao[len(numeros):])
+    # períodos são inteiros positivos; só o desvio das bandas de Bollinger é fracionário
+    for i, valor in enumerate(numeros):
+        if valor <= 0 or (not (cls is Bollinger and i == 1) and valor != int(valor)):
+            raise ValueError(f"Parâmetros inválidos em {especificacao}")
+    return cls(*numeros)
+
+
+def _arrays(candles):
+    return {
+        'from': np.array([c['from'] for c in candles], dtype=np.int64),
+        'close': np.array([c['close'] for c in candles], dtype=float),
+        'max': np.array([c['max'] for c in candles], dtype=float),
+        'min': np.array([c['min'] for c in candles], dtype=float),
+    }
+
+
+def _estado(internos, posicao):
+    return tuple(float(arr[posicao]) for arr in internos)
+
+
+class CalculadoraIndicadores:
+    """
+    Calcula indicadores sobre as séries de candles e guarda, por (ativo, timeframe), os candles,
+    as saídas e o estado de cada indicador no penúltimo candle. Numa nova consulta em que só o
+    último candle mudou (ou chegaram candles novos), recalcula apenas a cauda a partir desse estado.
+    Séries menos usadas são descartadas (LRU).
+    """
+    def __init__(self, max_series=256):
+        self.max_series = max_series
+        self._series = OrderedDict()
+        self._lock = threading.Lock()
+        self.incrementais = 0
+        self.completos = 0
+
+    def calcular(self, ativo, timeframe, candles, indicadores):
+        """Retorna {'from': array, chave_do_indicador: {saida: array}} alinhado aos candles recebidos."""
+        novos = _arrays(candles)
+        quantidade = len(novos['from'])
+        chave = (ativo, int(timeframe))
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is not None:
+                self._series.move_to_end(chave)
+            dados, inicio = self._alinhar(serie, novos)
+            resultados = {}
+            for indicador in indicadores:
+                anterior = serie['resultados'].get(indicador.chave) if inicio is not None else None
+                estado = anterior[1] if anterior else None
+                if estado is not None and inicio >= indicador.minimo and not any(np.isnan(estado)):
+                    saidas, internos = indicador.continuar(dados, inicio, estado)
+                    saidas = {k: np.concatenate([anterior[0][k][:inicio], v]) for k, v in saidas.items()}
+                    posicao = len(dados['close']) - 2 - inicio
+                    estado = estado if posicao < 0 else _estado(internos, posicao)
+                    self.incrementais += 1
+                else:
+                    saidas, internos = indicador.calcular(dados)
+                    estado = _estado(internos, len(dados['close']) - 2) if len(dados['close']) >= 2 else None
+                    self.completos += 1
+                resultados[indicador.chave] = (saidas, estado)
+            if inicio is not None and np.array_equal(dados['from'], serie['dados']['from']):
+                # sem candle novo, os indicadores não pedidos agora continuam válidos até o penúltimo candle
+                resultados = {**serie['resultados'], **resultados}
+
+            # mantém só os últimos `quantidade` candles (o estado recursivo não depende dos descartados)
+            corte = len(dados['from']) - quantidade
+            dados = {k: v[corte:] for k, v in dados.items()}
+            resultados = {k: ({s: v[corte:] for s, v in saidas.items()}, estado)
+                          for k, (saidas, estado) in resultados.items()}
+            self._series[chave] = {'dados': dados, 'resultados': resultados}
+            while len(self._series) > self.max_series:
+                self._series.popitem(last=False)
+        saida = {'from': dados['from']}
+        for indicador in indicadores:
+            saida[indicador.chave] = resultados[indicador.chave][0]
+        return saida
+
+    @staticmethod
+    def _alinhar(serie, novos):
+        """
+        Junta a série em cache com os candles novos. Retorna (dados, inicio), onde `inicio` é a
+        primeira posição que mudou, ou (novos, None) quando é preciso recalcular tudo.
+        """
+        if serie is None:
+            return novos, None
+        antigos = serie['dados']
+        n = len(antigos['from'])
+        if n < 2 or not len(novos['from']):
+            return novos, None
+        # posição do último candle em cache (possivelmente ainda aberto) entre os novos
+        j = int(np.searchsorted(novos['from'], antigos['from'][-1]))
+        if j >= len(novos['from']) or novos['from'][j] != antigos['from'][-1] or j > n - 1:
+            return novos, None
+        # candles fechados que aparecem nos dois lados precisam ser idênticos
+        for campo in ('from', 'close', 'max', 'min'):
+            if not np.array_equal(novos[campo][:j], antigos[campo][n - 1 - j:n - 1]):
+                return novos, None
+        dados = {k: np.concatenate([antigos[k][:n - 1], novos[k][j:]]) for k in novos}
+        return dados, n - 1
+
+    def estatisticas(self):
+        with self._lock:
+            return {'series': len(self._series), 'incrementais': self.incrementais, 'completos': self.completos}
+
+
+def serializar(saida, pontos):
+    """Últimos `pontos` valores de cada saída, com NaN (período ainda incompleto) como None."""
+    def lista(arr):
+        return [None if np.isnan(v) else round(float(v), 6) for v in arr[-pontos:]]
+
+    resultado = {'from': [int(v) for v in saida['from'][-pontos:]]}
+    for chave, saidas in saida.items():
+        if chave == 'from':
+            continue
+        resultado[chave] = lista(saidas['valor']) if list(saidas) == ['valor'] else {k: lista(v) for k, v in saidas.items()}
+    return resultado
@@ -0,0 +1,119 @@
+# API/limitador.py
+import heapq
+import itertools
+import threading
+import time
+
+from API.metricas import LIMITE_DESCARTADAS, LIMITE_ESPERA, LIMITE_FILA
+
+# prioridades das chamadas ao broker (menor = mais urgente)
+PRIORIDADE_ORDEM = 0    # compra e o saldo lido no caminho do trade
+PRIORIDADE_LEITURA = 1  # candles, saldos e perfil pedidos pelos clientes
+PRIORIDADE_FUNDO = 2    # tarefas em background (catálogo de ativos)
+# fração do balde que cada prioridade não pode usar
+RESERVAS_PADRAO = {PRIORIDADE_ORDEM: 0.0, PRIORIDADE_LEITURA: 0.5, PRIORIDADE_FUNDO: 0.75}
+NOMES_PRIORIDADE = {PRIORIDADE_ORDEM: 'ordem', PRIORIDADE_LEITURA: 'leitura', PRIORIDADE_FUNDO: 'fundo'}
+
+
+class BrokerSobrecarregado(Exception):
+    """Chamada descartada pelo limitador: o orçamento de chamadas ao broker está esgotado."""
+    def __init__(self, prioridade, retry_after):
+        self.prioridade = prioridade
+        self.retry_after = retry_after
+        super().__init__(f"Limite de chamadas ao broker atingido ({NOMES_PRIORIDADE.get(prioridade, prioridade)}); "
+                         f"tente novamente em {retry_after:.1f}s")
+
+
+class LimitadorBroker:
+    """
+    Token bucket com prioridades para as chamadas ao broker.
+    `taxa` chamadas/s repõem um balde de `rajada` tokens. Cada prioridade só consome tokens
+    enquanto sobrar mais que a sua reserva (fração do balde guardada para as mais urgentes),
+    então leituras passam a esperar quando o orçamento fica baixo e são descartadas
+    após `esperas[prioridade]` segundos; ordens usam o balde inteiro e furam a fila.
+    """
+    def __init__(self, taxa, rajada=None, reservas=None, esperas=None):
+        self.taxa = float(taxa)
+        self.rajada = max(float(rajada or self.taxa), 1.0)
+        self.reservas = dict(RESERVAS_PADRAO)
+        self.reservas.update(reservas or {})
+        self.esperas = {PRIORIDADE_ORDEM: 30.0, PRIORIDADE_LEITURA: 2.0, PRIORIDADE_FUNDO: 10.0}
+        self.esperas.update(esperas or {})
+        self._tokens = self.rajada
+        self._reposto_em = time.monotonic()
+        self._fila = []  # heap de (prioridade, ordem de chegada)
+        self._chegadas = itertools.count()
+        self._cond = threading.Condition()
+
+    @staticmethod
+    def rajada_minima(reservas=None):
+        """Menor balde em que toda prioridade ainda alcança um token acima da sua reserva."""
+        maior = max({**RESERVAS_PADRAO, **(reservas or {})}.values())
+        return 1.0 / (1.0 - maior) if maior < 1 else float('inf')
+
+    @property
+    def ativo(self):
+        return self.taxa > 0
+
+    def _repor(self, agora):
+        self._tokens = min(self.rajada, self._tokens + (agora - self._reposto_em) * self.taxa)
+        self._reposto_em = agora
+
+    def adquirir(self, prioridade=PRIORIDADE_LEITURA):
+        """Consome um token, esperando a vez; retorna a espera em segundos ou levanta BrokerSobrecarregado."""
+        if not self.ativo:
+            return 0.0
+        inicio = time.monotonic()
+        # num balde pequeno a reserva passaria da capacidade e a prioridade nunca seria atendida:
+        # no pior caso ela espera o balde encher
+        minimo = min(1.0 + self.reservas.get(prioridade, 0.0) * self.rajada, self.rajada)
+        limite = inicio + self.esperas.get(prioridade, 0.0)
+        nome = NOMES_PRIORIDADE.get(prioridade, str(prioridade))
+        with self._cond:
+            self._repor(inicio)
+            if not self._fila and self._tokens >= minimo:
+                self._tokens -= 1
+                LIMITE_ESPERA.observar(0.0, nome)
+                return 0.0
+            entrada = (prioridade, next(self._chegadas))
+            heapq.heappush(self._fila, entrada)
+            LIMITE_FILA.inc(nome)
+            try:
+                while True:
+                    agora = time.monotonic()
+                    self._repor(agora)
+                    # só a primeira da fila (mais urgente, depois a mais antiga) consome
+                    if self._fila[0] == entrada and self._tokens >= minimo:
+                        self._tokens -= 1
+                        espera = agora - inicio
+                        LIMITE_ESPERA.observar(espera, nome)
+                        return espera
+                    falta = max(minimo - self._tokens, 0.0) / self.taxa
+                    if agora + falta > limite:
+                        LIMITE_DESCARTADAS.inc(nome)
+                        raise BrokerSobrecarregado(prioridade, max(falta, 1.0 / self.taxa))
+                    self._cond.wait(max(min(falta, limite - agora), 0.001))
+            finally:
+                self._fila.remove(entrada)
+                heapq.heapify(self._fila)
+                LIMITE_FILA.dec(nome)
+                self._cond.notify_all()
+
+    def disponivel(self):
+        with self._cond:
+            self._repor(time.monotonic())
+            return round(self._tokens, 2)
+
+    def estado(self):
+        with self._cond:
+            self._repor(time.monotonic())
+            fila = {}
+            for prioridade, _ in self._fila:
+                nome = NOMES_PRIORIDADE.get(prioridade, str(prioridade))
+                fila[nome] = fila.get(nome, 0) + 1
+            return {
+                'taxa': self.taxa,
+                'rajada': self.rajada,
+                'tokens': round(self._tokens, 2),
+                'fila': fila
+            }
@@ -0,0 +1,147 @@
+# API/logs.py
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+
+from API.metricas import LOGS_DESCARTADOS
+
+FORMATO_TEXTO = '%(asctime)s - %(levelname)s - %(message)s'
+
+_listener = None
+
+# marca um ponto de log ruidoso (polling, stream) como sujeito ao LimiteTaxa: logging.debug(..., extra=AMOSTRAR)
+AMOSTRAR = {'amostrar': True}
+
+
+class FormatoJSON(logging.Formatter):
+    """Uma linha JSON por registro: horário, nível, logger, mensagem, origem e exceção (se houver)."""
+    def format(self, record):
+        dados = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensagem': record.getMessage(),
+            'processo': record.process,
+            'thread': record.threadName,
+            'origem': f"{record.module}:{record.lineno}"
+        }
+        if getattr(record, 'suprimidas', 0):
+            dados['suprimidas'] = record.suprimidas
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            dados['excecao'] = record.exc_text
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+class LimiteTaxa(logging.Filter):
+    """
+    Token bucket por ponto de log (logger + arquivo + linha), só para registros marcados com
+    extra=AMOSTRAR e abaixo de WARNING; os demais (auditoria de ordens, erros) passam sempre.
+    O que passa do limite é descartado; a próxima mensagem liberada do mesmo ponto leva `suprimidas`.
+    """
+    def __init__(self, taxa, rajada=None, nivel_maximo=logging.INFO):
+        super().__init__()
+        self.taxa = float(taxa)
+        self.rajada = float(rajada or max(self.taxa, 1.0))
+        self.nivel_maximo = nivel_maximo
+        self._baldes = {}  # ponto -> [tokens, atualizado_em, suprimidas]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if self.taxa <= 0 or record.levelno > self.nivel_maximo or not getattr(record, 'amostrar', False):
+            return True
+        ponto = (record.name, record.pathname, record.lineno)
+        agora = time.monotonic()
+        with self._lock:
+            balde = self._baldes.get(ponto)
+            if balde is None:
+                balde = self._baldes[ponto] = [self.rajada, agora, 0]
+            balde[0] = min(self.rajada, balde[0] + (agora - balde[1]) * self.taxa)
+            balde[1] = agora
+            if balde[0] < 1:
+                balde[2] += 1
+                LOGS_DESCARTADOS.inc('limite')
+                return False
+            balde[0] -= 1
+            record.suprimidas, balde[2] = balde[2], 0
+        return True
+
+
+class FilaLogs(logging.handlers.QueueHandler):
+    """QueueHandler que não bloqueia nem imprime erro quando a fila está cheia: descarta e conta."""
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOGS_DESCARTADOS.inc('fila_cheia')
+
+    def prepare(self, record):
+        # só o necessário na thread da requisição: a mensagem final e o traceback em texto
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configurar_logs(nome='bot-trader', nivel=None, formato=FORMATO_TEXTO):
+    """
+    Liga o pipeline de logs do processo: os registros entram numa fila em memória e uma thread grava
+    JSON lines em arquivos rotativos (LOG_DIR) e, opcionalmente, texto no stderr.
+    Chamadas repetidas no mesmo processo não fazem nada.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+    nivel = nivel or os.getenv('LOG_LEVEL', 'INFO').upper()
+    destinos = []
+    diretorio = os.getenv('LOG_DIR', 'logs')
+    if diretorio:
+        os.makedirs(diretorio, exist_ok=True)
+        # com vários workers cada processo tem o seu arquivo: a rotação não é segura entre processos
+        arquivo = f"{nome}-{os.getpid()}.jsonl" if int(os.getenv('WEB_CONCURRENCY', '1') or '1') > 1 else f"{nome}.jsonl"
+        rotativo = logging.handlers.RotatingFileHandler(
+            os.path.join(diretorio, arquivo),
+            maxBytes=int(float(os.getenv('LOG_MAX_MB', '20') or '20') * 1024 * 1024),
+            backupCount=int(os.getenv('LOG_BACKUPS', '5') or '5'),
+            encoding='utf-8'
+        )
+        rotativo.setFormatter(FormatoJSON())
+        destinos.append(rotativo)
+    if os.getenv('LOG_STDERR', 'true').lower() == 'true':
+        console = logging.StreamHandler()
+        console.setFormatter(logging.Formatter(formato))
+        destinos.append(console)
+
+    fila = FilaLogs(queue.Queue(maxsize=int(os.getenv('LOG_QUEUE_SIZE', '10000') or '0')))
+    fila.addFilter(LimiteTaxa(float(os.getenv('LOG_RATE_LIMIT', '5') or '0'),
+                              float(os.getenv('LOG_RATE_BURST', '20') or '0')))
+    raiz = logging.getLogger()
+    for handler in list(raiz.handlers):
+        raiz.removeHandler(handler)
+    raiz.addHandler(fila)
+    raiz.setLevel(nivel)
+
+    _listener = logging.handlers.QueueListener(fila.queue, *destinos, respect_handler_level=True)
+    _listener.start()
+    atexit.register(encerrar_logs)
+    return _listener
+
+
+def encerrar_logs():
+    """Esvazia a fila e para a thread de escrita (chamado no atexit)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+# marca um ponto de log ruidoso (polling, stream) como sujeito ao LimiteTaxa: logging.debug(..., extra=AMOSTRAR)
+AMOSTRAR = {'amostrar': True}
@@ -0,0 +1,302 @@
+# API/metricas.py
+import bisect
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# limites (segundos) dos buckets de latência: de 0,5 ms a 10 s
+BUCKETS_LATENCIA = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _formatar_rotulos(nomes, valores, extra=None):
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _formatar_valor(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def _com_worker(rotulos, worker):
+    extra = f'worker="{_escapar(worker)}"'
+    return '{' + extra + '}' if not rotulos else rotulos[:-1] + ',' + extra + '}'
+
+
+def agregar(diretorio, validade=None):
+    """
+    Junta as métricas gravadas pelos workers em `diretorio`: contadores e histogramas são somados
+    (os de workers já encerrados continuam contando); medidores saem um por worker, com o rótulo
+    `worker`, e os de arquivos sem atualização há mais de `validade` segundos são ignorados.
+    """
+    agora = time.time()
+    ordem, familias = [], {}
+    for arquivo in sorted(glob.glob(os.path.join(diretorio, 'metricas-*.json'))):
+        try:
+            with open(arquivo, encoding='utf-8') as f:
+                dados = json.load(f)
+            idade = agora - os.path.getmtime(arquivo)
+        except (OSError, ValueError):
+            continue  # worker removido no meio da leitura
+        for nome, tipo, ajuda, amostras in dados['metricas']:
+            if nome not in familias:
+                familias[nome] = (tipo, ajuda, {})
+                ordem.append(nome)
+            valores = familias[nome][2]
+            if tipo == 'gauge':
+                if validade and idade > validade:
+                    continue
+                for amostra, rotulos, valor in amostras:
+                    valores[(amostra, _com_worker(rotulos, dados['worker']))] = valor
+            else:
+                for amostra, rotulos, valor in amostras:
+                    valores[(amostra, rotulos)] = valores.get((amostra, rotulos), 0) + valor
+    return [(nome, familias[nome][0], familias[nome][1], [(a, r, v) for (a, r), v in familias[nome][2].items()])
+            for nome in ordem]
+
+
+class Contador:
+    """Contador monotônico por conjunto de rótulos."""
+    tipo = 'counter'
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome, self.ajuda, self.rotulos = nome, ajuda, tuple(rotulos)
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *rotulos, valor=1):
+        with self._lock:
+            self._valores[rotulos] = self._valores.get(rotulos, 0) + valor
+
+    def valor(self, *rotulos):
+        return self._valores.get(rotulos, 0)
+
+    def amostras(self):
+        with self._lock:
+            itens = list(self._valores.items())
+        for rotulos, valor in itens:
+            yield self.nome, _formatar_rotulos(self.rotulos, rotulos), valor
+
+
+class Medidor:
+    """Valor instantâneo (gauge). Com `funcao`, o valor é lido na hora da coleta."""
+    tipo = 'gauge'
+
+    def __init__(self, nome, ajuda, rotulos=(), funcao=None):
+        self.nome, self.ajuda, self.rotulos = nome, ajuda, tuple(rotulos)
+        self.funcao = funcao
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def definir(self, valor, *rotulos):
+        with self._lock:
+            self._valores[rotulos] = valor
+
+    def inc(self, *rotulos, valor=1):
+        with self._lock:
+            self._valores[rotulos] = self._valores.get(rotulos, 0) + valor
+
+    def dec(self, *rotulos, valor=1):
+        self.inc(*rotulos, valor=-valor)
+
+    def valor(self, *rotulos):
+        return self._valores.get(rotulos, 0)
+
+    def amostras(self):
+        if self.funcao is not None:
+            try:
+                yield self.nome, '', self.funcao()
+            except Exception:
+                pass
+            return
+        with self._lock:
+            itens = list(self._valores.items())
+        for rotulos, valor in itens:
+            yield self.nome, _formatar_rotulos(self.rotulos, rotulos), valor
+
+
+class Histograma:
+    """Histograma de buckets fixos; cada observação custa um bisect e um incremento."""
+    tipo = 'histogram'
+
+    def __init__(self, nome, ajuda, rotulos=(), buckets=BUCKETS_LATENCIA):
+        self.nome, self.ajuda, self.rotulos = nome, ajuda, tuple(rotulos)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor, *rotulos):
+        indice = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(rotulos)
+            if serie is None:
+                # [contagem por bucket (+Inf no fim), soma, total]
+                serie = self._series[rotulos] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            serie[0][indice] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    @contextmanager
+    def medir(self, *rotulos):
+        """Observa a duração do bloco, mesmo quando ele lança exceção."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, *rotulos)
+
+    def contagem(self, *rotulos):
+        serie = self._series.get(rotulos)
+        return serie[2] if serie else 0
+
+    def amostras(self):
+        with self._lock:
+            itens = [(r, list(s[0]), s[1], s[2]) for r, s in self._series.items()]
+        for rotulos, contagens, soma, total in itens:
+            acumulado = 0
+            for limite, contagem in zip(self.buckets + (float('inf'),), contagens):
+                acumulado += contagem
+                le = '+Inf' if limite == float('inf') else repr(limite)
+                yield self.nome + '_bucket', _formatar_rotulos(self.rotulos, rotulos, f'le="{le}"'), acumulado
+            yield self.nome + '_sum', _formatar_rotulos(self.rotulos, rotulos), soma
+            yield self.nome + '_count', _formatar_rotulos(self.rotulos, rotulos), total
+
+
+class RegistroMetricas:
+    """
+    Conjunto de métricas exportado no formato texto do Prometheus.
+    Com vários workers, cada um grava as suas num diretório compartilhado (`iniciar_gravacao`) e
+    `exportar(diretorio)` responde com o agregado de todos, em qualquer worker que receber o scrape.
+    """
+    def __init__(self, worker=None):
+        self.worker = worker  # identifica o arquivo do processo; padrão: o pid
+        self._metricas = {}
+        self._lock = threading.Lock()
+
+    def _registrar(self, metrica):
+        with self._lock:
+            existente = self._metricas.get(metrica.nome)
+            if existente is not None:
+                return existente
+            self._metricas[metrica.nome] = metrica
+            return metrica
+
+    def contador(self, nome, ajuda, rotulos=()):
+        return self._registrar(Contador(nome, ajuda, rotulos))
+
+    def medidor(self, nome, ajuda, rotulos=(), funcao=None):
+        return self._registrar(Medidor(nome, ajuda, rotulos, funcao))
+
+    def histograma(self, nome, ajuda, rotulos=(), buckets=BUCKETS_LATENCIA):
+        return self._registrar(Histograma(nome, ajuda, rotulos, buckets))
+
+    def _coletar(self):
+        with self._lock:
+            metricas = list(self._metricas.values())
+        return [(m.nome, m.tipo, m.ajuda, list(m.amostras())) for m in metricas]
+
+    def gravar(self, diretorio):
+        """Grava as métricas deste processo em `diretorio` (troca atômica do arquivo)."""
+        worker = self.worker or str(os.getpid())
+        caminho = os.path.join(diretorio, f"metricas-{worker}.json")
+        with open(caminho + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'worker': worker, 'metricas': self._coletar()}, f)
+        os.replace(caminho + '.tmp', caminho)
+
+    def iniciar_gravacao(self, diretorio, intervalo=5.0):
+        """Thread que grava as métricas a cada `intervalo` segundos, para o agregado não depender do scrape."""
+        os.makedirs(diretorio, exist_ok=True)
+
+        def gravar_periodicamente():
+            while True:
+                try:
+                    self.gravar(diretorio)
+                except Exception as e:
+                    logging.error("Erro ao gravar métricas em %s: %s", diretorio, e)
+                time.sleep(intervalo)
+
+        threading.Thread(target=gravar_periodicamente, name='metricas', daemon=True).start()
+
+    def exportar(self, diretorio=None, validade=None):
+        """Texto do Prometheus; com `diretorio`, o agregado de todos os workers (ver agregar)."""
+        if diretorio:
+            self.gravar(diretorio)
+            familias = agregar(diretorio, validade)
+        else:
+            familias = self._coletar()
+        linhas = []
+        for nome_metrica, tipo, ajuda, amostras in familias:
+            linhas.append(f"# HELP {nome_metrica} {ajuda}")
+            linhas.append(f"# TYPE {nome_metrica} {tipo}")
+            for nome, rotulos, valor in amostras:
+                linhas.append(f"{nome}{rotulos} {_formatar_valor(valor)}")
+        return '\n'.join(linhas) + '\n'
+
+
+metricas = RegistroMetricas()
+
+ETAPAS_TRADE = metricas.histograma(
+    'bot_trade_etapa_segundos', 'Latência de cada etapa do caminho de trade', ('etapa',))
+CHAMADAS_BROKER = metricas.histograma(
+    'bot_broker_chamada_segundos', 'Latência das chamadas do Trader ao broker', ('operacao',))
+ERROS_BROKER = metricas.contador(
+    'bot_broker_erros_total', 'Chamadas ao broker que lançaram exceção', ('operacao',))
+RECONEXOES = metricas.contador(
+    'bot_reconexoes_total', 'Tentativas de reconexão ao broker', ('resultado',))
+ORDENS = metricas.contador(
+    'bot_ordens_total', 'Ordens enviadas ao broker por conta e resultado', ('conta', 'resultado'))
+ESPERA_LOCK = metricas.histograma(
+    'bot_lock_espera_segundos', 'Tempo de espera para adquirir os locks do caminho quente', ('lock',))
+AGUARDANDO_LOCK = metricas.medidor(
+    'bot_lock_aguardando', 'Threads aguardando cada lock neste momento', ('lock',))
+LIMITE_ESPERA = metricas.histograma(
+    'bot_broker_limite_espera_segundos', 'Espera no limitador de chamadas ao broker por prioridade', ('prioridade',))
+LIMITE_FILA = metricas.medidor(
+    'bot_broker_limite_fila', 'Chamadas aguardando token no limitador do broker', ('prioridade',))
+LIMITE_DESCARTADAS = metricas.contador(
+    'bot_broker_limite_descartadas_total', 'Chamadas descartadas pelo limitador do broker', ('prioridade',))
+LOGS_DESCARTADOS = metricas.contador(
+    'bot_logs_descartados_total', 'Registros de log descartados (limite por ponto de log ou fila cheia)', ('motivo',))
+REQUISICOES_HTTP = metricas.histograma(
+    'bot_http_requisicao_segundos', 'Latência das requisições HTTP por rota e status', ('rota', 'metodo', 'status'))
+
+
+@contextmanager
+def medir_lock(lock, nome):
+    """Adquire `lock` registrando o tempo de espera e quantas threads estão na fila por ele."""
+    if lock.acquire(blocking=False):
+        ESPERA_LOCK.observar(0.0, nome)
+    else:
+        AGUARDANDO_LOCK.inc(nome)
+        inicio = time.perf_counter()
+        try:
+            lock.acquire()
+        finally:
+            AGUARDANDO_LOCK.dec(nome)
+        ESPERA_LOCK.observar(time.perf_counter() - inicio, nome)
+    try:
+        yield
+    finally:
+        lock.release()
+
+
+@contextmanager
+def medir_broker(operacao):
+    """Mede uma chamada ao broker e conta as que terminam em exceção."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        ERROS_BROKER.inc(operacao)
+        raise
+    finally:
+        CHAMADAS_BROKER.observar(time.perf_counter() - inicio, operacao)
@@ -0,0 +1,113 @@
+# API/ordens.py
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+class FilaOrdens:
+    """
+    Fila de ordens em processo atendida por workers dedicados de envio ao broker.
+    `executar(ordem)` dimensiona e envia a ordem e retorna (trade_info, erro).
+    Estados: queued -> submitting -> submitted | rejected.
+    Com `historico` (API/historico.py) cada status também vai para o SQLite, e qualquer worker
+    do gunicorn responde pela ordem, não só o que a recebeu.
+    """
+    def __init__(self, executar, workers=4, max_fila=1000, max_registros=10000, historico=None):
+        self.executar = executar
+        self.max_registros = max_registros
+        self.historico = historico
+        self._fila = queue.Queue(maxsize=max_fila)
+        self._registros = OrderedDict()
+        self._lock = threading.Lock()
+        for i in range(workers):
+            threading.Thread(target=self._worker, name=f"ordens-{i}", daemon=True).start()
+
+    def enviar(self, ordem, client_order_id=None):
+        """Enfileira a ordem e retorna seu registro. Lança queue.Full se a fila estiver cheia."""
+        registro = {
+            'id': client_order_id or uuid.uuid4().hex,
+            'status': 'queued',
+            'order_id': None,
+            'mensagem': None,
+            'ordem': ordem,
+            'trade_info': None,
+            'timestamps': {'queued': time.time()}
+        }
+        with self._lock:
+            if registro['id'] in self._registros:
+                return dict(self._registros[registro['id']])
+        # gravado antes de entrar na fila: o 202 só sai quando todos os workers já enxergam a ordem
+        if self.historico is not None and not self.historico.criar_ordem(registro):
+            return self.historico.obter_ordem(registro['id'])
+        with self._lock:
+            if registro['id'] in self._registros:
+                return dict(self._registros[registro['id']])
+            self._registros[registro['id']] = registro
+            self._limpar()
+        try:
+            self._fila.put_nowait(registro['id'])
+        except queue.Full:
+            with self._lock:
+                self._registros.pop(registro['id'], None)
+            if self.historico is not None:
+                self.historico.remover_ordem(registro['id'])
+            raise
+        return self.obter(registro['id'])
+
+    def obter(self, id_ordem):
+        with self._lock:
+            registro = self._registros.get(id_ordem)
+            if registro is not None:
+                return self._copiar(registro)
+        return self.historico.obter_ordem(id_ordem) if self.historico is not None else None
+
+    @staticmethod
+    def _copiar(registro):
+        copia = dict(registro)
+        copia['timestamps'] = dict(registro['timestamps'])
+        return copia
+
+    def pendentes(self):
+        return self._fila.qsize()
+
+    def _atualizar(self, id_ordem, status, **campos):
+        with self._lock:
+            registro = self._registros.get(id_ordem)
+            if registro is None:
+                return None
+            registro['status'] = status
+            registro['timestamps'][status] = time.time()
+            registro.update(campos)
+            copia = self._copiar(registro)
+        if self.historico is not None:
+            self.historico.atualizar_ordem(copia)
+        return registro
+
+    def _limpar(self):
+        # descarta os registros mais antigos já finalizados quando passa do limite
+        excesso = len(self._registros) - self.max_registros
+        for id_ordem in list(self._registros):
+            if excesso <= 0:
+                break
+            if self._registros[id_ordem]['status'] in ('submitted', 'rejected'):
+                del self._registros[id_ordem]
+                excesso -= 1
+
+    def _worker(self):
+        while True:
+            id_ordem = self._fila.get()
+            registro = self._atualizar(id_ordem, 'submitting')
+            if registro is None:
+                continue
+            try:
+                trade_info, erro = self.executar(registro['ordem'])
+            except Exception as e:
+                logging.error("Erro ao enviar ordem %s: %s", id_ordem, e, exc_info=True)
+                trade_info, erro = None, str(e)
+            if erro:
+                self._atualizar(id_ordem, 'rejected', mensagem=erro, trade_info=trade_info)
+            else:
+                self._atualizar(id_ordem, 'submitted', order_id=trade_info.get('order_id'), trade_info=trade_info)
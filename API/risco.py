@@ -0,0 +1,273 @@
+# API/risco.py
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+# 0 desativa o limite
+LIMITES_PADRAO = {
+    'max_exposicao_percentual': 0.0,  # % da banca (saldo + ordens abertas) comprometida em ordens abertas
+    'max_posicoes': 0,                # ordens abertas por conta
+    'max_posicoes_por_ativo': 0,      # ordens abertas por conta e ativo
+    'max_perda_diaria': 0.0           # perda do dia (realizada + pior caso das abertas), na moeda da conta
+}
+
+# ordens sem liquidação até este tempo após expirar deixam de contar na exposição
+FOLGA_LIQUIDACAO = 600
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS risco_posicoes (
+    reserva INTEGER PRIMARY KEY AUTOINCREMENT,
+    tenant TEXT NOT NULL,
+    conta TEXT NOT NULL,
+    ativo TEXT NOT NULL,
+    valor REAL NOT NULL,
+    vence_em REAL NOT NULL,
+    order_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_risco_posicoes_vence_em ON risco_posicoes(tenant, vence_em);
+CREATE INDEX IF NOT EXISTS idx_risco_posicoes_order_id ON risco_posicoes(tenant, order_id);
+CREATE TABLE IF NOT EXISTS risco_totais (
+    tenant TEXT NOT NULL,
+    conta TEXT NOT NULL,
+    ativo TEXT NOT NULL,  -- '' = total da conta
+    posicoes INTEGER NOT NULL,
+    valor REAL NOT NULL,
+    PRIMARY KEY (tenant, conta, ativo)
+);
+CREATE TABLE IF NOT EXISTS risco_resultados (
+    tenant TEXT NOT NULL,
+    conta TEXT NOT NULL,
+    dia TEXT NOT NULL,
+    resultado REAL NOT NULL,
+    PRIMARY KEY (tenant, conta, dia)
+);
+CREATE TABLE IF NOT EXISTS risco_bloqueios (
+    tenant TEXT NOT NULL,
+    conta TEXT NOT NULL,  -- '' = todas as contas
+    motivo TEXT,
+    PRIMARY KEY (tenant, conta)
+);
+CREATE TABLE IF NOT EXISTS risco_limites (
+    tenant TEXT NOT NULL,
+    nome TEXT NOT NULL,
+    valor REAL NOT NULL,
+    PRIMARY KEY (tenant, nome)
+);
+"""
+
+
+class MotorRisco:
+    """
+    Checagem pré-trade contra limites de exposição, posições e perda diária, com kill switch.
+    A ordem aprovada reserva a exposição na hora (rajadas de sinais enxergam umas às outras);
+    a reserva é confirmada com o order_id, cancelada se o broker rejeitar e baixada na liquidação.
+    Com `caminho`, o estado fica num SQLite compartilhado pelos workers (e sobrevive ao processo),
+    separado por `tenant`; sem ele, num banco em memória deste processo.
+
+    Custo: cada reserva é uma transação `BEGIN IMMEDIATE`, que serializa as checagens de todos os
+    workers no lock de escrita do SQLite. Dentro dela só há leituras por chave primária (totais
+    mantidos por conta e por ativo, sem COUNT/SUM sobre as posições) e três gravações, então o custo
+    não cresce com as posições abertas: ~50-80 µs (p50) em arquivo, com p99 de até alguns ms quando o
+    commit espera o disco ou outro worker, contra ~2 µs dos contadores em memória de processo único
+    (benchmarks/benchmark_risco.py).
+    """
+    def __init__(self, limites=None, caminho=None, tenant='default'):
+        self.limites = dict(LIMITES_PADRAO)
+        self.limites.update({k: v for k, v in (limites or {}).items() if k in LIMITES_PADRAO})
+        self.tenant = tenant
+        self.caminho = caminho
+        if caminho and os.path.dirname(caminho):
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        # uma conexão por processo, usada sob o lock; entre processos vale o lock de escrita do SQLite
+        self._conn = sqlite3.connect(caminho or ':memory:', timeout=10, isolation_level=None, check_same_thread=False)
+        if caminho:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        novo = not self._conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'risco_totais'").fetchone()
+        self._conn.executescript(ESQUEMA)
+        if novo:
+            # banco de uma versão sem os totais: reconstrói a partir das posições abertas
+            self._conn.execute(
+                "INSERT INTO risco_totais SELECT tenant, conta, ativo, COUNT(*), SUM(valor) FROM risco_posicoes "
+                "GROUP BY tenant, conta, ativo UNION ALL "
+                "SELECT tenant, conta, '', COUNT(*), SUM(valor) FROM risco_posicoes GROUP BY tenant, conta")
+        self._lock = threading.Lock()
+
+    def _transacao(self, funcao, *args):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                resultado = funcao(*args)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return resultado
+
+    def reservar(self, tipo_conta, ativo, valor, saldo, duracao):
+        """Retorna (reserva, None) se a ordem pode seguir, ou (None, motivo)."""
+        return self._transacao(self._reservar, tipo_conta.upper(), ativo, valor, saldo, duracao)
+
+    def _reservar(self, conta, ativo, valor, saldo, duracao):
+        conn, tenant = self._conn, self.tenant
+        agora = time.time()
+        self._vencer(agora)
+        bloqueios = dict(conn.execute("SELECT conta, motivo FROM risco_bloqueios WHERE tenant = ? AND conta IN ('', ?)",
+                                      (tenant, conta)))
+        if '' in bloqueios:
+            return None, f"Kill switch ativo: {bloqueios[''] or 'trading suspenso'}"
+        if conta in bloqueios:
+            return None, f"Kill switch ativo na conta {conta}: {bloqueios[conta] or 'trading suspenso'}"
+        limites = self._limites()
+        totais = {a: (n, v) for a, n, v in conn.execute(
+            "SELECT ativo, posicoes, valor FROM risco_totais WHERE tenant = ? AND conta = ? AND ativo IN ('', ?)",
+            (tenant, conta, ativo))}
+        posicoes, exposicao = totais.get('', (0, 0.0))
+        resultado_dia = self._resultado_dia(conta)
+        if limites['max_perda_diaria'] and -resultado_dia + exposicao + valor > limites['max_perda_diaria']:
+            return None, (f"Limite de perda diária ({limites['max_perda_diaria']}) seria excedido: "
+                          f"resultado do dia {round(resultado_dia, 2)}, em aberto {round(exposicao, 2)}")
+        if limites['max_posicoes'] and posicoes + 1 > limites['max_posicoes']:
+            return None, f"Limite de {int(limites['max_posicoes'])} posições abertas atingido"
+        if limites['max_posicoes_por_ativo']:
+            no_ativo = totais.get(ativo, (0, 0.0))[0]
+            if no_ativo + 1 > limites['max_posicoes_por_ativo']:
+                return None, f"Limite de {int(limites['max_posicoes_por_ativo'])} posições abertas em {ativo} atingido"
+        if limites['max_exposicao_percentual'] and saldo is not None:
+            banca = saldo + exposicao
+            if exposicao + valor > banca * limites['max_exposicao_percentual'] / 100:
+                return None, (f"Exposição máxima de {limites['max_exposicao_percentual']}% da banca seria excedida "
+                              f"(em aberto {round(exposicao, 2)} + {valor})")
+
+        cursor = conn.execute(
+            "INSERT INTO risco_posicoes (tenant, conta, ativo, valor, vence_em) VALUES (?, ?, ?, ?, ?)",
+            (tenant, conta, ativo, valor, agora + duracao * 60 + FOLGA_LIQUIDACAO))
+        self._somar(conta, ativo, 1, valor)
+        return cursor.lastrowid, None
+
+    def _somar(self, conta, ativo, posicoes, valor):
+        # mantém os totais da conta ('') e do ativo junto com as posições, na mesma transação
+        for chave in ('', ativo):
+            self._conn.execute(
+                "INSERT INTO risco_totais (tenant, conta, ativo, posicoes, valor) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (tenant, conta, ativo) DO UPDATE SET posicoes = posicoes + excluded.posicoes, "
+                "valor = MAX(valor + excluded.valor, 0)",
+                (self.tenant, conta, chave, posicoes, valor))
+        if posicoes < 0:
+            self._conn.execute("DELETE FROM risco_totais WHERE tenant = ? AND conta = ? AND ativo IN ('', ?) "
+                               "AND posicoes <= 0", (self.tenant, conta, ativo))
+
+    def _baixar(self, reserva):
+        linha = self._conn.execute("SELECT conta, ativo, valor FROM risco_posicoes WHERE reserva = ? AND tenant = ?",
+                                   (reserva, self.tenant)).fetchone()
+        if linha is None:
+            return None
+        conta, ativo, valor = linha
+        self._conn.execute("DELETE FROM risco_posicoes WHERE reserva = ?", (reserva,))
+        self._somar(conta, ativo, -1, -valor)
+        return conta
+
+    def confirmar(self, reserva, order_id):
+        with self._lock:
+            self._conn.execute("UPDATE risco_posicoes SET order_id = ? WHERE reserva = ? AND tenant = ?",
+                               (str(order_id), reserva, self.tenant))
+
+    def cancelar(self, reserva):
+        """Libera a exposição de uma ordem que não chegou a abrir."""
+        self._transacao(self._baixar, reserva)
+
+    def liquidar(self, order_id, lucro):
+        """Baixa a posição e soma o resultado ao dia da conta."""
+        self._transacao(self._liquidar, str(order_id), lucro)
+
+    def _liquidar(self, order_id, lucro):
+        linha = self._conn.execute("SELECT reserva FROM risco_posicoes WHERE tenant = ? AND order_id = ?",
+                                   (self.tenant, order_id)).fetchone()
+        conta = self._baixar(linha[0]) if linha else None
+        if conta is None:
+            return
+        self._conn.execute(
+            "INSERT INTO risco_resultados (tenant, conta, dia, resultado) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (tenant, conta, dia) DO UPDATE SET resultado = resultado + excluded.resultado",
+            (self.tenant, conta, time.strftime('%Y-%m-%d'), lucro))
+
+    def _resultado_dia(self, conta):
+        linha = self._conn.execute("SELECT resultado FROM risco_resultados WHERE tenant = ? AND conta = ? AND dia = ?",
+                                   (self.tenant, conta, time.strftime('%Y-%m-%d'))).fetchone()
+        return linha[0] if linha else 0.0
+
+    def _limites(self):
+        limites = dict(self.limites)
+        for nome, valor in self._conn.execute("SELECT nome, valor FROM risco_limites WHERE tenant = ?", (self.tenant,)):
+            if nome in LIMITES_PADRAO:
+                limites[nome] = type(LIMITES_PADRAO[nome])(valor)
+        return limites
+
+    def _vencer(self, agora):
+        # índice por vencimento: só as posições vencidas são lidas, na ordem em que vencem
+        vencidas = self._conn.execute("SELECT reserva, order_id FROM risco_posicoes WHERE tenant = ? AND vence_em <= ?",
+                                      (self.tenant, agora)).fetchall()
+        for reserva, order_id in vencidas:
+            self._baixar(reserva)
+            logging.warning("Posição %s sem liquidação após expirar; removida da exposição.", order_id or reserva)
+
+    def ativar_kill_switch(self, motivo=None, tipo_conta=None):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO risco_bloqueios (tenant, conta, motivo) VALUES (?, ?, ?)",
+                               (self.tenant, (tipo_conta or '').upper(), motivo))
+        logging.warning("Kill switch ativado%s: %s", f" na conta {tipo_conta.upper()}" if tipo_conta else '', motivo)
+
+    def desativar_kill_switch(self, tipo_conta=None):
+        with self._lock:
+            self._conn.execute("DELETE FROM risco_bloqueios WHERE tenant = ? AND conta = ?",
+                               (self.tenant, (tipo_conta or '').upper()))
+        logging.warning("Kill switch desativado%s", f" na conta {tipo_conta.upper()}" if tipo_conta else '')
+
+    def atualizar_limites(self, **limites):
+        invalidos = [k for k in limites if k not in LIMITES_PADRAO]
+        if invalidos:
+            raise ValueError(f"Limites desconhecidos: {', '.join(invalidos)}")
+        valores = {k: type(LIMITES_PADRAO[k])(v) for k, v in limites.items()}
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO risco_limites (tenant, nome, valor) VALUES (?, ?, ?)",
+                                   [(self.tenant, k, v) for k, v in valores.items()])
+            return self._limites()
+
+    def estado(self):
+        return self._transacao(self._estado)
+
+    def _estado(self):
+        conn, tenant = self._conn, self.tenant
+        hoje = time.strftime('%Y-%m-%d')
+        self._vencer(time.time())
+        conn.execute("DELETE FROM risco_resultados WHERE tenant = ? AND dia < ?", (tenant, hoje))
+        bloqueios = dict(conn.execute("SELECT conta, motivo FROM risco_bloqueios WHERE tenant = ?", (tenant,)))
+        contas = {}
+
+        def conta(nome):
+            if nome not in contas:
+                contas[nome] = {'exposicao': 0.0, 'posicoes': 0, 'por_ativo': {}, 'dia': hoje, 'resultado_dia': 0.0,
+                                'kill_switch': nome in bloqueios, 'motivo_kill_switch': bloqueios.get(nome)}
+            return contas[nome]
+
+        for nome, ativo, posicoes, valor in conn.execute(
+                "SELECT conta, ativo, posicoes, valor FROM risco_totais WHERE tenant = ? AND posicoes > 0", (tenant,)):
+            risco = conta(nome)
+            if ativo:
+                risco['por_ativo'][ativo] = {'posicoes': posicoes, 'valor': round(valor, 2)}
+            else:
+                risco['exposicao'], risco['posicoes'] = round(valor, 2), posicoes
+        for nome, resultado in conn.execute("SELECT conta, resultado FROM risco_resultados WHERE tenant = ? AND dia = ?",
+                                            (tenant, hoje)):
+            conta(nome)['resultado_dia'] = round(resultado, 2)
+        for nome in bloqueios:
+            if nome:
+                conta(nome)
+        return {
+            'limites': self._limites(),
+            'kill_switch': '' in bloqueios,
+            'motivo_kill_switch': bloqueios.get(''),
+            'contas': contas
+        }
@@ -0,0 +1,56 @@
+# API/serializacao.py
+import gzip
+import json
+
+# dependências opcionais: sem orjson usa o json da stdlib; sem msgpack o formato não é oferecido
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+TIPO_JSON = 'application/json'
+TIPOS_MSGPACK = ('application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack')
+
+# colunas do formato colunar, com os mesmos nomes dos campos do candle do broker
+CAMPOS_COLUNARES = ('from', 'open', 'max', 'min', 'close', 'volume')
+
+
+def colunar(velas):
+    """Converte a lista de candles em arrays paralelos, um por campo."""
+    return {campo: [vela.get(campo) for vela in velas] for campo in CAMPOS_COLUNARES}
+
+
+def tipos_disponiveis():
+    return (TIPO_JSON,) + (TIPOS_MSGPACK if msgpack is not None else ())
+
+
+def negociar(accept):
+    """
+    Escolhe o Content-Type a partir do cabeçalho Accept (werkzeug MIMEAccept).
+    Sem preferência explícita responde JSON; None se nenhum tipo aceito estiver disponível.
+    """
+    if not accept:
+        return TIPO_JSON
+    return accept.best_match(tipos_disponiveis())
+
+
+def codificar(dados, tipo=TIPO_JSON):
+    """Serializa `dados` em bytes no tipo informado."""
+    if tipo in TIPOS_MSGPACK:
+        if msgpack is None:
+            raise ValueError("MessagePack indisponível: instale o pacote msgpack")
+        return msgpack.packb(dados, use_bin_type=True)
+    if orjson is not None:
+        return orjson.dumps(dados)
+    return json.dumps(dados, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def comprimir(corpo, minimo=1024, nivel=5):
+    """gzip do corpo quando ele passa de `minimo` bytes; retorna (corpo, comprimido)."""
+    if minimo < 0 or len(corpo) < minimo:
+        return corpo, False
+    return gzip.compress(corpo, compresslevel=nivel), True
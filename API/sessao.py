@@ -0,0 +1,145 @@
+# API/sessao.py
+import itertools
+import logging
+import threading
+import time
+from API.contas import TIPOS_CONTA
+from API.metricas import medir_lock
+
+
+class SessaoBroker:
+    """
+    Camada de sessão sobre um IQ_Option.
+    Cada conta é endereçada pelo seu balance id, então ordens de contas diferentes
+    não dependem da conta selecionada globalmente na biblioteca.
+    """
+    def __init__(self, api, timeout_ordem=5.0):
+        self.api = api
+        self.timeout_ordem = timeout_ordem
+        self.balance_ids = {}
+        self._conta_ativa = None
+        # protege a troca global de conta (change_balance) no modo sem balance id
+        self._lock_conta = threading.Lock()
+        # get_balances/get_candles da biblioteca reutilizam buffers compartilhados
+        self._lock_leitura = threading.Lock()
+        self._seq_requisicao = itertools.count(1)
+
+    def carregar_balance_ids(self):
+        """Mapeia REAL/PRACTICE/TOURNAMENT para os balance ids do perfil."""
+        perfil = self.api.get_profile_ansyc() or {}
+        self.balance_ids = {
+            TIPOS_CONTA[b['type']]: b['id']
+            for b in perfil.get('balances', []) if b.get('type') in TIPOS_CONTA
+        }
+        return self.balance_ids
+
+    def usar_conta(self, tipo_conta, forcar=False):
+        """Seleciona a conta global da biblioteca (necessário apenas no modo sem balance id)."""
+        conta = tipo_conta.upper()
+        with medir_lock(self._lock_conta, 'sessao_conta'):
+            if forcar or conta != self._conta_ativa:
+                self.api.change_balance(conta)
+                self._conta_ativa = conta
+
+    def saldos(self):
+        """Retorna a lista de balances (id, type, amount, currency) de todas as contas."""
+        with medir_lock(self._lock_leitura, 'sessao_leitura'):
+            balances = self.api.get_balances()
+        return balances.get('msg') if balances else None
+
+    def candles(self, ativo, intervalo, quantidade, fim):
+        with medir_lock(self._lock_leitura, 'sessao_leitura'):
+            return self.api.get_candles(ativo, intervalo, quantidade, fim)
+
+    def catalogo_ativos(self):
+        """
+        Retorna ({'turbo': {ativo: aberto}, 'binary': {...}}, {ativo: {'turbo': payout, 'binary': payout}})
+        em dicionários simples (a biblioteca devolve defaultdicts aninhados).
+        """
+        horarios = self.api.get_all_open_time() or {}
+        abertos = {
+            tipo: {ativo: bool(info.get('open')) for ativo, info in (horarios.get(tipo) or {}).items()}
+            for tipo in ('turbo', 'binary')
+        }
+        lucros = self.api.get_all_profit() or {}
+        payouts = {
+            ativo: {tipo: float(valor) for tipo, valor in dict(info).items() if tipo in ('turbo', 'binary')}
+            for ativo, info in lucros.items()
+        }
+        return abertos, payouts
+
+    def iniciar_stream_candles(self, ativo, tamanho, max_candles=10):
+        # start_candles_stream pré-carrega o histórico via get_candles
+        with medir_lock(self._lock_leitura, 'sessao_leitura'):
+            self.api.start_candles_stream(ativo, tamanho, max_candles)
+
+    def parar_stream_candles(self, ativo, tamanho):
+        self.api.stop_candles_stream(ativo, tamanho)
+
+    def ler_stream_candles(self, ativo, tamanho):
+        """Retorna uma cópia do dicionário {from: candle} mantido pelo websocket."""
+        velas = self.api.get_realtime_candles(ativo, tamanho)
+        return dict(velas) if velas else {}
+
+    def resultado_ordem(self, order_id):
+        """Retorna o lucro da opção já fechada (socket-option-closed), ou None se ainda aberta."""
+        fechadas = getattr(getattr(self.api, 'api', None), 'socket_option_closed', None)
+        if not fechadas:
+            return None
+        mensagem = fechadas.pop(order_id, None)
+        if mensagem is None:
+            return None
+        msg = mensagem['msg']
+        if msg['win'] == 'equal':
+            return 0.0
+        if msg['win'] == 'loose':
+            return -float(msg['sum'])
+        return round(float(msg['win_amount']) - float(msg['sum']), 2)
+
+    def _suporta_balance_id(self):
+        return hasattr(getattr(self.api, 'api', None), 'send_websocket_request')
+
+    def comprar(self, tipo_conta, valor, ativo, acao, duracao):
+        """Abre uma opção binária na conta informada, sem trocar a conta global."""
+        conta = tipo_conta.upper()
+        balance_id = self.balance_ids.get(conta)
+        if balance_id is not None and self._suporta_balance_id():
+            return self._abrir_opcao(balance_id, valor, ativo, acao, duracao)
+        # sem acesso ao websocket: troca de conta e compra são atômicas
+        with medir_lock(self._lock_conta, 'sessao_conta'):
+            if conta != self._conta_ativa:
+                self.api.change_balance(conta)
+                self._conta_ativa = conta
+            return self.api.buy(valor, ativo, acao, duracao)
+
+    def _abrir_opcao(self, balance_id, valor, ativo, acao, duracao):
+        """Envia binary-options.open-option com user_balance_id explícito e aguarda a resposta."""
+        import iqoptionapi.constants as OP_code
+        from iqoptionapi.expiration import get_expiration_time
+
+        ws = self.api.api
+        req_id = f"bt{next(self._seq_requisicao)}"
+        expiracao, idx = get_expiration_time(int(ws.timesync.server_timestamp), duracao)
+        dados = {
+            "body": {
+                "price": float(valor),
+                "active_id": OP_code.ACTIVES[ativo],
+                "expired": int(expiracao),
+                "direction": acao.lower(),
+                "option_type_id": 3 if idx < 5 else 1,  # 3 = turbo, 1 = binária
+                "user_balance_id": int(balance_id)
+            },
+            "name": "binary-options.open-option",
+            "version": "1.0"
+        }
+        ws.send_websocket_request("sendMessage", dados, req_id)
+        limite = time.time() + self.timeout_ordem
+        while time.time() < limite:
+            resposta = ws.buy_multi_option.pop(req_id, None)
+            if resposta is not None:
+                if 'message' in resposta:
+                    return False, resposta['message']
+                return True, resposta.get('id')
+            time.sleep(0.005)
+        logging.error("Ordem %s sem resposta do broker em %ss", req_id, self.timeout_ordem)
+        return False, None
@@ -0,0 +1,240 @@
+# API/simulador.py
+import hashlib
+import itertools
+import logging
+import math
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+ATIVOS_SIMULADOS = [
+    'EURUSD', 'GBPUSD', 'USDJPY', 'AUDUSD', 'USDCAD', 'EURJPY', 'EURGBP', 'GBPJPY', 'NZDUSD', 'USDCHF',
+    'EURUSD-OTC', 'GBPUSD-OTC', 'USDJPY-OTC', 'AUDCAD-OTC', 'EURJPY-OTC', 'NZDUSD-OTC', 'USDCHF-OTC'
+]
+
+BALANCE_IDS = {'REAL': 1001, 'PRACTICE': 4004}
+TIPOS_BALANCE = {'REAL': 1, 'PRACTICE': 4}
+
+
+class Latencia:
+    """
+    Distribuição de latência configurável em texto:
+    "fixed:50", "uniform:20:150", "normal:80:20" ou "lognormal:80:0.5" (mediana em ms, sigma).
+    """
+    def __init__(self, especificacao, rng):
+        partes = (especificacao or 'fixed:0').split(':')
+        self.tipo = partes[0]
+        self.parametros = [float(p) for p in partes[1:]]
+        self.rng = rng
+
+    def amostrar(self):
+        p = self.parametros
+        if self.tipo == 'uniform':
+            ms = self.rng.uniform(p[0], p[1])
+        elif self.tipo == 'normal':
+            ms = self.rng.gauss(p[0], p[1])
+        elif self.tipo == 'lognormal':
+            ms = self.rng.lognormvariate(math.log(p[0]), p[1])
+        else:
+            ms = p[0] if p else 0.0
+        return max(ms, 0.0) / 1000.0
+
+
+class SimuladorIQOption:
+    """
+    Broker local que substitui o IQ_Option nos métodos usados pelo Trader.
+    Latência, falhas, quedas de conexão e velocidade de liquidação são configuráveis
+    (por argumento ou pelas variáveis SIM_*); os candles são sintéticos e determinísticos.
+    """
+    def __init__(self, email=None, password=None, active_account_type="PRACTICE",
+                 latencia=None, taxa_falha=None, taxa_desconexao=None, taxa_win=None,
+                 payout=None, escala_tempo=None, semente=None):
+        semente = semente if semente is not None else os.getenv('SIM_SEED')
+        self.rng = random.Random(semente)
+        self.latencia = Latencia(latencia or os.getenv('SIM_LATENCY', 'lognormal:80:0.4'), self.rng)
+        self.taxa_falha = float(taxa_falha if taxa_falha is not None else os.getenv('SIM_FAILURE_RATE', '0'))
+        self.taxa_desconexao = float(taxa_desconexao if taxa_desconexao is not None else os.getenv('SIM_DISCONNECT_RATE', '0'))
+        self.taxa_win = float(taxa_win if taxa_win is not None else os.getenv('SIM_WIN_RATE', '0.5'))
+        self.payout = float(payout if payout is not None else os.getenv('SIM_PAYOUT', '0.87'))
+        # 1.0 = opções liquidam no tempo real; 0.01 = 100x mais rápido
+        self.escala_tempo = float(escala_tempo if escala_tempo is not None else os.getenv('SIM_TIME_SCALE', '1'))
+        self.email = email
+        self._lock = threading.Lock()
+        self._conectado = False
+        self._conta = active_account_type
+        self._saldos = {
+            'REAL': float(os.getenv('SIM_BALANCE_REAL', '1000')),
+            'PRACTICE': float(os.getenv('SIM_BALANCE_PRACTICE', '10000'))
+        }
+        # ativos fechados no simulador (SIM_CLOSED_ASSETS=EURUSD,GBPUSD)
+        self.fechados = {a.strip() for a in os.getenv('SIM_CLOSED_ASSETS', '').split(',') if a.strip()}
+        self._ids = itertools.count(int(time.time()))
+        self._streams = {}
+        # canal no formato do websocket da biblioteca: pushes de saldo e opções fechadas
+        self.api = SimpleNamespace(
+            socket_option_closed={},
+            profile=SimpleNamespace(balance=None, balance_id=None, balance_type=None),
+            websocket_client=SimpleNamespace(wss=SimpleNamespace(on_close=None, on_error=None))
+        )
+
+    # ---- infraestrutura de simulação ----
+
+    def _rede(self):
+        """Aplica latência e, com a probabilidade configurada, derruba a conexão."""
+        time.sleep(self.latencia.amostrar())
+        if self.taxa_desconexao and self.rng.random() < self.taxa_desconexao:
+            self.derrubar_conexao()
+        if not self._conectado:
+            raise ConnectionError("Websocket connection closed.")
+
+    def derrubar_conexao(self):
+        """Injeta uma queda de conexão imediata (com o on_close do websocket, como na biblioteca)."""
+        if not self._conectado:
+            return
+        self._conectado = False
+        wss = self.api.websocket_client.wss
+        if wss.on_close:
+            wss.on_close(wss, None, "Conexão derrubada pelo simulador")
+
+    def _push_saldo(self, conta):
+        self.api.profile.balance_id = BALANCE_IDS[conta]
+        self.api.profile.balance = round(self._saldos[conta], 2)
+        self.api.profile.balance_type = TIPOS_BALANCE[conta]
+
+    # ---- conexão e conta ----
+
+    def connect(self, sms_code=None):
+        time.sleep(self.latencia.amostrar())
+        self._conectado = True
+        return True, None
+
+    def check_connect(self):
+        return self._conectado
+
+    def get_profile_ansyc(self):
+        # na biblioteca o perfil já chegou pelo websocket: leitura sem rede
+        return {
+            'currency': 'USD',
+            'balance_id': BALANCE_IDS[self._conta],
+            'balances': [
+                {'id': BALANCE_IDS[c], 'type': TIPOS_BALANCE[c], 'amount': round(v, 2), 'currency': 'USD'}
+                for c, v in self._saldos.items()
+            ]
+        }
+
+    def change_balance(self, Balance_MODE):
+        self._rede()
+        if Balance_MODE not in BALANCE_IDS:
+            raise ValueError(f"ERROR doesn't have this mode: {Balance_MODE}")
+        self._conta = Balance_MODE
+
+    def get_balances(self):
+        self._rede()
+        return {'msg': self.get_profile_ansyc()['balances']}
+
+    def get_balance(self):
+        self._rede()
+        return round(self._saldos[self._conta], 2)
+
+    # ---- candles ----
+
+    @staticmethod
+    def _ruido(ativo, t):
+        digest = hashlib.blake2b(f"{ativo}:{t}".encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'big') / 2 ** 64 - 0.5
+
+    def _preco(self, ativo, t):
+        """Preço sintético determinístico no instante t (mesmo valor em qualquer consulta)."""
+        base = 1.0 + (sum(map(ord, ativo)) % 50) / 100
+        onda = 0.004 * math.sin(t / 3600) + 0.002 * math.sin(t / 397)
+        return round(base * (1 + onda + 0.0005 * self._ruido(ativo, t // 5)), 6)
+
+    def _candle(self, ativo, tamanho, inicio, agora=None):
+        fim = inicio + tamanho
+        fechamento = self._preco(ativo, min(fim, agora) if agora else fim)
+        abertura = self._preco(ativo, inicio)
+        pavio = abs(self._ruido(ativo, inicio * 7)) * 0.0004 * abertura
+        return {
+            'id': inicio // tamanho,
+            'from': inicio,
+            'at': int((min(fim, agora) if agora else fim) * 1e9),
+            'to': fim,
+            'open': abertura,
+            'close': fechamento,
+            'min': round(min(abertura, fechamento) - pavio, 6),
+            'max': round(max(abertura, fechamento) + pavio, 6),
+            'volume': int(abs(self._ruido(ativo, inicio * 13)) * 2000)
+        }
+
+    def get_candles(self, ACTIVES, interval, count, endtime):
+        self._rede()
+        if ACTIVES not in ATIVOS_SIMULADOS:
+            logging.error("Asset %s not found on consts", ACTIVES)
+            return None
+        ultimo = int(endtime // interval) * interval
+        return [self._candle(ACTIVES, interval, ultimo - i * interval, endtime) for i in reversed(range(int(count)))]
+
+    def start_candles_stream(self, ACTIVE, size, maxdict):
+        self._rede()
+        self._streams[(ACTIVE, size)] = maxdict
+
+    def stop_candles_stream(self, ACTIVE, size):
+        self._streams.pop((ACTIVE, size), None)
+
+    def get_realtime_candles(self, ACTIVE, size):
+        maxdict = self._streams.get((ACTIVE, size))
+        if maxdict is None:
+            return False
+        agora = time.time()
+        ultimo = int(agora // size) * size
+        return {ultimo - i * size: self._candle(ACTIVE, size, ultimo - i * size, agora) for i in range(maxdict)}
+
+    # ---- catálogo ----
+
+    def get_all_open_time(self):
+        self._rede()
+        abertos = {a: {'open': a not in self.fechados} for a in ATIVOS_SIMULADOS}
+        return {'turbo': abertos, 'binary': dict(abertos), 'digital': {}}
+
+    def get_all_profit(self):
+        self._rede()
+        return {a: {'turbo': self.payout, 'binary': round(self.payout - 0.02, 2)} for a in ATIVOS_SIMULADOS}
+
+    # ---- ordens ----
+
+    def buy(self, price, ACTIVES, ACTION, expirations):
+        self._rede()
+        if ACTIVES not in ATIVOS_SIMULADOS:
+            raise KeyError(ACTIVES)
+        if ACTIVES in self.fechados:
+            return False, "Asset is closed"
+        if self.taxa_falha and self.rng.random() < self.taxa_falha:
+            return False, "Simulated rejection"
+        with self._lock:
+            conta = self._conta
+            if price > self._saldos[conta]:
+                return False, "Insufficient funds"
+            self._saldos[conta] -= price
+            order_id = next(self._ids)
+            self._push_saldo(conta)
+        liquidacao = threading.Timer(
+            int(expirations) * 60 * self.escala_tempo, self._liquidar, args=(order_id, conta, float(price))
+        )
+        liquidacao.daemon = True
+        liquidacao.start()
+        return True, order_id
+
+    def _liquidar(self, order_id, conta, valor):
+        win = self.rng.random() < self.taxa_win
+        with self._lock:
+            if win:
+                self._saldos[conta] += valor * (1 + self.payout)
+            self._push_saldo(conta)
+        self.api.socket_option_closed[order_id] = {'msg': {
+            'id': order_id,
+            'win': 'win' if win else 'loose',
+            'sum': valor,
+            'win_amount': round(valor * (1 + self.payout), 2) if win else 0
+        }}
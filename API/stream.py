@@ -0,0 +1,117 @@
+# API/stream.py
+import logging
+import queue
+import threading
+
+from API.logs import AMOSTRAR
+
+
+class DistribuidorCandles:
+    """
+    Mantém uma única assinatura realtime no broker por (ativo, timeframe) e repassa
+    cada candle fechado para todos os clientes conectados.
+    `fonte` precisa de iniciar_stream_candles, parar_stream_candles e ler_stream_candles.
+    """
+    def __init__(self, fonte, intervalo=0.1, max_fila=100):
+        self.fonte = fonte
+        self.intervalo = intervalo
+        self.max_fila = max_fila
+        self._assinaturas = {}
+        self._travas = {}  # (ativo, timeframe) -> Lock que serializa iniciar/parar no broker
+        self._lock = threading.Lock()
+
+    def _trava(self, chave):
+        with self._lock:
+            return self._travas.setdefault(chave, threading.Lock())
+
+    def assinar(self, ativo, timeframe):
+        """
+        Registra um cliente e retorna a fila onde ele recebe os candles fechados.
+        Início e fim da assinatura no broker são serializados por (ativo, timeframe): quem chega enquanto
+        ela está sendo feita ou encerrada espera, sem travar os outros ativos. Se o broker falhar, nada
+        fica registrado e o erro propaga.
+        """
+        chave = (ativo, int(timeframe))
+        fila = queue.Queue(maxsize=self.max_fila)
+        with self._trava(chave):
+            with self._lock:
+                assinatura = self._assinaturas.get(chave)
+                if assinatura is not None:
+                    assinatura['clientes'].add(fila)
+                    return fila
+            self.fonte.iniciar_stream_candles(ativo, chave[1] * 60)
+            assinatura = {'clientes': {fila}, 'parar': threading.Event()}
+            with self._lock:
+                self._assinaturas[chave] = assinatura
+            threading.Thread(target=self._observar, args=(chave, assinatura), daemon=True).start()
+        logging.info("Stream de candles iniciado: %s M%s", ativo, chave[1])
+        return fila
+
+    def cancelar(self, ativo, timeframe, fila):
+        """Remove o cliente; a assinatura no broker é encerrada junto com o último cliente."""
+        chave = (ativo, int(timeframe))
+        with self._trava(chave):
+            with self._lock:
+                assinatura = self._assinaturas.get(chave)
+                if assinatura is None:
+                    return
+                assinatura['clientes'].discard(fila)
+                if assinatura['clientes']:
+                    return
+                del self._assinaturas[chave]
+                assinatura['parar'].set()
+            self.fonte.parar_stream_candles(ativo, chave[1] * 60)
+        logging.info("Stream de candles encerrado: %s M%s", ativo, chave[1])
+
+    def restaurar(self):
+        """Reassina no broker todos os streams com clientes (após uma reconexão)."""
+        with self._lock:
+            chaves = list(self._assinaturas)
+        restaurados = 0
+        for ativo, timeframe in chaves:
+            with self._trava((ativo, timeframe)):
+                with self._lock:
+                    if (ativo, timeframe) not in self._assinaturas:
+                        continue  # o último cliente saiu enquanto os outros eram restaurados
+                try:
+                    self.fonte.iniciar_stream_candles(ativo, timeframe * 60)
+                    restaurados += 1
+                except Exception as e:
+                    logging.error("Falha ao restaurar stream de candles %s M%s: %s", ativo, timeframe, e)
+        if restaurados:
+            logging.info("%s stream(s) de candles restaurado(s) após reconexão", restaurados)
+
+    def clientes(self):
+        with self._lock:
+            return {f"{a}:M{t}": len(s['clientes']) for (a, t), s in self._assinaturas.items()}
+
+    def _observar(self, chave, assinatura):
+        """Detecta o fechamento de candles: um candle fecha quando surge outro com 'from' maior."""
+        ativo, timeframe = chave
+        aberto = None
+        while not assinatura['parar'].wait(self.intervalo):
+            try:
+                velas = self.fonte.ler_stream_candles(ativo, timeframe * 60)
+            except Exception as e:
+                logging.debug("Falha ao ler stream de %s: %s", ativo, e, extra=AMOSTRAR)
+                continue
+            if not velas:
+                continue
+            mais_recente = max(velas)
+            if aberto is not None and mais_recente > aberto and aberto in velas:
+                self._publicar(assinatura, velas[aberto])
+            aberto = mais_recente
+
+    def _publicar(self, assinatura, vela):
+        with self._lock:
+            clientes = list(assinatura['clientes'])
+        for fila in clientes:
+            try:
+                fila.put_nowait(vela)
+            except queue.Full:
+                # cliente lento: descarta o candle mais antigo para não travar os demais
+                try:
+                    fila.get_nowait()
+                    fila.put_nowait(vela)
+                except (queue.Empty, queue.Full):
+                    pass
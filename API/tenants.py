@@ -0,0 +1,235 @@
+# API/tenants.py
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# requisições sem tenant usam as credenciais do .env (modo de conta única)
+TENANT_PADRAO = 'default'
+ID_VALIDO = re.compile(r'^[A-Za-z0-9_.-]{1,64}$')
+# raiz do projeto, para o gateway importar o pacote API qualquer que seja o diretório de trabalho
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TenantDesconhecido(Exception):
+    """Tenant sem credenciais cadastradas."""
+
+
+class TenantEmOutroShard(Exception):
+    """O tenant pertence a outra instância (shard) do deploy."""
+    def __init__(self, tenant, shard):
+        super().__init__(f"Tenant {tenant} é atendido pelo shard {shard}")
+        self.tenant = tenant
+        self.shard = shard
+
+
+def carregar_tenants(caminho):
+    """Lê o arquivo JSON {tenant: {"email": ..., "senha": ...}} e retorna {tenant: (email, senha)}."""
+    with open(caminho, encoding='utf-8') as arquivo:
+        dados = json.load(arquivo)
+    tenants = {}
+    for tenant, conta in dados.items():
+        if not ID_VALIDO.match(tenant) or tenant == TENANT_PADRAO:
+            raise ValueError(f"Id de tenant inválido: {tenant!r}")
+        if not isinstance(conta, dict) or not conta.get('email') or not conta.get('senha'):
+            raise ValueError(f"Tenant {tenant}: informe email e senha")
+        tenants[tenant] = (conta['email'], conta['senha'])
+    return tenants
+
+
+def shard_do_tenant(tenant, total):
+    """
+    Rendezvous hashing: cada tenant vai para o shard de maior peso hash(shard, tenant).
+    Estável entre processos e, ao mudar o número de shards, só ~1/N dos tenants troca de lugar.
+    """
+    if total <= 1:
+        return 0
+    return max(range(total), key=lambda shard: hashlib.blake2b(f"{shard}:{tenant}".encode(), digest_size=8).digest())
+
+
+def _socket_ativo(caminho):
+    if not os.path.exists(caminho):
+        return False
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(caminho)
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+def garantir_gateway(tenant, credenciais, diretorio, prazo=60.0, max_ocioso=900.0):
+    """
+    Retorna o socket do gateway do tenant, subindo o processo se ainda não houver um.
+    A biblioteca do broker guarda o login em variáveis globais, então cada conta tem o seu processo
+    (API/gateway.py), compartilhado por todos os workers; um flock evita que dois workers subam o mesmo.
+    O gateway encerra sozinho após `max_ocioso` segundos sem workers conectados.
+    """
+    os.makedirs(diretorio, mode=0o700, exist_ok=True)
+    caminho = os.path.join(diretorio, f"{tenant}.sock")
+    if _socket_ativo(caminho):
+        return caminho
+    with open(os.path.join(diretorio, f"{tenant}.lock"), 'a') as trava:
+        fcntl.flock(trava, fcntl.LOCK_EX)
+        try:
+            if _socket_ativo(caminho):
+                return caminho
+            email, senha = credenciais
+            ambiente = dict(os.environ, IQ_EMAIL=email, IQ_PASSWORD=senha, TENANT_ID=tenant,
+                            BROKER_GATEWAY_SOCKET=caminho, BROKER_GATEWAY_IDLE_SECONDS=str(max_ocioso),
+                            PYTHONPATH=os.pathsep.join(filter(None, (RAIZ, os.getenv('PYTHONPATH')))))
+            logging.info("Subindo gateway do tenant %s", tenant)
+            # sessão própria: o gateway sobrevive à reciclagem do worker que o iniciou
+            processo = subprocess.Popen([sys.executable, '-m', 'API.gateway'], env=ambiente, start_new_session=True)
+            threading.Thread(target=processo.wait, name=f"gateway-{tenant}", daemon=True).start()
+            limite = time.time() + prazo
+            while not _socket_ativo(caminho):
+                if processo.poll() is not None:
+                    raise RuntimeError(f"Gateway do tenant {tenant} encerrou na inicialização (código {processo.returncode})")
+                if time.time() > limite:
+                    processo.terminate()
+                    raise RuntimeError(f"Gateway do tenant {tenant} não ficou pronto em {prazo:.0f}s")
+                time.sleep(0.1)
+            return caminho
+        finally:
+            fcntl.flock(trava, fcntl.LOCK_UN)
+
+
+class SessaoTenant:
+    """O que cada tenant tem de próprio: conexão com o broker, gerenciamento e limites de risco."""
+    def __init__(self, tenant, trader, gerenciador, motor_risco):
+        self.tenant = tenant
+        self.trader = trader
+        self.gerenciador = gerenciador
+        self.motor_risco = motor_risco
+        self.usado_em = time.time()
+        self.em_uso = 0  # requisições e ordens da fila usando a sessão agora (contado pelo PoolTenants)
+
+    def ocupada(self):
+        """Em uso ou com ordens aguardando liquidação: encerrar agora perderia o resultado delas."""
+        return self.em_uso > 0 or self.trader.ordens_em_aberto() > 0
+
+    def encerrar(self):
+        self.trader.encerrar()
+
+
+class PoolTenants:
+    """
+    Sessões por tenant deste processo, abertas sob demanda por `abrir(tenant, credenciais)`.
+    Guarda no máximo `max_sessoes` (a menos usada recentemente é encerrada); só atende os tenants
+    do shard `shard` de `shards` e nunca descarta a sessão padrão.
+    Sessões retidas (`obter(..., reter=True)` até `soltar`) ou com ordens abertas não são encerradas:
+    o pool passa do limite até elas ficarem livres.
+    """
+    def __init__(self, abrir, credenciais, padrao=None, shard=0, shards=1, max_sessoes=50):
+        self.abrir = abrir
+        self.credenciais = credenciais
+        self.padrao = padrao
+        self.shard = shard
+        self.shards = max(shards, 1)
+        self.max_sessoes = max(max_sessoes, 1)
+        self._sessoes = OrderedDict()
+        self._abrindo = {}  # tenant -> lock, uma abertura por tenant por vez
+        self._lock = threading.Lock()
+        self.abertas = 0
+        self.encerradas = 0
+
+    def obter(self, tenant, reter=False):
+        if tenant == TENANT_PADRAO and self.padrao is not None:
+            return self.padrao
+        if tenant not in self.credenciais:
+            raise TenantDesconhecido(f"Tenant desconhecido: {tenant}")
+        shard = shard_do_tenant(tenant, self.shards)
+        if shard != self.shard:
+            raise TenantEmOutroShard(tenant, shard)
+        with self._lock:
+            sessao = self._sessoes.get(tenant)
+            if sessao is not None:
+                self._sessoes.move_to_end(tenant)
+                sessao.usado_em = time.time()
+                sessao.em_uso += reter
+                return sessao
+            abrindo = self._abrindo.setdefault(tenant, threading.Lock())
+        try:
+            with abrindo:
+                with self._lock:
+                    sessao = self._sessoes.get(tenant)
+                    if sessao is not None:
+                        sessao.em_uso += reter
+                        return sessao
+                nova = self.abrir(tenant, self.credenciais[tenant])
+                with self._lock:
+                    # outra abertura (com o lock de uma tentativa anterior que falhou) pode ter chegado antes
+                    sessao = self._sessoes.setdefault(tenant, nova)
+                    sessao.em_uso += reter
+                    if sessao is nova:
+                        self.abertas += 1
+                        excedentes = self._retirar_excedentes(manter=tenant)
+                    else:
+                        excedentes = [nova]
+        finally:
+            # também quando `abrir` falha: a próxima requisição tenta de novo com um lock novo
+            with self._lock:
+                if self._abrindo.get(tenant) is abrindo:
+                    del self._abrindo[tenant]
+        self._encerrar(excedentes)
+        return sessao
+
+    def soltar(self, sessao):
+        """Libera uma sessão retida por `obter(..., reter=True)`."""
+        if sessao is self.padrao:
+            return
+        with self._lock:
+            sessao.em_uso = max(sessao.em_uso - 1, 0)
+            excedentes = self._retirar_excedentes()
+        self._encerrar(excedentes)
+
+    def _retirar_excedentes(self, manter=None):
+        # chamado com o lock: tira do pool as menos usadas que estiverem livres, até voltar ao limite
+        excesso = len(self._sessoes) - self.max_sessoes
+        excedentes = []
+        for tenant, sessao in list(self._sessoes.items()):
+            if excesso <= 0:
+                break
+            if tenant != manter and not sessao.ocupada():
+                del self._sessoes[tenant]
+                excedentes.append(sessao)
+                excesso -= 1
+        return excedentes
+
+    def _encerrar(self, excedentes):
+        for antiga in excedentes:
+            logging.info("Encerrando sessão ociosa do tenant %s", antiga.tenant)
+            antiga.encerrar()
+            self.encerradas += 1
+
+    def __len__(self):
+        return len(self._sessoes)
+
+    def estado(self):
+        with self._lock:
+            sessoes = list(self._sessoes.values())
+        return {
+            'shard': self.shard,
+            'shards': self.shards,
+            'tenants_configurados': len(self.credenciais),
+            'tenants_neste_shard': sum(1 for t in self.credenciais if shard_do_tenant(t, self.shards) == self.shard),
+            'max_sessoes': self.max_sessoes,
+            'abertas': self.abertas,
+            'encerradas': self.encerradas,
+            'sessoes': [
+                {'tenant': s.tenant, 'estado': s.trader.estado_conexao, 'usado_ha': round(time.time() - s.usado_em, 1),
+                 'em_uso': s.em_uso}
+                for s in sessoes
+            ]
+        }
@@ -1,9 +1,29 @@
 # API/trader.py
 import logging
 import os
-from iqoptionapi.stable_api import IQ_Option
+import random
 import time
 import threading
+from contextlib import contextmanager
+
+# IQ_SIMULATOR=true troca a IQ Option pelo broker local simulado (testes de carga/perfil)
+SIMULADOR_ATIVO = os.getenv('IQ_SIMULATOR', 'false').lower() == 'true'
+if SIMULADOR_ATIVO:
+    from API.simulador import SimuladorIQOption as IQ_Option
+else:
+    from iqoptionapi.stable_api import IQ_Option
+from API.armazem_candles import ArmazemCandles, para_velas
+from API.ativos import CatalogoAtivos
+from API.candles import CacheCandles
+from API.gateway import ClienteGateway
+from API.contas import EstadoContas
+from API.historico import HistoricoTrades
+from API.logs import AMOSTRAR
+from API.limitador import (BrokerSobrecarregado, LimitadorBroker, PRIORIDADE_FUNDO, PRIORIDADE_LEITURA,
+                           PRIORIDADE_ORDEM)
+from API.metricas import ETAPAS_TRADE, ORDENS, RECONEXOES, medir_broker
+from API.sessao import SessaoBroker
+from API.stream import DistribuidorCandles
 
 # Lock global para evitar múltiplos logins
 IQ_LOGIN_ATTEMPTED = False
@@ -15,165 +35,655 @@ class Trader:
     Classe responsável por toda a comunicação com a IQ Option.
     Garante seleção de conta, execução de trades, consulta de saldo e candles.
     """
-    def __init__(self):
+    def __init__(self, tenant=None, gateway_socket=None, caminho_historico=None, dados_mercado=None):
+        """
+        Sem argumentos usa as credenciais e o gateway do .env. Um tenant (API/tenants.py) passa o socket do
+        gateway com o login dele, o arquivo de histórico próprio e, em `dados_mercado`, o Trader cujo cache
+        de candles e histórico em disco são compartilhados (candles não dependem da conta).
+        """
         global IQ_LOGIN_ATTEMPTED, IQ_LOGIN_SUCCESS, IQ_LOGIN_ERROR
+        self.tenant = tenant
         self.api = None
+        self.sessao = None
         self.conta_atual = None
         self._keepalive_thread = None
         self._keepalive_stop = threading.Event()
-        self.keepalive_seconds = int(os.getenv('KEEPALIVE_SECONDS', '60') or '60')
-        self.trade_locks = {}
-        self._trade_locks_guard = threading.Lock()
+        # quedas chegam pelo on_close do websocket; a checagem periódica é só uma rede de segurança
+        self.keepalive_seconds = int(os.getenv('KEEPALIVE_SECONDS', '15') or '15')
+        self._queda = threading.Event()
+        # trades que chegam durante uma reconexão esperam a conexão voltar até este prazo
+        self.espera_reconexao = float(os.getenv('RECONNECT_TRADE_WAIT_SECONDS', '10') or '0')
+        self.reconexoes = 0
+        self.desconectado_em = None
+        self.estado_contas = EstadoContas(float(os.getenv('ACCOUNT_CACHE_TTL', '30') or '30'))
+        self._ultimo_push_saldo = None
+        # catálogo, cache e histórico de candles só são atualizados em background pelo Trader dono deles
+        self.mercado_proprio = dados_mercado is None
+        if dados_mercado is not None:
+            self.cache_candles = dados_mercado.cache_candles
+            self.armazem_candles = dados_mercado.armazem_candles
+        else:
+            self.cache_candles = CacheCandles(
+                max_series=int(os.getenv('CANDLE_CACHE_SERIES', '64') or '64'),
+                max_candles=int(os.getenv('CANDLE_CACHE_SIZE', '1000') or '1000')
+            )
+            # histórico de candles em disco (mmap); sem CANDLE_STORE_DIR as consultas usam só o cache em memória
+            diretorio_candles = os.getenv('CANDLE_STORE_DIR', '')
+            self.armazem_candles = ArmazemCandles(
+                diretorio_candles,
+                historico_alvo=int(os.getenv('CANDLE_STORE_HISTORY', '10000') or '0'),
+                max_paginas=int(os.getenv('CANDLE_STORE_MAX_PAGES', '20') or '1')
+            ) if diretorio_candles else None
+        self.intervalo_historico_candles = float(os.getenv('CANDLE_STORE_BACKFILL_SECONDS', '5') or '0')
+        self._historico_candles_thread = None
+        self.stream_candles = DistribuidorCandles(self)
+        # catálogo de ativos abertos/payouts, atualizado em background
+        self.catalogo = dados_mercado.catalogo if dados_mercado is not None else CatalogoAtivos()
+        self.intervalo_catalogo = float(os.getenv('ASSET_CATALOG_REFRESH_SECONDS', '60') or '60')
+        self.catalogo.idade_maxima = float(os.getenv('ASSET_CATALOG_MAX_AGE_SECONDS', '0') or '0') or 3 * self.intervalo_catalogo
+        self._catalogo_thread = None
+        # ordens abertas aguardando liquidação e callbacks (conta, lucro, ordem) chamados ao liquidar
+        self._ordens_abertas = {}
+        self._ordens_lock = threading.Lock()
+        self.ao_liquidar = []
+        self._liquidacao_thread = None
+        if caminho_historico is None:
+            caminho_historico = os.getenv('HISTORY_DB_PATH', 'logs/historico.db')
+        self.historico = HistoricoTrades(caminho_historico) if caminho_historico else None
+        # estado da inicialização: desconectado -> conectando -> aquecendo -> pronto (ou falha)
+        self.estado_conexao = 'desconectado'
+        self.pronto = threading.Event()
+        self.ultimo_erro = None
+        self.tentativas_conexao = 0
+        self.iniciado_em = time.time()
+        self.pronto_em = None
+        self.max_tentativas_conexao = int(os.getenv('CONNECT_MAX_ATTEMPTS', '0') or '0')
+        self.intervalo_conexao = float(os.getenv('CONNECT_RETRY_SECONDS', '2') or '2')
+        self.intervalo_conexao_max = float(os.getenv('CONNECT_RETRY_MAX_SECONDS', '60') or '60')
+        self._conexao_thread = None
+        self.etapas_aquecimento = self._carregar_etapas_aquecimento()
+        # com gateway, o login no broker pertence ao processo do gateway (API/gateway.py)
+        self.gateway_socket = gateway_socket or os.getenv('BROKER_GATEWAY_SOCKET') or None
+        self.limitador = self._criar_limitador()
         email = os.getenv('IQ_EMAIL')
         senha = os.getenv('IQ_PASSWORD')
+        if self.gateway_socket:
+            email, senha = email or 'gateway', senha or 'gateway'
+        elif SIMULADOR_ATIVO:
+            logging.warning("IQ_SIMULATOR ativo: usando broker simulado, nenhuma ordem real será enviada.")
+            email, senha = email or 'simulador', senha or 'simulador'
         if not email or not senha:
             logging.critical("Credenciais IQ Option não configuradas no EasyPanel!")
+            self.estado_conexao, self.ultimo_erro = 'falha', "Credenciais IQ Option não configuradas"
             return
-        if IQ_LOGIN_ATTEMPTED:
-            if IQ_LOGIN_SUCCESS:
-                logging.info("Login na IQ Option já realizado por outro processo.")
-            else:
-                logging.critical(f"Login na IQ Option já falhou anteriormente: {IQ_LOGIN_ERROR}")
+        # a biblioteca guarda o login em variáveis globais: um login direto por processo
+        if not self.gateway_socket:
+            if IQ_LOGIN_ATTEMPTED:
+                if IQ_LOGIN_SUCCESS:
+                    logging.info("Login na IQ Option já realizado por outro processo.")
+                else:
+                    logging.critical("Login na IQ Option já falhou anteriormente: %s", IQ_LOGIN_ERROR)
+                self.estado_conexao, self.ultimo_erro = 'falha', "Login já tentado por outra instância neste processo"
+                return
+            IQ_LOGIN_ATTEMPTED = True
+        self._credenciais = (email, senha)
+        # por padrão o login roda em background: o servidor já responde /ping e /ready enquanto conecta
+        if os.getenv('STARTUP_BACKGROUND_LOGIN', 'true').lower() == 'true':
+            self.iniciar_conexao()
+        else:
+            self._conexao_loop()
+
+    def _carregar_etapas_aquecimento(self):
+        """Etapas (nome, função, essencial) executadas antes de reportar pronto."""
+        etapas = [('saldos', self.atualizar_estado_contas, True)]
+        if not self.mercado_proprio:
+            return etapas
+        etapas.append(('catalogo_ativos', self.atualizar_catalogo, False))
+        # WARMUP_CANDLES=EURUSD:1:100,GBPUSD:5:50 pré-carrega o cache de candles
+        for item in filter(None, (i.strip() for i in os.getenv('WARMUP_CANDLES', '').split(','))):
+            try:
+                ativo, timeframe, quantidade = item.split(':')
+                etapas.append((f"candles {item}", lambda a=ativo, t=int(timeframe), q=int(quantidade): self.get_candles(a, t, q), False))
+            except ValueError:
+                logging.error("WARMUP_CANDLES inválido: %s (use ATIVO:TIMEFRAME:QUANTIDADE)", item)
+        return etapas
+
+    def _criar_limitador(self):
+        """Orçamento de chamadas ao broker (BROKER_RATE_LIMIT chamadas/s; 0 desativa)."""
+        taxa = float(os.getenv('BROKER_RATE_LIMIT', '20') or '0')
+        rajada = float(os.getenv('BROKER_RATE_BURST', '40') or '0')
+        reservas = {PRIORIDADE_LEITURA: float(os.getenv('BROKER_RATE_READ_RESERVE', '0.5') or '0')}
+        if self.gateway_socket:
+            # cada worker tem o seu balde: o orçamento é dividido entre eles
+            workers = max(int(os.getenv('WEB_CONCURRENCY', '1') or '1'), 1)
+            taxa = taxa / workers
+            if rajada:
+                # sem descer do balde mínimo: abaixo dele leituras e tarefas de fundo nunca passariam da reserva
+                rajada = max(rajada / workers, min(LimitadorBroker.rajada_minima(reservas), rajada))
+        return LimitadorBroker(
+            taxa, rajada or None,
+            reservas=reservas,
+            esperas={
+                PRIORIDADE_ORDEM: float(os.getenv('BROKER_RATE_ORDER_MAX_WAIT', '30') or '0'),
+                PRIORIDADE_LEITURA: float(os.getenv('BROKER_RATE_READ_MAX_WAIT', '2') or '0')
+            }
+        )
+
+    @contextmanager
+    def _chamada_broker(self, operacao, prioridade=PRIORIDADE_LEITURA):
+        """Espera a vez no limitador (pela prioridade) e mede a chamada ao broker."""
+        self.limitador.adquirir(prioridade)
+        with medir_broker(operacao):
+            yield
+
+    def iniciar_conexao(self):
+        """Conecta e aquece em uma thread própria, com novas tentativas até conseguir."""
+        if self._conexao_thread and self._conexao_thread.is_alive():
             return
-        IQ_LOGIN_ATTEMPTED = True
-        try:
-            self.conectar_iq_option(email, senha)
-            IQ_LOGIN_SUCCESS = True
-        except Exception as e:
-            IQ_LOGIN_ERROR = str(e)
-            print("\n❌ Erro ao conectar na IQ Option:", IQ_LOGIN_ERROR)
-            print("Dica: Verifique se não há múltiplos processos rodando, se você não atingiu o limite de requisições, ou se as credenciais estão corretas. Aguarde alguns minutos e tente novamente.\n")
-            logging.critical(f"ERRO CRÍTICO DURANTE A INICIALIZAÇÃO: {IQ_LOGIN_ERROR}")
-            raise
+        self._conexao_thread = threading.Thread(target=self._conexao_loop, name="conexao-broker", daemon=True)
+        self._conexao_thread.start()
+
+    def _aguardar_nova_tentativa(self):
+        """Espera com backoff exponencial; retorna False se esgotou as tentativas ou o Trader foi encerrado."""
+        if self.max_tentativas_conexao and self.tentativas_conexao >= self.max_tentativas_conexao:
+            self.estado_conexao = 'falha'
+            logging.critical("Desistindo de conectar após %s tentativas: %s", self.tentativas_conexao, self.ultimo_erro)
+            return False
+        espera = self._backoff(self.tentativas_conexao)
+        logging.warning("Nova tentativa de conexão em %.1fs", espera)
+        return not self._keepalive_stop.wait(espera)
+
+    def _backoff(self, tentativa):
+        """Backoff exponencial com jitter (metade fixa, metade aleatória) para as tentativas não sincronizarem."""
+        teto = min(self.intervalo_conexao * 2 ** (tentativa - 1), self.intervalo_conexao_max)
+        return teto / 2 + random.uniform(0, teto / 2)
+
+    def _conexao_loop(self):
+        global IQ_LOGIN_SUCCESS, IQ_LOGIN_ERROR
+        email, senha = self._credenciais
+        while self.api is None:
+            self.estado_conexao = 'conectando'
+            self.tentativas_conexao += 1
+            try:
+                if self.conectar_iq_option(email, senha):
+                    IQ_LOGIN_SUCCESS = True
+                    break
+            except Exception as e:
+                self.ultimo_erro = str(e)
+                logging.critical("ERRO CRÍTICO DURANTE A INICIALIZAÇÃO: %s", e)
+            IQ_LOGIN_ERROR = self.ultimo_erro
+            if self.tentativas_conexao == 1:
+                print("\n❌ Erro ao conectar na IQ Option:", IQ_LOGIN_ERROR)
+                print("Dica: Verifique se não há múltiplos processos rodando, se você não atingiu o limite de requisições, ou se as credenciais estão corretas. Aguarde alguns minutos e tente novamente.\n")
+            if not self._aguardar_nova_tentativa():
+                return
+        self.estado_conexao = 'aquecendo'
+        while not self.aquecer():
+            if not self._aguardar_nova_tentativa():
+                return
+        self.estado_conexao = 'pronto'
+        self.pronto_em = time.time()
+        self.pronto.set()
+        logging.info("Trader pronto em %.2fs", self.pronto_em - self.iniciado_em)
+
+    def aquecer(self):
+        """Pré-carrega saldos/moeda (e o que mais estiver configurado). Retorna False se uma etapa essencial falhar."""
+        ok = True
+        for nome, etapa, essencial in self.etapas_aquecimento:
+            inicio = time.perf_counter()
+            try:
+                sucesso = etapa() not in (False, None)
+            except Exception as e:
+                logging.error("Aquecimento '%s' falhou: %s", nome, e)
+                sucesso = False
+            logging.info("Aquecimento '%s': %s em %.0fms", nome, 'ok' if sucesso else 'falhou', (time.perf_counter() - inicio) * 1000)
+            if essencial and not sucesso:
+                self.ultimo_erro = f"Aquecimento '{nome}' falhou"
+                ok = False
+        return ok
+
+    def encerrar(self):
+        """Para as threads de conexão, keepalive e liquidação e libera o histórico e a conexão com o gateway."""
+        self._keepalive_stop.set()
+        if self.historico:
+            self.historico.encerrar()
+        if self.gateway_socket and self.api is not None:
+            self.api.fechar()
+
+    def ordens_em_aberto(self):
+        """Ordens enviadas por este Trader que ainda aguardam liquidação."""
+        return len(self._ordens_abertas)
+
+    def status_conexao(self):
+        """Estado da inicialização para o /ready."""
+        conectado = False
+        if self.api is not None:
+            try:
+                conectado = bool(self.api.check_connect())
+            except Exception:
+                conectado = False
+        return {
+            'pronto': self.pronto.is_set() and conectado,
+            'estado': self.estado_conexao,
+            'conectado': conectado,
+            'tentativas': self.tentativas_conexao,
+            'reconexoes': self.reconexoes,
+            'desconectado_ha': round(time.time() - self.desconectado_em, 2) if self.estado_conexao == 'reconectando' else None,
+            'ultimo_erro': self.ultimo_erro,
+            'iniciado_ha': round(time.time() - self.iniciado_em, 2),
+            'pronto_em': round(self.pronto_em - self.iniciado_em, 2) if self.pronto_em else None
+        }
 
     def conectar_iq_option(self, email, senha):
-        logging.info(f"Conectando à IQ Option com email: {email}")
-        try:
-            self.api = IQ_Option(email, senha)
-            check, reason = self.api.connect()
-            if check:
-                logging.info("Conexão com IQ Option bem-sucedida.")
-                self.api.change_balance("PRACTICE")
-                saldo = self.api.get_balance()
-                logging.info(f"Saldo inicial (PRACTICE): ${saldo}")
-                # inicia keepalive para manter conexão ativa
-                self._iniciar_keepalive()
-            else:
-                logging.critical(f"Falha na conexão com IQ Option: {reason}")
-        except Exception as e:
-            logging.critical(f"ERRO CRÍTICO DURANTE A INICIALIZAÇÃO: {e}")
+        """Abre a conexão com o broker (ou gateway). Retorna True se conectou."""
+        if self.gateway_socket:
+            logging.info("Conectando ao gateway do broker em %s", self.gateway_socket)
+            api = ClienteGateway(self.gateway_socket)
+        else:
+            logging.info("Conectando à IQ Option com email: %s", email)
+            api = IQ_Option(email, senha)
+        check, reason = api.connect()
+        if not check:
+            self.ultimo_erro = str(reason)
+            logging.critical("Falha na conexão com IQ Option: %s", reason)
+            return False
+        logging.info("Conexão com IQ Option bem-sucedida.")
+        sessao = api.sessao if self.gateway_socket else SessaoBroker(api)
+        sessao.carregar_balance_ids()
+        sessao.usar_conta("PRACTICE")
+        self.sessao, self.conta_atual = sessao, "PRACTICE"
+        # api por último: os métodos tratam `self.api` como sinal de sessão pronta
+        self.api = api
+        self.ultimo_erro = None
+        self._vigiar_websocket()
+        self._iniciar_keepalive()
+        self._iniciar_liquidacao()
+        self._iniciar_catalogo()
+        self._iniciar_historico_candles()
+        return True
+
+    def _vigiar_websocket(self):
+        """
+        Encadeia on_close/on_error do websocket da biblioteca para sinalizar a queda na hora.
+        A biblioteca cria um websocket novo a cada connect(), então é reaplicado após cada conexão.
+        """
+        wss = getattr(getattr(getattr(self.api, 'api', None), 'websocket_client', None), 'wss', None)
+        if wss is None or getattr(wss, '_vigiado_pelo_trader', False):
+            return
+        for evento in ('on_close', 'on_error'):
+            original = getattr(wss, evento, None)
+
+            def ao_cair(*args, _original=original, **kwargs):
+                try:
+                    if _original:
+                        _original(*args, **kwargs)
+                finally:
+                    self._sinalizar_queda()
+            setattr(wss, evento, ao_cair)
+        wss._vigiado_pelo_trader = True
+
+    def _sinalizar_queda(self):
+        """Marca a sessão como fora do ar e acorda a thread de reconexão."""
+        if self.estado_conexao == 'pronto':
+            self.estado_conexao = 'reconectando'
+            self.desconectado_em = time.time()
+            self.pronto.clear()
+            logging.warning("Conexão com o broker caiu; reconectando em background.")
+        self._queda.set()
+
+    def aguardar_conexao(self, prazo=None):
+        """
+        True se a sessão está pronta. Durante uma reconexão espera até o prazo pela volta,
+        em vez de cada trade tentar reconectar por conta própria.
+        """
+        if self.pronto.is_set():
+            return True
+        if self.estado_conexao != 'reconectando':
+            return False
+        return self.pronto.wait(self.espera_reconexao if prazo is None else prazo)
 
     def reconectar(self):
-        """Tenta reconectar automaticamente se a conexão cair."""
-        if self.api:
-            logging.warning("Reconectando à IQ Option...")
-            check, reason = self.api.connect()
-            if check:
-                logging.info("Reconexão bem-sucedida.")
-                if self.conta_atual:
-                    self.api.change_balance(self.conta_atual)
-            else:
-                logging.critical(f"Falha na reconexão: {reason}")
+        """Reabre a sessão e restaura conta, saldos e assinaturas de candles. Retorna True se reconectou."""
+        if not self.api:
+            return False
+        logging.warning("Reconectando à IQ Option...")
+        try:
+            with medir_broker('connect'):
+                check, reason = self.api.connect()
+        except Exception as e:
+            check, reason = False, e
+        RECONEXOES.inc('sucesso' if check else 'falha')
+        if not check:
+            self.ultimo_erro = str(reason)
+            logging.critical("Falha na reconexão: %s", reason)
+            return False
+        try:
+            self._vigiar_websocket()
+            self.sessao.carregar_balance_ids()
+            if self.conta_atual:
+                self.sessao.usar_conta(self.conta_atual, forcar=True)
+            self.estado_contas.invalidar()
+            self.atualizar_estado_contas(PRIORIDADE_ORDEM)
+            self.stream_candles.restaurar()
+        except Exception as e:
+            self.ultimo_erro = f"Falha ao restaurar a sessão: {e}"
+            logging.error(self.ultimo_erro)
+            return False
+        logging.info("Reconexão bem-sucedida.")
+        return True
 
     def _keepalive_loop(self):
-        """Mantém a conexão ativa verificando periodicamente e reconectando somente se cair."""
-        if self.keepalive_seconds <= 0:
-            return
+        """
+        Reage às quedas sinalizadas pelo websocket (ou pela checagem periódica de segurança)
+        reconectando em background com backoff e jitter; os trades aguardam o evento `pronto`.
+        """
+        intervalo = self.keepalive_seconds if self.keepalive_seconds > 0 else None
         while not self._keepalive_stop.is_set():
+            self._queda.wait(intervalo)
+            self._queda.clear()
+            if self._keepalive_stop.is_set():
+                break
             try:
-                if self.api and not self.api.check_connect():
-                    self.reconectar()
+                if not self.api or self.api.check_connect():
+                    continue
             except Exception:
-                logging.debug("Falha ao checar conexão no keepalive.")
-            # intervalo curto o suficiente para estabilidade, sem flood
-            self._keepalive_stop.wait(self.keepalive_seconds)
+                logging.debug("Falha ao checar conexão.", extra=AMOSTRAR)
+            self._sinalizar_queda()
+            self._queda.clear()
+            tentativa = 0
+            while not self._keepalive_stop.is_set():
+                tentativa += 1
+                if self.reconectar():
+                    self.reconexoes += 1
+                    # numa queda durante o aquecimento inicial, quem marca pronto é o _conexao_loop
+                    if self.estado_conexao == 'reconectando':
+                        self.estado_conexao = 'pronto'
+                        self.pronto.set()
+                        logging.info("Sessão restaurada em %.2fs", time.time() - self.desconectado_em)
+                    break
+                espera = self._backoff(tentativa)
+                logging.warning("Nova tentativa de reconexão em %.1fs", espera)
+                self._keepalive_stop.wait(espera)
 
     def _iniciar_keepalive(self):
         if self._keepalive_thread and self._keepalive_thread.is_alive():
             return
-        self._keepalive_thread = threading.Thread(target=self._keepalive_loop, daemon=True)
+        self._keepalive_thread = threading.Thread(target=self._keepalive_loop, name="reconexao-broker", daemon=True)
         self._keepalive_thread.start()
 
-    def _get_trade_lock(self):
-        """Retorna um lock por conta (REAL/PRACTICE)."""
-        key = (self.conta_atual, None)
-        with self._trade_locks_guard:
-            if key not in self.trade_locks:
-                self.trade_locks[key] = threading.Lock()
-            return self.trade_locks[key]
+    def _iniciar_liquidacao(self):
+        if self._liquidacao_thread and self._liquidacao_thread.is_alive():
+            return
+        self._liquidacao_thread = threading.Thread(target=self._liquidacao_loop, daemon=True)
+        self._liquidacao_thread.start()
+
+    def _iniciar_catalogo(self):
+        if (not self.mercado_proprio or self.intervalo_catalogo <= 0
+                or (self._catalogo_thread and self._catalogo_thread.is_alive())):
+            return
+        self._catalogo_thread = threading.Thread(target=self._catalogo_loop, name="catalogo-ativos", daemon=True)
+        self._catalogo_thread.start()
+
+    def _iniciar_historico_candles(self):
+        if (not self.mercado_proprio or not self.armazem_candles or self.intervalo_historico_candles <= 0
+                or (self._historico_candles_thread and self._historico_candles_thread.is_alive())):
+            return
+        self._historico_candles_thread = threading.Thread(
+            target=self._historico_candles_loop, name="historico-candles", daemon=True)
+        self._historico_candles_thread.start()
+
+    def _historico_candles_loop(self):
+        """Completa o passado das séries em disco, uma página por vez, com a prioridade mais baixa do limitador."""
+        def buscar(ativo, timeframe, quantidade, fim):
+            with self._chamada_broker('candles_historico', PRIORIDADE_FUNDO):
+                return self.sessao.candles(ativo, timeframe * 60, quantidade, fim)
+
+        while not self._keepalive_stop.wait(self.intervalo_historico_candles):
+            if not self.pronto.is_set():
+                continue
+            try:
+                passo = self.armazem_candles.preencher(buscar)
+                if passo:
+                    logging.debug("Histórico de %s M%s: +%s candles", passo[0], passo[1], passo[2], extra=AMOSTRAR)
+            except BrokerSobrecarregado:
+                logging.debug("Preenchimento do histórico de candles adiado: limite de chamadas ao broker atingido.", extra=AMOSTRAR)
+            except Exception as e:
+                logging.error("Erro ao preencher histórico de candles: %s", e)
+
+    def _catalogo_loop(self):
+        # a primeira carga é feita pelo aquecimento
+        while not self._keepalive_stop.wait(self.intervalo_catalogo):
+            self.atualizar_catalogo()
+
+    def atualizar_catalogo(self):
+        """Recarrega ativos abertos e payouts do broker."""
+        if not self.api:
+            return False
+        try:
+            with self._chamada_broker('catalogo', PRIORIDADE_FUNDO):
+                abertos, payouts = self.sessao.catalogo_ativos()
+            total = self.catalogo.atualizar(abertos, payouts)
+            logging.debug("Catálogo de ativos atualizado: %s ativos", total, extra=AMOSTRAR)
+            return total > 0
+        except BrokerSobrecarregado:
+            logging.info("Atualização do catálogo de ativos adiada: limite de chamadas ao broker atingido.", extra=AMOSTRAR)
+            return False
+        except Exception as e:
+            logging.error("Erro ao atualizar catálogo de ativos: %s", e)
+            return False
+
+    def _liquidacao_loop(self):
+        """Acompanha as ordens abertas e notifica o resultado assim que o broker as fecha."""
+        while not self._keepalive_stop.wait(1):
+            with self._ordens_lock:
+                abertas = list(self._ordens_abertas.items())
+            agora = time.time()
+            for order_id, ordem in abertas:
+                try:
+                    lucro = self.sessao.resultado_ordem(order_id)
+                except Exception as e:
+                    logging.debug("Falha ao ler resultado da ordem %s: %s", order_id, e, extra=AMOSTRAR)
+                    continue
+                if lucro is None:
+                    if agora > ordem['expira_em'] + 600:
+                        logging.warning("Ordem %s sem resultado 10 min após expirar; deixando de acompanhar.", order_id)
+                        with self._ordens_lock:
+                            self._ordens_abertas.pop(order_id, None)
+                    continue
+                with self._ordens_lock:
+                    self._ordens_abertas.pop(order_id, None)
+                self._liquidar(order_id, ordem, lucro)
+
+    def _liquidar(self, order_id, ordem, lucro):
+        logging.info("Ordem %s liquidada na conta %s: resultado %s", order_id, ordem['conta'], lucro)
+        # saldo mudou no broker: próxima leitura vai buscar o valor atualizado
+        self.estado_contas.invalidar(ordem['conta'])
+        if self.historico:
+            self.historico.liquidar(order_id, lucro)
+        for callback in self.ao_liquidar:
+            try:
+                callback(ordem['conta'], lucro, ordem)
+            except Exception as e:
+                logging.error("Erro no callback de liquidação da ordem %s: %s", order_id, e)
 
     def selecionar_conta(self, tipo_conta):
-        """Seleciona a conta REAL ou PRACTICE na IQ Option."""
+        """
+        Seleciona a conta REAL ou PRACTICE na IQ Option.
+        Ordens e saldos são endereçados pelo balance id; esta seleção só define a conta padrão.
+        """
         if not self.api:
             return False
         conta = tipo_conta.upper()
+        if conta not in ("REAL", "PRACTICE"):
+            logging.error("Tipo de conta inválido: %s", tipo_conta)
+            return False
+        if conta == self.conta_atual:
+            return True
         try:
-            if conta == "REAL":
-                self.api.change_balance("REAL")
-            elif conta == "PRACTICE":
-                self.api.change_balance("PRACTICE")
-            else:
-                logging.error(f"Tipo de conta inválido: {tipo_conta}")
-                return False
+            with self._chamada_broker('usar_conta', PRIORIDADE_ORDEM):
+                self.sessao.usar_conta(conta)
             self.conta_atual = conta
-            logging.info(f"Conta alterada para: {self.conta_atual}")
+            logging.info("Conta alterada para: %s", self.conta_atual)
             return True
         except Exception as e:
-            logging.error(f"Erro ao alterar conta: {e}")
+            logging.error("Erro ao alterar conta: %s", e)
             return False
 
     def get_saldo(self):
         """Retorna o saldo da conta selecionada."""
         if not self.api:
             return 0
-        return self.api.get_balance()
+        estado = self.get_estado_conta(self.conta_atual or "PRACTICE")
+        return estado['saldo'] if estado else 0
+
+    def atualizar_estado_contas(self, prioridade=PRIORIDADE_LEITURA):
+        """Lê saldo e moeda de todas as contas numa única chamada ao broker."""
+        if not self.api:
+            return False
+        try:
+            with self._chamada_broker('saldos', prioridade):
+                balances = self.sessao.saldos()
+            self.estado_contas.atualizar_por_balances(balances)
+            return True
+        except BrokerSobrecarregado:
+            raise
+        except Exception as e:
+            logging.error("Erro ao atualizar estado das contas: %s", e)
+            return False
+
+    def _aplicar_push_saldo(self):
+        """Aplica ao cache o último saldo recebido por push (balance-changed) do websocket."""
+        perfil = getattr(getattr(self.api, 'api', None), 'profile', None)
+        if perfil is None:
+            return
+        push = (getattr(perfil, 'balance_id', None), getattr(perfil, 'balance', None))
+        if push == self._ultimo_push_saldo or None in push:
+            return
+        self._ultimo_push_saldo = push
+        self.estado_contas.atualizar_por_balance_id(*push)
+
+    def get_estado_conta(self, tipo_conta, max_idade=None, prioridade=PRIORIDADE_LEITURA):
+        """
+        Retorna {'saldo', 'moeda', ...} da conta a partir do cache em memória.
+        Só consulta o broker quando o estado está ausente ou mais velho que o limite;
+        o caminho do trade passa PRIORIDADE_ORDEM para não disputar com as leituras.
+        """
+        if not self.api:
+            return None
+        self._aplicar_push_saldo()
+        estado = self.estado_contas.obter(tipo_conta, max_idade)
+        if estado is None and self.atualizar_estado_contas(prioridade):
+            estado = self.estado_contas.obter(tipo_conta)
+        return estado
 
-    def get_candles(self, ativo, timeframe, quantidade):
-        """Busca candles do ativo na conta selecionada."""
+    def get_candles(self, ativo, timeframe, quantidade, fim=None):
+        """
+        Busca os candles do ativo até `fim` (timestamp; padrão: agora), trazendo do broker só o que
+        ainda não está em cache ou, com CANDLE_STORE_DIR, no histórico em disco.
+        """
         if not self.api:
             return None
         try:
-            candles = self.api.get_candles(ativo, timeframe * 60, quantidade, time.time())
-            return candles
+            timeframe, quantidade = int(timeframe), int(quantidade)
+
+            def buscar(n, fim_janela):
+                with self._chamada_broker('candles', PRIORIDADE_LEITURA):
+                    return self.sessao.candles(ativo, timeframe * 60, n, fim_janela)
+
+            if self.armazem_candles:
+                registros = self.armazem_candles.obter(ativo, timeframe, quantidade, buscar, fim)
+                return para_velas(registros, timeframe * 60) or None
+            if fim is not None:
+                return buscar(quantidade, fim)
+            return self.cache_candles.obter(ativo, timeframe, quantidade, buscar)
+        except BrokerSobrecarregado:
+            raise
         except Exception as e:
-            logging.error(f"Erro ao buscar candles: {e}")
+            logging.error("Erro ao buscar candles: %s", e)
             return None
 
-    def comprar_ativo(self, ativo, valor, acao, duracao):
-        """Executa uma ordem de compra na conta selecionada."""
+    def iniciar_stream_candles(self, ativo, tamanho):
+        """Assina os candles realtime do ativo no broker."""
+        if not self.sessao:
+            raise RuntimeError("Sem conexão com a IQ Option")
+        with self._chamada_broker('stream_candles', PRIORIDADE_LEITURA):
+            self.sessao.iniciar_stream_candles(ativo, tamanho)
+
+    def parar_stream_candles(self, ativo, tamanho):
+        if self.sessao:
+            try:
+                self.sessao.parar_stream_candles(ativo, tamanho)
+            except Exception as e:
+                logging.error("Erro ao encerrar stream de candles: %s", e)
+
+    def ler_stream_candles(self, ativo, tamanho):
+        return self.sessao.ler_stream_candles(ativo, tamanho) if self.sessao else {}
+
+    def comprar_ativo(self, ativo, valor, acao, duracao, tipo_conta=None):
+        """Executa uma ordem de compra na conta informada (ou na conta selecionada)."""
         if not self.api:
             return False, None
+        conta = (tipo_conta or self.conta_atual or "PRACTICE").upper()
+        inicio = time.perf_counter()
+        check, order_id, mensagem = False, None, None
         try:
-            with self._get_trade_lock():
-                logging.info(f"Executando compra: {acao.upper()} em {ativo} por ${valor}")
-                # Reconecta se necessário
+            logging.info("Executando compra na conta %s: %s em %s por $%s", conta, acao.upper(), ativo, valor)
+            # A reconexão é feita em background; a ordem só aguarda a sessão voltar (com prazo)
+            with ETAPAS_TRADE.medir('verificar_conexao'):
                 if not self.api.check_connect():
-                    self.reconectar()
-                    if not self.api.check_connect():
-                        logging.error("Conexão perdida com IQ Option e reconexão falhou.")
-                        return False, None
-                # Tenta BINÁRIA diretamente (removendo digital)
-                logging.info("Executando trade BINÁRIA...")
-                if acao.lower() == "call":
-                    check, order_id = self.api.buy(valor, ativo, "call", duracao)
-                else:
-                    check, order_id = self.api.buy(valor, ativo, "put", duracao)
-                logging.info(f"Resultado da compra BINÁRIA: {check}, Order ID: {order_id}")
-                return check, order_id
-                
+                    self._sinalizar_queda()
+            if not self.pronto.is_set():
+                with ETAPAS_TRADE.medir('aguardando_reconexao'):
+                    conectado = self.aguardar_conexao()
+                if not conectado:
+                    logging.error("Conexão perdida com IQ Option e não restabelecida a tempo.")
+                    mensagem = "Conexão perdida com IQ Option"
+                    return False, None
+            # Tenta BINÁRIA diretamente (removendo digital).
+            # Ordens por balance id usam request ids próprios e podem seguir em paralelo;
+            # no modo sem balance id a sessão serializa troca de conta + compra.
+            direcao = "call" if acao.lower() == "call" else "put"
+            with self._chamada_broker('comprar', PRIORIDADE_ORDEM):
+                check, order_id = self.sessao.comprar(conta, valor, ativo, direcao, duracao)
+            logging.info("Resultado da compra BINÁRIA: %s, Order ID: %s", check, order_id)
+            if check:
+                # saldo em cache vale até o trade liquidar; depois disso é relido do broker
+                self.estado_contas.debitar(conta, valor, time.time() + duracao * 60 + 5)
+                with self._ordens_lock:
+                    self._ordens_abertas[order_id] = {
+                        'order_id': order_id, 'conta': conta, 'ativo': ativo, 'valor': valor,
+                        'expira_em': time.time() + duracao * 60
+                    }
+            else:
+                # em caso de rejeição o broker devolve o motivo no lugar do id
+                mensagem = order_id
+            return check, order_id
+
         except Exception as e:
-            logging.error(f"Erro na compra: {e}")
+            logging.error("Erro na compra: %s", e)
+            mensagem = str(e)
             return False, None
+        finally:
+            ORDENS.inc(conta, 'aceita' if check else 'rejeitada')
+            if self.historico:
+                self.historico.registrar(
+                    tipo_conta=conta, ativo=ativo, acao=acao, duracao=duracao, valor=valor,
+                    order_id=str(order_id) if check else None,
+                    status='aberta' if check else 'rejeitada',
+                    mensagem=str(mensagem) if mensagem is not None else None,
+                    latencia_ms=round((time.perf_counter() - inicio) * 1000, 2)
+                )
 
     def get_moeda_conta(self):
         """Retorna a moeda da conta selecionada (ex: BRL, USD, EUR)."""
         if not self.api:
             return None
         try:
-            profile = self.api.get_profile_ansyc()
+            with self._chamada_broker('perfil', PRIORIDADE_LEITURA):
+                profile = self.api.get_profile_ansyc()
             if profile and 'currency' in profile:
                 return profile['currency']
             return None
         except Exception as e:
-            logging.error(f"Erro ao obter moeda da conta: {e}")
+            logging.error("Erro ao obter moeda da conta: %s", e)
             return None
\ No newline at end of file
@@ -0,0 +1,253 @@
+# backtest/backtest.py
+"""
+Backtest do gerenciamento por percentual.
+
+Reproduz arquivos de sinais sobre candles históricos e dimensiona cada entrada com a mesma
+regra de produção (`GerenciamentoPorcentagem.calcular_entrada`), simulando payout e expiração
+das opções binárias. Relata banca final, curva de capital e drawdowns; varreduras de
+ENTRY_PERCENTAGE/GERENCIAMENTO_PERCENT/payout/banca rodam em paralelo nos núcleos da máquina.
+
+    python -m backtest.backtest --candles candles.csv --sinais sinais.jsonl
+    python -m backtest.backtest --candles candles.csv --sinais sinais.csv \\
+        --entrada 1,2,3,5 --limite 5,10 --payout 0.8,0.87 --banca 1000 --saida resultado.json
+
+Candles (CSV ou JSON lines): ativo, from, open, close — um candle por linha, `from` em epoch (s).
+Sinais (CSV ou JSON lines): timestamp, ativo, acao (call/put/compra/venda...), duracao (min) e,
+opcionalmente, percent — o mesmo corpo do webhook /trade, com o horário do sinal.
+"""
+import argparse
+import csv
+import heapq
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from API.gerenciamento import EstatisticasConta, GerenciamentoPorcentagem
+
+# mesmos sinônimos aceitos pelo /trade
+ACOES = {
+    'call': 1, 'buy': 1, 'comprar': 1, 'compra': 1,
+    'put': -1, 'sell': -1, 'vender': -1, 'venda': -1
+}
+WIN, EMPATE, LOSS = 1, 0, -1
+
+
+def ler_registros(caminho):
+    """Lê um arquivo CSV (com cabeçalho) ou JSON lines como lista de dicionários."""
+    with open(caminho, newline='') as f:
+        if caminho.lower().endswith('.csv'):
+            return list(csv.DictReader(f))
+        return [json.loads(linha) for linha in f if linha.strip()]
+
+
+def carregar_candles(registros):
+    """{ativo: (froms, opens, closes, timeframe_segundos)} com arrays ordenados por `from`."""
+    por_ativo = {}
+    for r in registros:
+        por_ativo.setdefault(r['ativo'], []).append((int(float(r['from'])), float(r['open']), float(r['close'])))
+    series = {}
+    for ativo, linhas in por_ativo.items():
+        dados = np.array(sorted(set(linhas)), dtype=float)
+        froms = dados[:, 0].astype(np.int64)
+        diferencas = np.diff(froms)
+        timeframe = int(diferencas[diferencas > 0].min()) if len(froms) > 1 else 60
+        series[ativo] = (froms, dados[:, 1], dados[:, 2], timeframe)
+    return series
+
+
+def resolver_sinais(sinais, series):
+    """
+    Decide o resultado de cada sinal pelos candles, uma única vez para toda a varredura
+    (não depende do dimensionamento). A entrada é a abertura do primeiro candle a partir do
+    horário do sinal; a saída é o fechamento do candle que termina na expiração.
+    Retorna (eventos ordenados por abertura, contagem de sinais descartados por motivo).
+    """
+    descartados = {}
+    grupos = {}
+    for sinal in sinais:
+        ativo = sinal.get('ativo')
+        direcao = ACOES.get(str(sinal.get('acao', sinal.get('action', ''))).strip().lower())
+        percentual = sinal.get('percent_banca', sinal.get('percent', sinal.get('valor_entrada')))
+        try:
+            instante = float(sinal['timestamp'])
+            duracao = int(sinal['duracao'])
+            percentual = float(percentual) if percentual not in (None, '') else None
+        except (KeyError, TypeError, ValueError):
+            direcao = None
+        if direcao is None:
+            descartados['invalido'] = descartados.get('invalido', 0) + 1
+            continue
+        if ativo not in series:
+            descartados['sem_candles'] = descartados.get('sem_candles', 0) + 1
+            continue
+        grupos.setdefault(ativo, []).append((instante, duracao, direcao, percentual))
+
+    eventos = []
+    for ativo, linhas in grupos.items():
+        froms, opens, closes, timeframe = series[ativo]
+        instantes = np.array([l[0] for l in linhas])
+        duracoes = np.array([l[1] for l in linhas], dtype=np.int64) * 60
+        # candle de entrada: o primeiro que abre no horário do sinal ou depois (até um candle de atraso)
+        i = np.searchsorted(froms, instantes, side='left')
+        i_valido = np.minimum(i, len(froms) - 1)
+        entrada_ok = (i < len(froms)) & (froms[i_valido] - instantes < timeframe)
+        abertura = froms[i_valido]
+        alvo = abertura + duracoes - timeframe
+        k = np.minimum(np.searchsorted(froms, alvo, side='left'), len(froms) - 1)
+        saida_ok = entrada_ok & (froms[k] == alvo) & (duracoes % timeframe == 0)
+        variacao = np.sign(closes[k] - opens[i_valido]).astype(int)
+        for n, (_, duracao, direcao, percentual) in enumerate(linhas):
+            if not saida_ok[n]:
+                motivo = 'sem_candle_entrada' if not entrada_ok[n] else 'sem_candle_expiracao'
+                descartados[motivo] = descartados.get(motivo, 0) + 1
+                continue
+            resultado = WIN if variacao[n] == direcao else EMPATE if variacao[n] == 0 else LOSS
+            eventos.append((int(abertura[n]), int(abertura[n] + duracao * 60), resultado, percentual, ativo))
+    eventos.sort(key=lambda e: e[0])
+    return eventos, descartados
+
+
+def simular(eventos, entrada_padrao, limite_maximo, banca_inicial, payout, curva=False):
+    """
+    Executa a sequência de eventos com o dimensionamento de produção. A entrada sai do saldo
+    na abertura e volta com o lucro na expiração; ordens simultâneas dividem a mesma banca.
+    """
+    gerenciador = GerenciamentoPorcentagem(banca_inicial, {'entrada_padrao': entrada_padrao, 'limite_maximo': limite_maximo})
+    estatisticas = EstatisticasConta()
+    saldo = banca_inicial
+    em_aberto = 0.0
+    abertas = []  # heap de (expira_em, seq, valor, lucro)
+    seq = itertools.count()
+    pico, drawdown_pct = banca_inicial, 0.0
+    pontos = [(eventos[0][0], banca_inicial)] if curva and eventos else []
+    ignoradas = 0
+
+    def liquidar_ate(instante):
+        nonlocal saldo, em_aberto, pico, drawdown_pct
+        while abertas and abertas[0][0] <= instante:
+            expira_em, _, valor, lucro = heapq.heappop(abertas)
+            saldo += valor + lucro
+            em_aberto -= valor
+            estatisticas.registrar(round(lucro, 2))
+            # capital = saldo livre + entradas ainda abertas
+            capital = saldo + em_aberto if abertas else saldo
+            if capital > pico:
+                pico = capital
+            elif pico > 0:
+                drawdown_pct = max(drawdown_pct, (pico - capital) / pico * 100)
+            if curva:
+                pontos.append((expira_em, round(capital, 2)))
+
+    for abertura, expiracao, resultado, percentual, _ in eventos:
+        liquidar_ate(abertura)
+        valor = gerenciador.calcular_entrada(saldo, percentual)
+        if valor > saldo:
+            ignoradas += 1
+            continue
+        saldo -= valor
+        em_aberto += valor
+        lucro = valor * payout if resultado == WIN else 0.0 if resultado == EMPATE else -valor
+        heapq.heappush(abertas, (expiracao, next(seq), valor, lucro))
+    liquidar_ate(float('inf'))
+
+    resumo = estatisticas.to_dict()
+    relatorio = {
+        'entrada_padrao': entrada_padrao,
+        'limite_maximo': limite_maximo,
+        'banca_inicial': banca_inicial,
+        'payout': payout,
+        'banca_final': round(saldo, 2),
+        'retorno_percentual': round((saldo / banca_inicial - 1) * 100, 2) if banca_inicial else 0.0,
+        'trades': resumo['total_wins'] + resumo['total_losses'] + resumo['total_empates'],
+        'ignoradas_saldo': ignoradas,
+        'wins': resumo['total_wins'],
+        'losses': resumo['total_losses'],
+        'empates': resumo['total_empates'],
+        'winrate': resumo['winrate'],
+        'maior_sequencia_losses': resumo['maior_sequencia_losses'],
+        'drawdown_maximo': resumo['drawdown_maximo'],
+        'drawdown_maximo_percentual': round(drawdown_pct, 2),
+    }
+    if curva:
+        relatorio['curva'] = pontos
+    return relatorio
+
+
+_eventos_worker = None
+
+
+def _iniciar_worker(eventos):
+    global _eventos_worker
+    _eventos_worker = eventos
+
+
+def _simular_combinacao(parametros):
+    return simular(_eventos_worker, *parametros)
+
+
+def varrer(eventos, grade, processos=None):
+    """Simula cada combinação (entrada, limite, banca, payout) da grade; em paralelo com processos > 1."""
+    combinacoes = list(grade)
+    processos = processos or os.cpu_count() or 1
+    if processos <= 1 or len(combinacoes) <= 1:
+        return [simular(eventos, *c) for c in combinacoes]
+    # os eventos vão uma vez para cada processo; cada tarefa leva só os parâmetros
+    lote = max(1, len(combinacoes) // (processos * 4))
+    with ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_worker, initargs=(eventos,)) as executor:
+        return list(executor.map(_simular_combinacao, combinacoes, chunksize=lote))
+
+
+def _lista(texto, tipo=float):
+    return [tipo(v) for v in str(texto).split(',') if v.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest do gerenciamento por percentual sobre candles históricos")
+    parser.add_argument('--candles', required=True, help="candles históricos (CSV ou JSON lines: ativo, from, open, close)")
+    parser.add_argument('--sinais', required=True, help="sinais (CSV ou JSON lines: timestamp, ativo, acao, duracao[, percent])")
+    parser.add_argument('--entrada', default=os.getenv('ENTRY_PERCENTAGE', '3.0'),
+                        help="ENTRY_PERCENTAGE a testar, separados por vírgula")
+    parser.add_argument('--limite', default=os.getenv('GERENCIAMENTO_PERCENT', '5.0'),
+                        help="GERENCIAMENTO_PERCENT a testar, separados por vírgula")
+    parser.add_argument('--banca', default='1000', help="banca inicial (uma ou mais, separadas por vírgula)")
+    parser.add_argument('--payout', default='0.87', help="payout das opções em fração (ex.: 0.8,0.87)")
+    parser.add_argument('--processos', type=int, default=None, help="processos da varredura (padrão: núcleos da máquina)")
+    parser.add_argument('--curva', action='store_true', help="inclui a curva de capital de cada combinação na saída JSON")
+    parser.add_argument('--saida', help="grava o relatório em JSON")
+    parser.add_argument('--top', type=int, default=20, help="combinações exibidas, ordenadas pelo retorno")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    series = carregar_candles(ler_registros(args.candles))
+    eventos, descartados = resolver_sinais(ler_registros(args.sinais), series)
+    print(f"{len(eventos)} sinais com resultado em {len(series)} ativos"
+          f"{' | descartados: ' + json.dumps(descartados) if descartados else ''}")
+    if not eventos:
+        return 1
+
+    grade = itertools.product(_lista(args.entrada), _lista(args.limite), _lista(args.banca), _lista(args.payout))
+    grade = [(e, l, b, p, args.curva) for e, l, b, p in grade]
+    resultados = varrer(eventos, grade, args.processos)
+    resultados.sort(key=lambda r: r['retorno_percentual'], reverse=True)
+
+    print(f"{'entrada%':>8} {'limite%':>8} {'banca':>10} {'payout':>6} {'final':>12} {'retorno%':>9} "
+          f"{'trades':>7} {'winrate':>7} {'dd_max':>10} {'dd_max%':>8}")
+    for r in resultados[:args.top]:
+        print(f"{r['entrada_padrao']:>8g} {r['limite_maximo']:>8g} {r['banca_inicial']:>10g} {r['payout']:>6g} "
+              f"{r['banca_final']:>12.2f} {r['retorno_percentual']:>9.2f} {r['trades']:>7} {r['winrate']:>7.2f} "
+              f"{r['drawdown_maximo']:>10.2f} {r['drawdown_maximo_percentual']:>8.2f}")
+    print(f"{len(resultados)} combinações em {time.perf_counter() - inicio:.1f}s")
+
+    if args.saida:
+        with open(args.saida, 'w') as f:
+            json.dump({'sinais': len(eventos), 'descartados': descartados, 'resultados': resultados}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,233 @@
+# benchmarks/benchmark_api.py
+"""
+Benchmark de latência e vazão da API HTTP.
+
+Sobe `API.api_server:app` contra o simulador local do broker (IQ_SIMULATOR) e dispara
+requisições com concorrência configurável, medindo p50/p95/p99 e requisições por segundo
+por endpoint. Os resultados podem ser salvos como baseline em JSON; comparando com ela,
+o processo sai com código 1 se alguma métrica piorar além do limite.
+
+    python -m benchmarks.benchmark_api
+    python -m benchmarks.benchmark_api --concorrencia 1,8,32 --requisicoes 1000 --salvar-baseline
+    python -m benchmarks.benchmark_api --limite-regressao 0.2
+    python -m benchmarks.benchmark_api --url http://localhost:8080   # servidor já em execução
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BASELINE_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# nome -> (método, caminho, corpo JSON)
+ENDPOINTS = {
+    'ping': ('GET', '/ping', None),
+    'balance': ('GET', '/balance?tipo_conta=PRACTICE', None),
+    'get_saldos': ('GET', '/get_saldos', None),
+    'get_candles': ('POST', '/get_candles', {'ativo': 'EURUSD', 'timeframe': 60, 'quantidade': 100}),
+    'get_candles_bulk': ('POST', '/get_candles/bulk', {'timeframe': 60, 'quantidade': 100,
+                                                       'itens': ['EURUSD', 'GBPUSD', 'USDJPY', 'AUDUSD']}),
+    'trade': ('POST', '/trade', {'ativo': 'EURUSD', 'acao': 'call', 'duracao': 1, 'tipo_conta': 'PRACTICE', 'percent': 1}),
+}
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) com interpolação linear entre as amostras ordenadas."""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    posicao = (len(ordenados) - 1) * p / 100
+    baixo, alto = math.floor(posicao), math.ceil(posicao)
+    return ordenados[baixo] + (ordenados[alto] - ordenados[baixo]) * (posicao - baixo)
+
+
+def resumir(latencias, erros, duracao):
+    """Consolida as latências (segundos) de uma rodada em métricas em milissegundos."""
+    total = len(latencias)
+    return {
+        'requisicoes': total,
+        'erros': erros,
+        'p50_ms': round(percentil(latencias, 50) * 1000, 3) if latencias else None,
+        'p95_ms': round(percentil(latencias, 95) * 1000, 3) if latencias else None,
+        'p99_ms': round(percentil(latencias, 99) * 1000, 3) if latencias else None,
+        'rps': round(total / duracao, 1) if duracao > 0 else None,
+    }
+
+
+def medir(enviar, requisicoes, concorrencia):
+    """
+    Executa `enviar()` `requisicoes` vezes com `concorrencia` threads.
+    `enviar` retorna o status HTTP; >= 400 ou exceção contam como erro.
+    """
+    latencias, erros = [], 0
+    lock = threading.Lock()
+
+    def uma(_):
+        nonlocal erros
+        inicio = time.perf_counter()
+        try:
+            ok = enviar() < 400
+        except Exception:
+            ok = False
+        decorrido = time.perf_counter() - inicio
+        with lock:
+            latencias.append(decorrido)
+            if not ok:
+                erros += 1
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        list(executor.map(uma, range(requisicoes)))
+    return resumir(latencias, erros, time.perf_counter() - inicio)
+
+
+def comparar(atual, baseline, limite, folga_ms=1.0):
+    """
+    Compara resultados com a baseline e retorna a lista de regressões.
+    Latências regridem se crescerem mais que `limite` (fração) e mais que `folga_ms`;
+    a vazão regride se cair mais que `limite`.
+    """
+    regressoes = []
+    for chave, base in baseline.get('resultados', {}).items():
+        medido = atual.get('resultados', {}).get(chave)
+        if not medido:
+            continue
+        for metrica in ('p50_ms', 'p95_ms', 'p99_ms'):
+            antes, agora = base.get(metrica), medido.get(metrica)
+            if antes is None or agora is None:
+                continue
+            if agora > antes * (1 + limite) and agora - antes > folga_ms:
+                regressoes.append(f"{chave} {metrica}: {antes} -> {agora} (+{(agora / antes - 1) * 100:.0f}%)")
+        antes, agora = base.get('rps'), medido.get('rps')
+        if antes and agora is not None and agora < antes * (1 - limite):
+            regressoes.append(f"{chave} rps: {antes} -> {agora} ({(agora / antes - 1) * 100:.0f}%)")
+    return regressoes
+
+
+def iniciar_servidor(latencia_broker, logs=False):
+    """Sobe o app em processo (threaded) contra o simulador e retorna (url, servidor)."""
+    os.environ['IQ_SIMULATOR'] = 'true'
+    os.environ['SIM_LATENCY'] = latencia_broker
+    os.environ.setdefault('SIM_SEED', '1')
+    os.environ.setdefault('SIM_TIME_SCALE', '0.01')
+    os.environ.setdefault('SIM_BALANCE_PRACTICE', '1000000000')
+    # o simulador não tem throttling: sem limitador, mede-se só o custo da própria API
+    os.environ.setdefault('BROKER_RATE_LIMIT', '0')
+    os.environ.setdefault('HISTORY_DB_PATH', os.path.join(tempfile.mkdtemp(prefix='bench-'), 'historico.db'))
+
+    from werkzeug.serving import make_server
+    from API.api_server import app, trader
+
+    if not logs:
+        logging.getLogger().setLevel(logging.WARNING)
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    # o login é em background: só mede depois de conectado e aquecido
+    if not trader.pronto.wait(60):
+        raise RuntimeError(f"App não ficou pronto: {trader.status_conexao()}")
+    servidor = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, name="benchmark-http", daemon=True).start()
+    return f"http://127.0.0.1:{servidor.server_port}", servidor
+
+
+def executar(url, endpoints, niveis, requisicoes, aquecimento=20):
+    """Roda cada endpoint em cada nível de concorrência e retorna o relatório."""
+    sessoes = threading.local()
+
+    def cliente():
+        sessao = getattr(sessoes, 's', None)
+        if sessao is None:
+            sessao = sessoes.s = requests.Session()
+        return sessao
+
+    resultados = {}
+    for nome in endpoints:
+        metodo, caminho, corpo = ENDPOINTS[nome]
+
+        def enviar():
+            # chave única: corpos idênticos seriam respondidos pelo cache de idempotência
+            dados = dict(corpo, idempotency_key=uuid.uuid4().hex) if corpo else None
+            return cliente().request(metodo, url + caminho, json=dados, timeout=30).status_code
+
+        for _ in range(aquecimento):
+            enviar()
+        for concorrencia in niveis:
+            metricas = medir(enviar, requisicoes, concorrencia)
+            resultados[f"{nome}@{concorrencia}"] = dict(endpoint=nome, concorrencia=concorrencia, **metricas)
+            print(f"{nome:<12} c={concorrencia:<4} p50={metricas['p50_ms']:>8.2f}ms p95={metricas['p95_ms']:>8.2f}ms "
+                  f"p99={metricas['p99_ms']:>8.2f}ms {metricas['rps']:>9.1f} req/s erros={metricas['erros']}")
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de latência e vazão da API HTTP")
+    parser.add_argument('--url', help="servidor já em execução (padrão: sobe o app em processo com o simulador)")
+    parser.add_argument('--endpoints', default='balance,get_candles,trade',
+                        help=f"lista separada por vírgula entre: {', '.join(ENDPOINTS)}")
+    parser.add_argument('--concorrencia', default='1,8,32', help="níveis de concorrência, ex.: 1,8,32")
+    parser.add_argument('--requisicoes', type=int, default=500, help="requisições por endpoint e nível")
+    parser.add_argument('--latencia-broker', default='fixed:5', help="SIM_LATENCY do simulador (modo em processo)")
+    parser.add_argument('--baseline', default=BASELINE_PADRAO, help="arquivo JSON da baseline")
+    parser.add_argument('--salvar-baseline', action='store_true', help="grava os resultados como nova baseline")
+    parser.add_argument('--limite-regressao', type=float, default=0.2,
+                        help="piora máxima tolerada em relação à baseline (fração, 0.2 = 20%%)")
+    parser.add_argument('--folga-ms', type=float, default=1.0,
+                        help="diferença absoluta mínima de latência para contar como regressão")
+    parser.add_argument('--saida', help="grava os resultados desta execução em JSON")
+    parser.add_argument('--logs', action='store_true', help="mantém o log INFO do app durante a medição")
+    args = parser.parse_args(argv)
+
+    endpoints = [e.strip() for e in args.endpoints.split(',') if e.strip()]
+    desconhecidos = [e for e in endpoints if e not in ENDPOINTS]
+    if desconhecidos:
+        parser.error(f"endpoints desconhecidos: {', '.join(desconhecidos)}")
+    niveis = [int(c) for c in args.concorrencia.split(',')]
+
+    url = args.url.rstrip('/') if args.url else iniciar_servidor(args.latencia_broker, args.logs)[0]
+    relatorio = {
+        'meta': {
+            'criado_em': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'url': args.url or 'em processo',
+            'latencia_broker': None if args.url else args.latencia_broker,
+            'requisicoes': args.requisicoes,
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+        },
+        'resultados': executar(url, endpoints, niveis, args.requisicoes),
+    }
+
+    if args.saida:
+        with open(args.saida, 'w') as f:
+            json.dump(relatorio, f, indent=2)
+    if args.salvar_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(relatorio, f, indent=2)
+        print(f"Baseline salva em {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"Sem baseline em {args.baseline} (use --salvar-baseline)")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressoes = comparar(relatorio, baseline, args.limite_regressao, args.folga_ms)
+    if regressoes:
+        print(f"REGRESSÃO acima de {args.limite_regressao * 100:.0f}% em relação à baseline:")
+        for r in regressoes:
+            print(f"  - {r}")
+        return 1
+    print("Sem regressões em relação à baseline.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,130 @@
+# benchmarks/benchmark_risco.py
+"""
+Custo da checagem pré-trade do motor de risco (API/risco.py) por ordem.
+
+Compara o MotorRisco atual (SQLite em memória e em arquivo, compartilhável entre workers)
+com a referência em memória de processo único que ele substituiu, medindo o ciclo
+reservar -> confirmar -> liquidar com `abertas` posições já em aberto (o custo não deve
+crescer com elas: os totais por conta e por ativo são mantidos, sem varrer as posições).
+
+    python -m benchmarks.benchmark_risco
+    python -m benchmarks.benchmark_risco --ordens 5000 --abertas 0,1000,10000
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from API.risco import MotorRisco
+from benchmarks.benchmark_api import percentil
+
+LIMITES = {'max_exposicao_percentual': 90, 'max_posicoes': 10 ** 6, 'max_posicoes_por_ativo': 10 ** 6,
+           'max_perda_diaria': 10 ** 9}
+
+
+class MotorRiscoMemoria:
+    """Referência: o motor anterior, com contadores em dicionários do processo (sem kill switch/vencimento)."""
+    def __init__(self, limites):
+        self.limites = dict(limites)
+        self.contas = {}
+        self._posicoes = {}
+        self._por_ordem = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def reservar(self, tipo_conta, ativo, valor, saldo, duracao):
+        limites = self.limites
+        with self._lock:
+            conta = tipo_conta.upper()
+            risco = self.contas.setdefault(conta, {'exposicao': 0.0, 'posicoes': 0, 'por_ativo': {}, 'resultado': 0.0})
+            if -risco['resultado'] + risco['exposicao'] + valor > limites['max_perda_diaria']:
+                return None, "perda diária"
+            if risco['posicoes'] + 1 > limites['max_posicoes']:
+                return None, "posições"
+            por_ativo = risco['por_ativo'].setdefault(ativo, [0, 0.0])
+            if por_ativo[0] + 1 > limites['max_posicoes_por_ativo']:
+                return None, "posições no ativo"
+            if risco['exposicao'] + valor > (saldo + risco['exposicao']) * limites['max_exposicao_percentual'] / 100:
+                return None, "exposição"
+            reserva = next(self._ids)
+            self._posicoes[reserva] = (conta, ativo, valor)
+            risco['exposicao'] += valor
+            risco['posicoes'] += 1
+            por_ativo[0] += 1
+            por_ativo[1] += valor
+            return reserva, None
+
+    def confirmar(self, reserva, order_id):
+        with self._lock:
+            self._por_ordem[order_id] = reserva
+
+    def liquidar(self, order_id, lucro):
+        with self._lock:
+            conta, ativo, valor = self._posicoes.pop(self._por_ordem.pop(order_id))
+            risco = self.contas[conta]
+            risco['exposicao'] -= valor
+            risco['posicoes'] -= 1
+            risco['por_ativo'][ativo][0] -= 1
+            risco['por_ativo'][ativo][1] -= valor
+            risco['resultado'] += lucro
+
+
+def medir(motor, ordens, abertas):
+    """Latências (s) de reservar e do ciclo completo, com `abertas` posições pré-existentes."""
+    for i in range(abertas):
+        motor.reservar('PRACTICE', f"ATIVO{i % 50}", 1.0, 10 ** 9, 60)
+    reservas, ciclos = [], []
+    for i in range(ordens):
+        inicio = time.perf_counter()
+        reserva, motivo = motor.reservar('PRACTICE', 'EURUSD', 1.0, 10 ** 9, 1)
+        meio = time.perf_counter()
+        assert reserva is not None, motivo
+        motor.confirmar(reserva, f"ordem-{i}")
+        motor.liquidar(f"ordem-{i}", 0.87 if i % 2 else -1.0)
+        ciclos.append(time.perf_counter() - inicio)
+        reservas.append(meio - inicio)
+    return {
+        'reservar_p50_us': round(percentil(reservas, 50) * 1e6, 1),
+        'reservar_p99_us': round(percentil(reservas, 99) * 1e6, 1),
+        'ciclo_p50_us': round(percentil(ciclos, 50) * 1e6, 1),
+        'ciclo_p99_us': round(percentil(ciclos, 99) * 1e6, 1),
+    }
+
+
+def executar(ordens, niveis):
+    diretorio = tempfile.mkdtemp(prefix='bench-risco-')
+    variantes = {
+        'memoria (anterior)': lambda n: MotorRiscoMemoria(LIMITES),
+        'sqlite :memory:': lambda n: MotorRisco(LIMITES),
+        'sqlite arquivo': lambda n: MotorRisco(LIMITES, caminho=os.path.join(diretorio, f"risco-{n}.db")),
+    }
+    resultados = {}
+    for abertas in niveis:
+        for nome, criar in variantes.items():
+            resultados[f"{nome}@{abertas}"] = medir(criar(abertas), ordens, abertas)
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Custo por ordem da checagem do motor de risco")
+    parser.add_argument('--ordens', type=int, default=2000, help="ordens medidas por variante")
+    parser.add_argument('--abertas', default='0,1000', help="posições já abertas antes da medição, ex.: 0,1000,10000")
+    parser.add_argument('--saida', help="grava os resultados em JSON")
+    args = parser.parse_args(argv)
+
+    resultados = executar(args.ordens, [int(n) for n in args.abertas.split(',')])
+    print(f"{'variante':<28}{'reservar p50':>14}{'reservar p99':>14}{'ciclo p50':>12}{'ciclo p99':>12}  (µs)")
+    for nome, r in resultados.items():
+        print(f"{nome:<28}{r['reservar_p50_us']:>14}{r['reservar_p99_us']:>14}{r['ciclo_p50_us']:>12}{r['ciclo_p99_us']:>12}")
+    if args.saida:
+        with open(args.saida, 'w') as arquivo:
+            json.dump({'resultados': resultados}, arquivo, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,60 @@
+# gunicorn.conf.py
+# Com mais de um worker, um processo gateway (API/gateway.py) mantém o único login na IQ Option
+# e os workers acessam o broker por Unix socket.
+import glob
+import logging
+import os
+import subprocess
+import sys
+import time
+
+bind = os.getenv('BIND', '0.0.0.0:8080')
+timeout = 120
+worker_class = 'gthread'
+workers = int(os.getenv('WEB_CONCURRENCY', '1') or '1')
+threads = int(os.getenv('GUNICORN_THREADS', '16') or '16')
+
+# só tenants (TENANTS_FILE sem IQ_EMAIL): cada tenant tem o próprio gateway, subido sob demanda pelos workers
+SO_TENANTS = bool(os.getenv('TENANTS_FILE')) and not os.getenv('IQ_EMAIL')
+
+if workers > 1 and not SO_TENANTS:
+    # cada worker logando por conta própria derruba as sessões uns dos outros
+    os.environ.setdefault('BROKER_GATEWAY_SOCKET', '/tmp/bot-trader-gateway.sock')
+if workers > 1:
+    # o /metrics cai em um worker qualquer: todos gravam num diretório comum e cada scrape agrega
+    os.environ.setdefault('METRICS_DIR', '/tmp/bot-trader-metricas')
+
+_gateway = None
+
+
+def on_starting(server):
+    """Sobe o gateway antes dos workers e espera o socket ficar disponível."""
+    global _gateway
+    # contadores de uma execução anterior não devem somar nos desta
+    if os.getenv('METRICS_DIR'):
+        for arquivo in glob.glob(os.path.join(os.getenv('METRICS_DIR'), 'metricas-*.json*')):
+            os.unlink(arquivo)
+    caminho = os.getenv('BROKER_GATEWAY_SOCKET')
+    if not caminho or SO_TENANTS:
+        return
+    if os.path.exists(caminho):
+        os.unlink(caminho)
+    _gateway = subprocess.Popen([sys.executable, '-m', 'API.gateway'])
+    limite = time.time() + float(os.getenv('BROKER_GATEWAY_STARTUP_TIMEOUT', '60') or '60')
+    while not os.path.exists(caminho):
+        if _gateway.poll() is not None:
+            raise RuntimeError(f"Gateway do broker encerrou na inicialização (código {_gateway.returncode})")
+        if time.time() > limite:
+            _gateway.terminate()
+            raise RuntimeError("Gateway do broker não ficou pronto a tempo")
+        time.sleep(0.2)
+    logging.getLogger('gunicorn.error').info(f"Gateway do broker pronto em {caminho} (pid {_gateway.pid})")
+
+
+def on_exit(server):
+    if _gateway is not None and _gateway.poll() is None:
+        _gateway.terminate()
+        try:
+            _gateway.wait(10)
+        except subprocess.TimeoutExpired:
+            _gateway.kill()
@@ -11,27 +11,21 @@ import sys
 import logging
 from dotenv import load_dotenv
 
-# Adiciona o diretório API ao path
-sys.path.append(os.path.join(os.path.dirname(__file__), 'API'))
-
 # Carrega variáveis de ambiente
 load_dotenv()
 
 def main():
     """Função principal para inicializar o servidor."""
     try:
-        # Importa o servidor Flask
-        import api_server
+        # Importa o servidor Flask (mesmo nome de módulo usado pelo gunicorn: API.api_server)
+        from API import api_server
         app = api_server.app
         
-        # Configuração de logging
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s'
-        )
+        # logging já configurado pelo api_server (fila + JSON lines em logs/, API/logs.py)
         
         # Verifica se as credenciais estão configuradas
-        if not os.getenv('IQ_EMAIL') or not os.getenv('IQ_PASSWORD'):
+        simulador = os.getenv('IQ_SIMULATOR', 'false').lower() == 'true'
+        if not simulador and (not os.getenv('IQ_EMAIL') or not os.getenv('IQ_PASSWORD')):
             logging.error("❌ Credenciais IQ Option não configuradas!")
             logging.error("Configure IQ_EMAIL e IQ_PASSWORD no arquivo .env")
             sys.exit(1)
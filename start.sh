@@ -5,7 +5,7 @@ echo "🚀 Iniciando Bot Trader..."
 echo "📊 Verificando configurações..."
 
 # Verifica se as variáveis de ambiente estão configuradas
-if [ -z "$IQ_EMAIL" ] || [ -z "$IQ_PASSWORD" ]; then
+if [ "$IQ_SIMULATOR" != "true" ] && { [ -z "$IQ_EMAIL" ] || [ -z "$IQ_PASSWORD" ]; }; then
     echo "❌ Erro: IQ_EMAIL e IQ_PASSWORD devem estar configurados!"
     exit 1
 fi
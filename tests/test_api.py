@@ -0,0 +1,182 @@
+import os
+import tempfile
+
+os.environ.setdefault('IQ_SIMULATOR', 'true')
+os.environ.setdefault('SIM_SEED', '1')
+os.environ.setdefault('SIM_LATENCY', '0')
+os.environ.setdefault('BROKER_RATE_LIMIT', '0')
+os.environ.setdefault('HISTORY_DB_PATH', os.path.join(tempfile.mkdtemp(prefix='teste-api-'), 'historico.db'))
+os.environ.setdefault('LOG_DIR', '')
+os.environ.setdefault('LOG_STDERR', 'false')
+
+import threading
+
+import pytest
+
+from API import api_server
+from API.limitador import BrokerSobrecarregado, PRIORIDADE_LEITURA
+
+
+@pytest.fixture(scope='module')
+def cliente():
+    assert api_server.trader.pronto.wait(30)
+    return api_server.app.test_client()
+
+
+def test_stream_recusa_acima_do_limite(cliente, monkeypatch):
+    monkeypatch.setattr(api_server, 'vagas_stream', threading.BoundedSemaphore(1))
+    primeiro = cliente.get('/stream/candles?ativo=EURUSD&timeframe=1', buffered=False)
+    assert primeiro.status_code == 200
+    segundo = cliente.get('/stream/candles?ativo=EURUSD&timeframe=1', buffered=False)
+    assert segundo.status_code == 503 and segundo.headers['Retry-After']
+    assert api_server.trader.stream_candles.clientes() == {'EURUSD:M1': 1}
+
+    # fechar a resposta libera a vaga e a assinatura
+    primeiro.close()
+    assert api_server.trader.stream_candles.clientes() == {}
+    terceiro = cliente.get('/stream/candles?ativo=EURUSD&timeframe=1', buffered=False)
+    assert terceiro.status_code == 200
+    terceiro.close()
+
+
+def enviar_lote(cliente, corpo):
+    # chave própria por chamada: o mesmo corpo em outro teste não pode ser tratado como reenvio
+    return cliente.post('/trade/batch', json=corpo, headers={'Idempotency-Key': os.urandom(8).hex()})
+
+
+def test_lote_com_falhas_parciais(cliente, monkeypatch):
+    simulador = api_server.trader.api
+    comprar = simulador.buy
+    monkeypatch.setattr(simulador, 'buy', lambda valor, ativo, acao, duracao: (
+        (False, "Simulated rejection") if ativo == 'GBPUSD' else comprar(valor, ativo, acao, duracao)))
+
+    resposta = enviar_lote(cliente, {'tipo_conta': 'PRACTICE', 'percent': 1, 'sinais': [
+        {'ativo': 'EURUSD', 'acao': 'call', 'duracao': 1},
+        {'ativo': 'EURUSD', 'acao': 'segurar', 'duracao': 1},
+        {'ativo': 'NAOEXISTE', 'acao': 'put', 'duracao': 1},
+        {'ativo': 'GBPUSD', 'acao': 'put', 'duracao': 1},
+        {'ativo': 'USDJPY', 'acao': 'venda', 'duracao': 1, 'percent': 2},
+    ]})
+    assert resposta.status_code == 200
+    corpo = resposta.get_json()
+    assert corpo['status'] == 'sucesso' and corpo['total'] == 5 and corpo['executadas'] == 2
+    resultados = corpo['resultados']
+    assert [r['indice'] for r in resultados] == [0, 1, 2, 3, 4]
+    assert [r['status'] for r in resultados] == ['sucesso', 'erro', 'erro', 'erro', 'sucesso']
+    assert 'Ação deve ser' in resultados[1]['mensagem']
+    assert 'Ativo desconhecido' in resultados[2]['mensagem']
+    assert resultados[3]['mensagem'] == "Ordem rejeitada na Binária"
+    # o percentual do lote vale para quem não informa o próprio; todos dimensionados pelo mesmo saldo
+    saldo = corpo['saldos_anteriores']['PRACTICE']
+    assert resultados[0]['valor_investido'] == pytest.approx(saldo * 0.01, abs=0.01)
+    assert resultados[4]['valor_investido'] == pytest.approx(saldo * 0.02, abs=0.01)
+    assert resultados[4]['acao'] == 'put' and resultados[0]['order_id'] != resultados[4]['order_id']
+
+
+def test_lote_sem_nenhuma_ordem_executada(cliente):
+    corpo = enviar_lote(cliente, [{'ativo': 'NAOEXISTE', 'acao': 'call', 'duracao': 1},
+                                  {'ativo': 'EURUSD', 'acao': 'call', 'duracao': 1, 'tipo_conta': 'DEMO'}]).get_json()
+    assert corpo['status'] == 'erro' and corpo['executadas'] == 0
+    assert [r['status'] for r in corpo['resultados']] == ['erro', 'erro']
+    assert 'Tipo de conta inválido' in corpo['resultados'][1]['mensagem']
+
+
+def test_lote_para_de_dimensionar_quando_o_saldo_do_lote_acaba(cliente):
+    saldo = api_server.trader.get_estado_conta('REAL')['saldo']
+    sinais = [{'ativo': 'EURUSD', 'acao': 'call', 'duracao': 1}] * 21
+    corpo = enviar_lote(cliente, {'tipo_conta': 'REAL', 'percent': 5, 'sinais': sinais}).get_json()
+    assert corpo['saldos_anteriores'] == {'REAL': saldo}
+    assert corpo['executadas'] == 20
+    assert corpo['resultados'][20] == {"indice": 20, "status": "erro", "mensagem": "Saldo insuficiente para este sinal no lote"}
+
+
+def test_lote_valida_tamanho(cliente, monkeypatch):
+    monkeypatch.setattr(api_server, 'LOTE_MAX_SINAIS', 2)
+    sinal = {'ativo': 'EURUSD', 'acao': 'call', 'duracao': 1}
+    resposta = enviar_lote(cliente, {'sinais': [sinal] * 3})
+    assert resposta.status_code == 400 and 'Máximo de 2 sinais' in resposta.get_json()['mensagem']
+    assert enviar_lote(cliente, {'sinais': []}).status_code == 400
+    assert enviar_lote(cliente, {'sinal': sinal}).status_code == 400
+
+
+def test_reenvio_apos_erro_5xx_executa_de_novo(cliente, monkeypatch):
+    chamadas = []
+
+    def falhar(*args, **kwargs):
+        chamadas.append(args)
+        raise RuntimeError("broker fora do ar")
+    monkeypatch.setattr(api_server, '_executar_ordem', falhar)
+    sinal = {'ativo': 'EURUSD', 'acao': 'call', 'duracao': 1, 'percent': 1}
+    cabecalhos = {'Idempotency-Key': os.urandom(8).hex()}
+    assert cliente.post('/trade', json=sinal, headers=cabecalhos).status_code == 500
+    assert cliente.post('/trade', json=sinal, headers=cabecalhos).status_code == 500
+    assert len(chamadas) == 2
+
+    monkeypatch.undo()
+    primeira = cliente.post('/trade', json=sinal, headers=cabecalhos)
+    assert primeira.status_code == 200
+    reenvio = cliente.post('/trade', json=sinal, headers=cabecalhos)
+    assert reenvio.headers['Idempotent-Replayed'] == 'true' and reenvio.get_json() == primeira.get_json()
+    # sem chave e sem derivação, o mesmo sinal é uma nova ordem
+    assert cliente.post('/trade', json=sinal).get_json()['trade_info']['order_id'] != primeira.get_json()['trade_info']['order_id']
+
+
+def test_candles_em_lote(cliente, monkeypatch):
+    chamadas = []
+
+    def get_candles(ativo, timeframe, quantidade, fim=None):
+        chamadas.append((ativo, timeframe, quantidade))
+        if ativo == 'USDJPY':
+            return []
+        if ativo == 'GBPUSD':
+            raise BrokerSobrecarregado(PRIORIDADE_LEITURA, 1.0)
+        return [{'from': i * timeframe, 'close': 1.0} for i in range(quantidade)]
+    monkeypatch.setattr(api_server.trader, 'get_candles', get_candles)
+
+    resposta = cliente.post('/get_candles/bulk', json={'timeframe': 60, 'quantidade': 3, 'itens': [
+        'EURUSD',
+        {'ativo': 'EURUSD', 'timeframe': 60, 'quantidade': 3},
+        {'ativo': 'EURUSD', 'quantidade': 2},
+        {'timeframe': 60},
+        {'ativo': 'EURUSD', 'timeframe': 0},
+        {'ativo': 'USDJPY'},
+        {'ativo': 'GBPUSD', 'quantidade': 'muitas'},
+        {'ativo': 'GBPUSD'},
+    ]})
+    assert resposta.status_code == 200
+    corpo = resposta.get_json()
+    assert corpo['status'] == 'sucesso' and corpo['total'] == 8 and corpo['sucesso'] == 3
+    resultados = corpo['resultados']
+    # a resposta segue a ordem dos itens, cada um com o próprio status
+    assert [r['indice'] for r in resultados] == list(range(8))
+    assert [r['status'] for r in resultados] == ['sucesso', 'sucesso', 'sucesso', 'erro', 'erro', 'erro', 'erro', 'erro']
+    # timeframe/quantidade do corpo valem para os itens que não os informam
+    assert (resultados[0]['ativo'], resultados[0]['timeframe'], resultados[0]['quantidade']) == ('EURUSD', 60, 3)
+    assert len(resultados[0]['velas']) == 3 and len(resultados[2]['velas']) == 2
+    assert resultados[3]['mensagem'] == resultados[6]['mensagem'] == "Campos obrigatórios: ativo, timeframe, quantidade"
+    assert 'maiores que zero' in resultados[4]['mensagem']
+    assert resultados[5]['mensagem'] == "Não foi possível buscar velas"
+    assert 'Limite de chamadas ao broker' in resultados[7]['mensagem']
+    # itens idênticos vão ao broker uma única vez; inválidos nem chegam lá
+    assert sorted(chamadas) == [('EURUSD', 60, 2), ('EURUSD', 60, 3), ('GBPUSD', 60, 3), ('USDJPY', 60, 3)]
+
+
+def test_candles_em_lote_valida_corpo(cliente, monkeypatch):
+    monkeypatch.setattr(api_server, 'CANDLES_LOTE_MAX_ITENS', 2)
+    assert cliente.post('/get_candles/bulk', json={'itens': []}).status_code == 400
+    assert cliente.post('/get_candles/bulk', json={'ativo': 'EURUSD'}).status_code == 400
+    resposta = cliente.post('/get_candles/bulk', json=['EURUSD'] * 3)
+    assert resposta.status_code == 400 and 'Máximo de 2 itens' in resposta.get_json()['mensagem']
+    # nenhum item válido: status geral de erro
+    corpo = cliente.post('/get_candles/bulk', json=[{'ativo': 'EURUSD'}]).get_json()
+    assert corpo['status'] == 'erro' and corpo['sucesso'] == 0
+
+
+def test_lote_no_limite_de_exposicao(cliente, monkeypatch):
+    from API.risco import MotorRisco
+    monkeypatch.setattr(api_server.sessao_padrao, 'motor_risco', MotorRisco({'max_exposicao_percentual': 10}))
+    sinais = [{'ativo': 'EURUSD', 'acao': 'call', 'duracao': 1}] * 3
+    corpo = enviar_lote(cliente, {'tipo_conta': 'PRACTICE', 'percent': 5, 'sinais': sinais}).get_json()
+    # duas ordens de 5% ficam exatamente no limite de 10% da banca; a terceira passaria dele
+    assert [r['status'] for r in corpo['resultados']] == ['sucesso', 'sucesso', 'erro']
+    assert 'Exposição máxima de 10' in corpo['resultados'][2]['mensagem']
@@ -0,0 +1,104 @@
+import numpy as np
+
+from API.armazem_candles import REGISTRO, ArmazemCandles, de_velas, para_velas
+
+TAMANHO = 60
+AGORA = 1_700_000_000
+
+
+class BrokerFalso:
+    """get_candles do broker: `n` candles terminando na janela de `fim`, a partir de `primeiro`."""
+    def __init__(self, primeiro=AGORA - 50_000 * TAMANHO):
+        self.primeiro = primeiro
+        self.chamadas = []
+
+    def buscar(self, n, fim):
+        self.chamadas.append((n, fim))
+        ultimo = int(fim // TAMANHO) * TAMANHO
+        inicios = [t for t in range(ultimo - (min(n, 1000) - 1) * TAMANHO, ultimo + 1, TAMANHO) if t >= self.primeiro]
+        return [{'id': t // TAMANHO, 'from': t, 'to': t + TAMANHO, 'open': t / 1e9, 'close': t / 1e9 + 1e-6,
+                 'max': t / 1e9 + 2e-6, 'min': t / 1e9 - 1e-6, 'volume': t % 97} for t in inicios]
+
+
+def conferir(registros, ate, quantidade):
+    inicios = registros['from'].tolist()
+    ultimo = int(ate // TAMANHO) * TAMANHO
+    assert inicios == list(range(ultimo - (quantidade - 1) * TAMANHO, ultimo + 1, TAMANHO))
+
+
+def test_consulta_fria_grava_e_serve_do_disco(tmp_path):
+    broker = BrokerFalso()
+    armazem = ArmazemCandles(str(tmp_path))
+    registros = armazem.obter('EURUSD', 1, 100, broker.buscar, agora=AGORA)
+    conferir(registros, AGORA, 100)
+    assert isinstance(registros, np.memmap)
+    assert (tmp_path / 'EURUSD_1.bin').stat().st_size == 100 * REGISTRO.itemsize
+
+    # só a cauda (último candle gravado + novos) vai ao broker
+    broker.chamadas.clear()
+    registros = armazem.obter('EURUSD', 1, 100, broker.buscar, agora=AGORA + 3 * TAMANHO)
+    conferir(registros, AGORA + 3 * TAMANHO, 100)
+    assert broker.chamadas == [(4, AGORA + 3 * TAMANHO)]
+
+
+def test_candle_aberto_e_sobrescrito(tmp_path):
+    broker = BrokerFalso()
+    armazem = ArmazemCandles(str(tmp_path))
+    armazem.obter('EURUSD', 1, 10, broker.buscar, agora=AGORA)
+    ultimo = int(AGORA // TAMANHO) * TAMANHO
+    serie = armazem._serie('EURUSD', 1)
+    serie.gravar_cauda(de_velas([{'from': ultimo, 'open': 1, 'max': 3, 'min': 0, 'close': 2, 'volume': 5}]))
+    registros = serie.registros()
+    assert len(registros) == 10 and registros['close'][-1] == 2
+
+
+def test_pagina_alem_da_janela_do_broker(tmp_path):
+    broker = BrokerFalso()
+    armazem = ArmazemCandles(str(tmp_path))
+    registros = armazem.obter('EURUSD', 1, 3500, broker.buscar, agora=AGORA)
+    conferir(registros, AGORA, 3500)
+    assert max(n for n, _ in broker.chamadas) <= 1000
+
+    # intervalo já em disco: nenhuma chamada ao broker
+    broker.chamadas.clear()
+    fim = AGORA - 2000 * TAMANHO
+    registros = armazem.obter('EURUSD', 1, 500, broker.buscar, fim=fim, agora=AGORA)
+    conferir(registros, fim, 500)
+    assert broker.chamadas == []
+
+
+def test_preenchimento_em_background_ate_o_alvo_ou_o_inicio(tmp_path):
+    broker = BrokerFalso(primeiro=AGORA - 2500 * TAMANHO)
+    armazem = ArmazemCandles(str(tmp_path), historico_alvo=5000)
+    armazem.obter('EURUSD', 1, 10, broker.buscar, agora=AGORA)
+    passos = 0
+    while armazem.preencher(lambda ativo, timeframe, n, fim: broker.buscar(n, fim)):
+        passos += 1
+    registros = armazem._serie('EURUSD', 1).registros()
+    assert broker.primeiro <= registros['from'][0] < broker.primeiro + TAMANHO
+    assert np.all(np.diff(registros['from']) == TAMANHO)
+    assert armazem.pendentes() == [] and passos == 4
+    assert armazem.estatisticas()['candles_em_disco'] == len(registros)
+
+
+def test_mapa_antigo_continua_valido_apos_troca_do_arquivo(tmp_path):
+    broker = BrokerFalso()
+    armazem = ArmazemCandles(str(tmp_path))
+    antigo = armazem.obter('EURUSD', 1, 50, broker.buscar, agora=AGORA)
+    copia = np.array(antigo)
+    armazem.obter('EURUSD', 1, 1500, broker.buscar, agora=AGORA)
+    assert np.array_equal(antigo, copia)
+
+    # outro processo (nova instância) enxerga o mesmo arquivo
+    outro = ArmazemCandles(str(tmp_path))
+    broker.chamadas.clear()
+    conferir(outro.obter('EURUSD', 1, 1499, broker.buscar, fim=AGORA - TAMANHO, agora=AGORA), AGORA - TAMANHO, 1499)
+    assert broker.chamadas == []
+
+
+def test_para_velas():
+    velas = BrokerFalso().buscar(3, AGORA)
+    convertidas = para_velas(de_velas(list(reversed(velas)) + velas[:1]), TAMANHO)
+    assert [v['from'] for v in convertidas] == [v['from'] for v in velas]
+    assert {k: convertidas[0][k] for k in ('from', 'to', 'open', 'max', 'min', 'close', 'volume')} == \
+        {k: velas[0][k] for k in ('from', 'to', 'open', 'max', 'min', 'close', 'volume')}
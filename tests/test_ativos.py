@@ -0,0 +1,44 @@
+from API.ativos import CatalogoAtivos, tipo_opcao
+
+def _catalogo():
+    c = CatalogoAtivos()
+    c.atualizar(
+        {'turbo': {'EURUSD': True, 'GBPUSD': False, 'USDJPY': False},
+         'binary': {'EURUSD': True, 'GBPUSD': True, 'USDJPY': False}},
+        {'EURUSD': {'turbo': 0.87, 'binary': 0.85, 'digital': 0.9}}
+    )
+    return c
+
+def test_catalogo_vazio_nao_bloqueia():
+    assert CatalogoAtivos().verificar('QUALQUER', 1) == (True, None)
+
+def test_verifica_aberto_fechado_e_desconhecido():
+    c = _catalogo()
+    assert tipo_opcao(5) == 'turbo' and tipo_opcao(15) == 'binary'
+    assert c.verificar('EURUSD', 1) == (True, None)
+    ok, motivo = c.verificar('GBPUSD', 1)
+    assert not ok and 'fechado' in motivo
+    assert c.verificar('GBPUSD', 15) == (True, None)
+    ok, motivo = c.verificar('eurusd', 1)
+    assert not ok and motivo == 'Ativo desconhecido: eurusd (quis dizer EURUSD?)'
+    ok, motivo = c.verificar('XYZ', 1)
+    assert not ok and motivo == 'Ativo desconhecido: XYZ'
+
+def test_listar_e_payout():
+    c = _catalogo()
+    assert [a['ativo'] for a in c.listar()] == ['EURUSD', 'GBPUSD', 'USDJPY']
+    assert [a['ativo'] for a in c.listar(apenas_abertos=True)] == ['EURUSD', 'GBPUSD']
+    assert [a['ativo'] for a in c.listar(tipo='turbo')] == ['EURUSD']
+    assert c.obter('EURUSD')['payout'] == {'turbo': 0.87, 'binary': 0.85}
+    assert c.idade() is not None
+
+def test_catalogo_vencido_deixa_passar(caplog):
+    c = _catalogo()
+    c.idade_maxima = 180
+    assert not c.verificar('XYZ', 1)[0]
+    c.atualizado_em -= 181
+    assert c.verificar('XYZ', 1) == (True, None)
+    assert c.verificar('GBPUSD', 1) == (True, None)
+    assert len([r for r in caplog.records if 'sem atualização' in r.getMessage()]) == 1
+    c.atualizar({'turbo': {'EURUSD': True}})
+    assert not c.verificar('XYZ', 1)[0]
@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+from API.gerenciamento import GerenciamentoPorcentagem
+from backtest.backtest import (EMPATE, LOSS, WIN, carregar_candles, main, resolver_sinais, simular, varrer)
+
+T0 = 1_700_000_040
+
+
+def candles(ativo, closes):
+    """Candles de 1 minuto: cada candle abre no fechamento do anterior."""
+    linhas, abertura = [], closes[0]
+    for i, fechamento in enumerate(closes):
+        linhas.append({'ativo': ativo, 'from': T0 + i * 60, 'open': abertura, 'close': fechamento})
+        abertura = fechamento
+    return linhas
+
+
+def test_resultado_do_sinal_pelos_candles():
+    series = carregar_candles(candles('EURUSD', [1.0, 1.1, 1.2, 1.2, 1.1, 1.0]))
+    assert series['EURUSD'][3] == 60
+    sinais = [
+        {'timestamp': T0 + 60, 'ativo': 'EURUSD', 'acao': 'call', 'duracao': 1},     # 1.0 -> 1.1
+        {'timestamp': T0 + 30, 'ativo': 'EURUSD', 'acao': 'compra', 'duracao': 2},   # entra no candle seguinte: 1.0 -> 1.2
+        {'timestamp': T0 + 180, 'ativo': 'EURUSD', 'acao': 'put', 'duracao': 1},     # 1.2 -> 1.2
+        {'timestamp': T0 + 240, 'ativo': 'EURUSD', 'acao': 'call', 'duracao': 1},    # 1.2 -> 1.1
+        {'timestamp': T0 + 300, 'ativo': 'EURUSD', 'acao': 'call', 'duracao': 5},    # passa do último candle
+        {'timestamp': T0, 'ativo': 'GBPUSD', 'acao': 'call', 'duracao': 1},
+        {'timestamp': T0, 'ativo': 'EURUSD', 'acao': 'hold', 'duracao': 1},
+    ]
+    eventos, descartados = resolver_sinais(sinais, series)
+    assert [(e[0] - T0, e[1] - T0, e[2]) for e in eventos] == [
+        (60, 120, WIN), (60, 180, WIN), (180, 240, EMPATE), (240, 300, LOSS)]
+    assert descartados == {'sem_candle_expiracao': 1, 'sem_candles': 1, 'invalido': 1}
+
+
+def test_simulacao_usa_o_dimensionamento_de_producao():
+    eventos = [(0, 60, WIN, None, 'A'), (60, 120, LOSS, None, 'A'), (120, 180, LOSS, 10, 'A')]
+    relatorio = simular(eventos, entrada_padrao=5, limite_maximo=8, banca_inicial=1000, payout=0.8, curva=True)
+    gerenciador = GerenciamentoPorcentagem(1000, {'entrada_padrao': 5, 'limite_maximo': 8})
+    saldo = 1000
+    primeira = gerenciador.calcular_entrada(saldo)
+    saldo += primeira * 0.8
+    saldo -= gerenciador.calcular_entrada(saldo)
+    saldo -= gerenciador.calcular_entrada(saldo, 10)  # limitado a 8%
+    assert relatorio['banca_final'] == pytest.approx(saldo, abs=0.01)
+    assert (relatorio['wins'], relatorio['losses'], relatorio['maior_sequencia_losses']) == (1, 2, 2)
+    assert relatorio['drawdown_maximo_percentual'] == pytest.approx((1040 - saldo) / 1040 * 100, abs=0.01)
+    assert [p[1] for p in relatorio['curva']] == [1000, 1040.0, 988.0, round(saldo, 2)]
+
+
+def test_ordens_simultaneas_dividem_a_banca():
+    # a segunda entrada (aberta com a primeira em andamento) é dimensionada sobre o saldo restante
+    eventos = [(0, 300, WIN, 60, 'A'), (60, 120, WIN, 60, 'B')]
+    relatorio = simular(eventos, 60, 60, 100, 1.0)
+    assert relatorio['trades'] == 2 and relatorio['banca_final'] == 100 + 60 + 24
+    # abaixo da entrada mínima (2.0) não há saldo para operar
+    relatorio = simular([(0, 60, LOSS, None, 'A'), (60, 120, WIN, None, 'A')], 100, 100, 1.5, 0.87)
+    assert relatorio['trades'] == 0 and relatorio['ignoradas_saldo'] == 2
+
+
+def test_varredura_paralela_igual_a_sequencial():
+    eventos = [(i * 60, i * 60 + 60, WIN if i % 3 else LOSS, None, 'A') for i in range(200)]
+    grade = [(e, l, 1000, 0.87) for e in (1, 2, 3) for l in (2, 5)]
+    assert varrer(eventos, grade, processos=2) == varrer(eventos, grade, processos=1)
+
+
+def test_linha_de_comando(tmp_path, capsys):
+    caminho_candles = tmp_path / 'candles.jsonl'
+    caminho_candles.write_text('\n'.join(json.dumps(c) for c in candles('EURUSD', [1.0, 1.1, 1.2, 1.1])))
+    caminho_sinais = tmp_path / 'sinais.csv'
+    caminho_sinais.write_text(f"timestamp,ativo,acao,duracao,percent\n{T0 + 60},EURUSD,call,1,\n{T0 + 120},EURUSD,put,1,2\n")
+    saida = tmp_path / 'resultado.json'
+    assert main(['--candles', str(caminho_candles), '--sinais', str(caminho_sinais), '--entrada', '1,3',
+                 '--limite', '5', '--processos', '1', '--saida', str(saida)]) == 0
+    relatorio = json.loads(saida.read_text())
+    assert relatorio['sinais'] == 2 and len(relatorio['resultados']) == 2
+    assert all(r['wins'] == 1 and r['losses'] == 1 for r in relatorio['resultados'])
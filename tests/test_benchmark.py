@@ -0,0 +1,51 @@
+import itertools
+import time
+from benchmarks.benchmark_api import comparar, medir, percentil
+
+def test_percentil_interpolado():
+    valores = list(range(1, 101))
+    assert percentil(valores, 50) == 50.5
+    assert percentil(valores, 0) == 1
+    assert percentil(valores, 100) == 100
+    assert round(percentil(valores, 99), 2) == 99.01
+    assert percentil([], 50) is None
+
+def test_medir_conta_erros_e_vazao():
+    contador = itertools.count(1)
+
+    def enviar():
+        n = next(contador)
+        time.sleep(0.01)
+        if n % 10 == 0:
+            raise ConnectionError()
+        return 500 if n % 5 == 0 else 200
+
+    resultado = medir(enviar, 40, 8)
+    assert resultado['requisicoes'] == 40
+    assert resultado['erros'] == 8
+    assert 10 <= resultado['p50_ms'] <= resultado['p95_ms'] <= resultado['p99_ms']
+    # 8 threads em paralelo: bem acima de 100 req/s de uma thread só
+    assert resultado['rps'] > 200
+
+def test_comparar_detecta_regressao():
+    baseline = {'resultados': {
+        'trade@8': {'p50_ms': 10.0, 'p95_ms': 20.0, 'p99_ms': 30.0, 'rps': 800.0},
+        'balance@1': {'p50_ms': 0.5, 'p95_ms': 0.8, 'p99_ms': 1.0, 'rps': 2000.0},
+    }}
+    atual = {'resultados': {
+        'trade@8': {'p50_ms': 11.0, 'p95_ms': 30.0, 'p99_ms': 31.0, 'rps': 500.0},
+        # +60% mas abaixo da folga absoluta de 1ms: ruído
+        'balance@1': {'p50_ms': 0.8, 'p95_ms': 1.2, 'p99_ms': 1.5, 'rps': 1900.0},
+    }}
+    regressoes = comparar(atual, baseline, 0.2)
+    assert len(regressoes) == 2
+    assert regressoes[0].startswith('trade@8 p95_ms')
+    assert regressoes[1].startswith('trade@8 rps')
+    assert comparar(baseline, baseline, 0.2) == []
+
+def test_benchmark_risco_compara_com_a_referencia_em_memoria():
+    from benchmarks.benchmark_risco import executar
+    resultados = executar(50, [0, 200])
+    assert set(resultados) == {f"{nome}@{n}" for nome in ('memoria (anterior)', 'sqlite :memory:', 'sqlite arquivo')
+                               for n in (0, 200)}
+    assert all(r['reservar_p50_us'] > 0 for r in resultados.values())
@@ -0,0 +1,57 @@
+from API.candles import CacheCandles
+
+TAMANHO = 60  # timeframe de 1 minuto
+
+class BrokerCandles:
+    """Gera candles de 1 minuto alinhados e registra quantos foram pedidos."""
+    def __init__(self):
+        self.pedidos = []
+
+    def buscar(self, quantidade, fim):
+        self.pedidos.append(quantidade)
+        ultimo = int(fim // TAMANHO) * TAMANHO
+        return [{'from': ultimo - i * TAMANHO, 'close': ultimo - i * TAMANHO} for i in reversed(range(quantidade))]
+
+def test_primeira_consulta_busca_tudo():
+    cache = CacheCandles()
+    broker = BrokerCandles()
+    velas = cache.obter('EURUSD', 1, 100, broker.buscar, agora=6000)
+    assert len(velas) == 100
+    assert broker.pedidos == [100]
+    assert cache.estatisticas()['misses'] == 1
+
+def test_consulta_repetida_busca_so_o_delta():
+    cache = CacheCandles()
+    broker = BrokerCandles()
+    cache.obter('EURUSD', 1, 100, broker.buscar, agora=6000)
+    velas = cache.obter('EURUSD', 1, 100, broker.buscar, agora=6000 + 3 * TAMANHO)
+    assert broker.pedidos == [100, 4]  # 3 novos + o último (que podia estar aberto)
+    assert [v['from'] for v in velas] == [6000 + (i - 96) * TAMANHO for i in range(100)]
+    assert cache.estatisticas()['hits'] == 1
+
+def test_pedido_maior_que_o_cache_busca_tudo():
+    cache = CacheCandles()
+    broker = BrokerCandles()
+    cache.obter('EURUSD', 1, 10, broker.buscar, agora=6000)
+    assert len(cache.obter('EURUSD', 1, 50, broker.buscar, agora=6000)) == 50
+    assert broker.pedidos == [10, 50]
+
+def test_buffer_circular_limita_tamanho():
+    cache = CacheCandles(max_candles=20)
+    broker = BrokerCandles()
+    cache.obter('EURUSD', 1, 20, broker.buscar, agora=6000)
+    velas = cache.obter('EURUSD', 1, 20, broker.buscar, agora=6000 + 5 * TAMANHO)
+    assert len(velas) == 20
+    assert velas[-1]['from'] == 6000 + 5 * TAMANHO
+
+def test_eviction_lru():
+    cache = CacheCandles(max_series=2)
+    broker = BrokerCandles()
+    cache.obter('EURUSD', 1, 10, broker.buscar, agora=6000)
+    cache.obter('GBPUSD', 1, 10, broker.buscar, agora=6000)
+    cache.obter('EURUSD', 1, 10, broker.buscar, agora=6000)  # EURUSD vira o mais recente
+    cache.obter('USDJPY', 1, 10, broker.buscar, agora=6000)  # descarta GBPUSD
+    broker.pedidos.clear()
+    cache.obter('EURUSD', 1, 10, broker.buscar, agora=6000)
+    cache.obter('GBPUSD', 1, 10, broker.buscar, agora=6000)
+    assert broker.pedidos == [1, 10]
@@ -0,0 +1,53 @@
+import time
+from API.contas import EstadoContas
+
+BALANCES = [
+    {'id': 11, 'type': 1, 'amount': 500.0, 'currency': 'BRL'},
+    {'id': 44, 'type': 4, 'amount': 10000.0, 'currency': 'USD'},
+]
+
+def test_atualiza_todas_as_contas():
+    estado = EstadoContas(ttl_segundos=30)
+    estado.atualizar_por_balances(BALANCES)
+    assert estado.obter('REAL')['saldo'] == 500.0
+    assert estado.obter('practice')['moeda'] == 'USD'
+    assert estado.balance_id('PRACTICE') == 44
+
+def test_conta_desconhecida():
+    estado = EstadoContas()
+    assert estado.obter('REAL') is None
+
+def test_expira_pelo_ttl():
+    estado = EstadoContas(ttl_segundos=0)
+    estado.atualizar_por_balances(BALANCES)
+    assert estado.obter('REAL') is None  # TTL zero nunca serve do cache
+
+def test_max_idade():
+    estado = EstadoContas(ttl_segundos=30)
+    estado.atualizar_por_balances(BALANCES)
+    time.sleep(0.02)
+    assert estado.obter('REAL', max_idade=0.01) is None
+    assert estado.obter('REAL', max_idade=5) is not None
+
+def test_push_por_balance_id():
+    estado = EstadoContas()
+    estado.atualizar_por_balances(BALANCES)
+    assert estado.atualizar_por_balance_id(44, 9990.0)
+    assert estado.obter('PRACTICE')['saldo'] == 9990.0
+    assert not estado.atualizar_por_balance_id(99, 1.0)  # balance id não mapeado
+
+def test_debito_limita_validade_ate_liquidacao():
+    estado = EstadoContas(ttl_segundos=30)
+    estado.atualizar_por_balances(BALANCES)
+    estado.debitar('REAL', 15.0, liquida_em=time.time() - 1)
+    assert estado.obter('REAL') is None  # trade já liquidou: precisa reler do broker
+    estado.atualizar('REAL', saldo=485.0)
+    estado.debitar('REAL', 15.0)
+    assert estado.obter('REAL')['saldo'] == 470.0
+
+def test_invalidar():
+    estado = EstadoContas()
+    estado.atualizar_por_balances(BALANCES)
+    estado.invalidar('REAL')
+    assert estado.obter('REAL') is None
+    assert estado.obter('PRACTICE') is not None
@@ -0,0 +1,93 @@
+import os
+import tempfile
+import threading
+import time
+import pytest
+from API.gateway import ClienteGateway, ErroGateway, ServidorGateway
+from API.simulador import SimuladorIQOption
+
+@pytest.fixture
+def gateway():
+    sim = SimuladorIQOption('a@b.c', 'x', latencia='fixed:1', semente=1, escala_tempo=0.001)
+    caminho = os.path.join(tempfile.mkdtemp(), 'gw.sock')
+    servidor = ServidorGateway(sim, caminho)
+    servidor.conectar()
+    servidor.iniciar()
+    yield servidor, caminho
+    servidor.encerrar()
+
+def test_chamadas_basicas(gateway):
+    servidor, caminho = gateway
+    cliente = ClienteGateway(caminho)
+    assert cliente.connect() == (True, None)
+    assert cliente.check_connect() is True
+    assert cliente.sessao.carregar_balance_ids() == {'REAL': 1001, 'PRACTICE': 4004}
+    saldos = cliente.sessao.saldos()
+    assert {b['type']: b['amount'] for b in saldos} == {1: 1000.0, 4: 10000.0}
+    velas = cliente.sessao.candles('EURUSD', 60, 5, time.time())
+    assert len(velas) == 5 and velas[0]['from'] < velas[-1]['from']
+
+def test_erros_sao_repassados(gateway):
+    _, caminho = gateway
+    cliente = ClienteGateway(caminho)
+    with pytest.raises(ErroGateway, match='KeyError'):
+        cliente.sessao.comprar('PRACTICE', 10, 'XX', 'call', 1)
+    with pytest.raises(ErroGateway, match='não permitido'):
+        cliente.chamar('buy', 10, 'EURUSD', 'call', 1)
+    with pytest.raises(AttributeError):
+        cliente.sessao.api
+
+def test_varios_workers_compartilham_uma_sessao(gateway):
+    servidor, caminho = gateway
+    servidor.api.escala_tempo = 100  # nada liquida durante o teste: saldos exatos
+    # dois "workers" (clientes), cada um com várias threads, ordens alternando as contas
+    clientes = [ClienteGateway(caminho), ClienteGateway(caminho)]
+    resultados = []
+    lock = threading.Lock()
+
+    def enviar(i):
+        conta = 'REAL' if i % 2 else 'PRACTICE'
+        check, order_id = clientes[i % 2].sessao.comprar(conta, 1.0, 'EURUSD', 'call', 1)
+        with lock:
+            resultados.append((conta, check, order_id))
+
+    threads = [threading.Thread(target=enviar, args=(i,)) for i in range(40)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(resultados) == 40 and all(check for _, check, _ in resultados)
+    saldos = {b['type']: b['amount'] for b in clientes[0].sessao.saldos()}
+    # nenhuma ordem caiu na conta errada
+    assert saldos == {1: 1000.0 - 20, 4: 10000.0 - 20}
+
+def test_resultado_da_ordem(gateway):
+    _, caminho = gateway
+    cliente = ClienteGateway(caminho)
+    check, order_id = cliente.sessao.comprar('PRACTICE', 10.0, 'EURUSD', 'put', 1)
+    assert check
+    time.sleep(0.2)
+    assert cliente.sessao.resultado_ordem(order_id) in (-10.0, 8.7)
+    assert cliente.sessao.resultado_ordem(order_id) is None
+
+def test_cliente_sem_gateway(tmp_path):
+    cliente = ClienteGateway(str(tmp_path / 'inexistente.sock'))
+    assert cliente.check_connect() is False
+    with pytest.raises(ConnectionError):
+        cliente.connect()
+
+def test_stream_so_para_quando_o_ultimo_worker_sai(gateway):
+    servidor, caminho = gateway
+    a, b = ClienteGateway(caminho), ClienteGateway(caminho)
+    a.sessao.iniciar_stream_candles('EURUSD', 60)
+    b.sessao.iniciar_stream_candles('EURUSD', 60)
+    assert servidor.streams() == {'EURUSD/60': 2}
+    # o último cliente do worker A sai: o worker B continua recebendo
+    a.sessao.parar_stream_candles('EURUSD', 60)
+    assert ('EURUSD', 60) in servidor.api._streams
+    # worker B cai sem parar o stream: a desconexão libera a assinatura
+    b.fechar()
+    limite = time.time() + 2
+    while servidor.streams() and time.time() < limite:
+        time.sleep(0.01)
+    assert servidor.streams() == {} and ('EURUSD', 60) not in servidor.api._streams
@@ -0,0 +1,53 @@
+from API.historico import HistoricoTrades
+
+def _historico(tmp_path):
+    return HistoricoTrades(str(tmp_path / "historico.db"), intervalo=0.01)
+
+def test_grava_em_lote_e_consulta(tmp_path):
+    historico = _historico(tmp_path)
+    for i in range(5):
+        historico.registrar(tipo_conta='PRACTICE', ativo='EURUSD', acao='call', valor=2.0,
+                            order_id=str(i), status='aberta', criado_em=1000 + i)
+    assert historico.aguardar_gravacao()
+    trades, proximo = historico.consultar()
+    assert [t['order_id'] for t in trades] == ['4', '3', '2', '1', '0']  # mais recente primeiro
+    assert proximo is None
+
+def test_filtros(tmp_path):
+    historico = _historico(tmp_path)
+    historico.registrar(tipo_conta='REAL', ativo='EURUSD', status='aberta', criado_em=100)
+    historico.registrar(tipo_conta='PRACTICE', ativo='EURUSD', status='rejeitada', criado_em=200)
+    historico.registrar(tipo_conta='PRACTICE', ativo='GBPUSD', status='aberta', criado_em=300)
+    historico.aguardar_gravacao()
+    assert len(historico.consultar(tipo_conta='PRACTICE')[0]) == 2
+    assert len(historico.consultar(ativo='EURUSD', status='aberta')[0]) == 1
+    assert [t['criado_em'] for t in historico.consultar(inicio=150, fim=300)[0]] == [200]
+
+def test_paginacao_por_cursor(tmp_path):
+    historico = _historico(tmp_path)
+    for i in range(7):
+        historico.registrar(tipo_conta='REAL', ativo='EURUSD', order_id=str(i))
+    historico.aguardar_gravacao()
+    vistos, cursor = [], None
+    while True:
+        pagina, cursor = historico.consultar(limite=3, cursor=cursor)
+        vistos += [t['order_id'] for t in pagina]
+        if cursor is None:
+            break
+    assert vistos == [str(i) for i in reversed(range(7))]
+
+def test_banco_em_modo_wal(tmp_path):
+    historico = _historico(tmp_path)
+    modo = historico._conexao_leitura().execute("PRAGMA journal_mode").fetchone()[0]
+    assert modo == 'wal'
+
+def test_liquidacao_atualiza_status_e_lucro(tmp_path):
+    historico = _historico(tmp_path)
+    historico.registrar(tipo_conta='REAL', ativo='EURUSD', order_id='77', status='aberta')
+    historico.registrar(tipo_conta='REAL', ativo='EURUSD', order_id='78', status='aberta')
+    historico.liquidar(77, 8.7)
+    historico.liquidar(78, -10.0)
+    historico.aguardar_gravacao()
+    trades = {t['order_id']: t for t in historico.consultar()[0]}
+    assert (trades['77']['status'], trades['77']['lucro']) == ('ganho', 8.7)
+    assert (trades['78']['status'], trades['78']['lucro']) == ('perda', -10.0)
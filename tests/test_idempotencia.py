@@ -0,0 +1,73 @@
+import time
+from API.idempotencia import CacheIdempotencia, chave_do_sinal
+
+def test_chave_do_sinal_ignora_ordem_dos_campos():
+    a = chave_do_sinal({'ativo': 'EURUSD', 'acao': 'call', 'duracao': 1})
+    b = chave_do_sinal({'duracao': 1, 'acao': 'call', 'ativo': 'EURUSD'})
+    assert a == b and a.startswith('sha256:')
+    assert chave_do_sinal({'ativo': 'EURUSD', 'acao': 'put', 'duracao': 1}) != a
+    assert chave_do_sinal(None) is None
+
+def test_reserva_andamento_e_replay():
+    cache = CacheIdempotencia(ttl=60)
+    assert cache.reservar('k') == ('novo', None)
+    assert cache.reservar('k') == ('em_andamento', None)
+    cache.concluir('k', (b'{}', 200, {}))
+    assert cache.reservar('k') == ('concluido', (b'{}', 200, {}))
+    cache.liberar('k')
+    assert cache.reservar('k') == ('novo', None)
+
+def test_ttl_e_limite():
+    cache = CacheIdempotencia(ttl=0.05, max_itens=3)
+    cache.reservar('velha')
+    cache.concluir('velha', 'r')
+    time.sleep(0.06)
+    assert cache.reservar('velha') == ('novo', None)
+    for i in range(5):
+        cache.reservar(f"k{i}")
+        cache.concluir(f"k{i}", i)
+    assert len(cache) <= 3
+    assert cache.reservar('k4') == ('concluido', 4)
+
+def test_chaves_compartilhadas_pelo_historico(tmp_path):
+    from API.historico import HistoricoTrades
+    caminho = str(tmp_path / 'historico.db')
+    # dois workers, cada um com a sua conexão ao mesmo arquivo
+    a = CacheIdempotencia(ttl=60, historico=HistoricoTrades(caminho))
+    b = CacheIdempotencia(ttl=60, historico=HistoricoTrades(caminho))
+    assert a.reservar('k') == ('novo', None)
+    assert b.reservar('k') == ('em_andamento', None)
+    a.concluir('k', (b'{"status": "sucesso"}', 200, {'Content-Type': 'application/json'}))
+    assert b.reservar('k') == ('concluido', (b'{"status": "sucesso"}', 200, {'Content-Type': 'application/json'}))
+    b.liberar('k')
+    assert a.reservar('k') == ('novo', None)
+
+def test_chave_compartilhada_expira(tmp_path):
+    from API.historico import HistoricoTrades
+    cache = CacheIdempotencia(ttl=0.05, historico=HistoricoTrades(str(tmp_path / 'historico.db')))
+    cache.reservar('k')
+    cache.concluir('k', 'r')
+    time.sleep(0.06)
+    assert cache.reservar('k') == ('novo', None)
+
+
+def test_chaves_no_historico_respeitam_o_limite(tmp_path):
+    from API.historico import HistoricoTrades
+    historico = HistoricoTrades(str(tmp_path / 'historico.db'))
+    cache = CacheIdempotencia(ttl=60, max_itens=3, historico=historico)
+    for i in range(20):
+        cache.reservar(f"k{i}")
+        cache.concluir(f"k{i}", i)
+    contar = "SELECT COUNT(*) FROM idempotencia"
+    assert historico._conexao_leitura().execute(contar).fetchone()[0] <= 3
+    assert cache.reservar('k19') == ('concluido', 19)
+    # reservas em andamento não são despejadas pelo limite, só ao expirar
+    for i in range(5):
+        assert cache.reservar(f"aberta{i}") == ('novo', None)
+    assert all(cache.reservar(f"aberta{i}") == ('em_andamento', None) for i in range(5))
+    vencida = CacheIdempotencia(ttl=0.01, max_itens=3, historico=historico)
+    vencida.reservar('curta')
+    time.sleep(0.02)
+    vencida.reservar('outra')
+    assert historico._conexao_leitura().execute(
+        "SELECT COUNT(*) FROM idempotencia WHERE chave = 'curta'").fetchone()[0] == 0
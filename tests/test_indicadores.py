@@ -0,0 +1,107 @@
+import random
+
+import numpy as np
+import pytest
+
+from API.indicadores import CalculadoraIndicadores, interpretar_indicador, serializar
+
+ESPECIFICACOES = ['sma:20', 'ema:9', 'rsi:14', 'bollinger:20:2.5', 'macd:12:26:9', 'atr:14']
+
+
+def gerar_candles(n, semente=1):
+    rng = random.Random(semente)
+    candles, preco = [], 1.1
+    for i in range(n):
+        abertura = preco
+        preco += rng.uniform(-0.001, 0.001)
+        candles.append({'from': i * 60, 'open': abertura, 'close': preco,
+                        'max': max(abertura, preco) + 0.0003, 'min': min(abertura, preco) - 0.0003})
+    return candles
+
+
+def calcular(candles, especificacoes=ESPECIFICACOES, calculadora=None):
+    calculadora = calculadora or CalculadoraIndicadores()
+    return calculadora.calcular('EURUSD', 1, candles, [interpretar_indicador(e) for e in especificacoes])
+
+
+def test_confere_com_implementacao_em_loop():
+    candles = gerar_candles(150)
+    closes = [c['close'] for c in candles]
+    saida = calcular(candles)
+
+    ema = sum(closes[:9]) / 9
+    for i in range(9, len(closes)):
+        ema += 2 / 10 * (closes[i] - ema)
+    assert saida['ema:9']['valor'][-1] == pytest.approx(ema, rel=1e-12)
+    assert saida['sma:20']['valor'][-1] == pytest.approx(sum(closes[-20:]) / 20)
+    assert np.isnan(saida['sma:20']['valor'][18]) and not np.isnan(saida['sma:20']['valor'][19])
+
+    ganhos = [max(b - a, 0) for a, b in zip(closes, closes[1:])]
+    perdas = [max(a - b, 0) for a, b in zip(closes, closes[1:])]
+    media_ganho, media_perda = sum(ganhos[:14]) / 14, sum(perdas[:14]) / 14
+    for g, p in zip(ganhos[14:], perdas[14:]):
+        media_ganho = (media_ganho * 13 + g) / 14
+        media_perda = (media_perda * 13 + p) / 14
+    assert saida['rsi:14']['valor'][-1] == pytest.approx(100 - 100 / (1 + media_ganho / media_perda), rel=1e-9)
+
+    janela = np.array(closes[-20:])
+    bandas = saida['bollinger:20:2.5']
+    assert bandas['superior'][-1] == pytest.approx(janela.mean() + 2.5 * janela.std())
+    macd = saida['macd:12:26:9']
+    assert macd['histograma'][-1] == pytest.approx(macd['macd'][-1] - macd['sinal'][-1])
+
+
+def test_incremental_igual_ao_calculo_completo():
+    candles = gerar_candles(300)
+    calculadora = CalculadoraIndicadores()
+    calcular(candles[:250], calculadora=calculadora)
+    # último candle ainda aberto mudou de preço
+    atual = [dict(c) for c in candles[:250]]
+    atual[-1]['close'] += 0.002
+    incremental = calcular(atual, calculadora=calculadora)
+    completo = calcular(atual)
+    # chegaram candles novos
+    incremental_novos = calcular(candles[:253], calculadora=calculadora)
+    completo_novos = calcular(candles[:253])
+    assert calculadora.estatisticas()['incrementais'] == 2 * len(ESPECIFICACOES)
+    for a, b in ((incremental, completo), (incremental_novos, completo_novos)):
+        for chave in ESPECIFICACOES:
+            for saida in a[chave]:
+                np.testing.assert_allclose(a[chave][saida], b[chave][saida], rtol=1e-10, atol=1e-12)
+
+
+def test_janela_deslizante_mantem_o_tamanho_pedido():
+    candles = gerar_candles(300)
+    calculadora = CalculadoraIndicadores()
+    calcular(candles[:200], calculadora=calculadora)
+    saida = calcular(candles[5:205], calculadora=calculadora)
+    assert len(saida['from']) == 200 and saida['from'][-1] == candles[204]['from']
+    assert calculadora.estatisticas()['incrementais'] == len(ESPECIFICACOES)
+    # médias de janela não dependem do histórico: iguais ao cálculo do zero
+    assert saida['sma:20']['valor'][-1] == pytest.approx(calcular(candles[5:205])['sma:20']['valor'][-1])
+
+
+def test_candle_fechado_diferente_recalcula_tudo():
+    candles = gerar_candles(100)
+    calculadora = CalculadoraIndicadores()
+    calcular(candles, calculadora=calculadora)
+    alterados = [dict(c) for c in candles]
+    alterados[50]['close'] += 0.01
+    calcular(alterados, calculadora=calculadora)
+    assert calculadora.estatisticas()['incrementais'] == 0
+
+
+def test_especificacoes():
+    assert interpretar_indicador('RSI').chave == 'rsi:14'
+    assert interpretar_indicador('bollinger:20').chave == 'bollinger:20:2'
+    for invalida in ('foo', 'ema:0', 'ema:9:1', 'sma:2.5', 'rsi:x'):
+        with pytest.raises(ValueError):
+            interpretar_indicador(invalida)
+
+
+def test_serializar_ultimos_pontos():
+    saida = calcular(gerar_candles(30), ['ema:9', 'sma:20', 'bollinger'])
+    resultado = serializar(saida, 2)
+    assert len(resultado['from']) == 2 and len(resultado['ema:9']) == 2
+    assert set(resultado['bollinger:20:2']) == {'superior', 'media', 'inferior'}
+    assert serializar(calcular(gerar_candles(10), ['sma:20']), 1)['sma:20'] == [None]
@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+
+from API.limitador import (BrokerSobrecarregado, LimitadorBroker, PRIORIDADE_FUNDO, PRIORIDADE_LEITURA,
+                           PRIORIDADE_ORDEM)
+
+
+def test_desativado_nao_espera():
+    limitador = LimitadorBroker(0)
+    for _ in range(1000):
+        assert limitador.adquirir(PRIORIDADE_LEITURA) == 0.0
+
+
+def test_rajada_e_reposicao():
+    limitador = LimitadorBroker(taxa=50, rajada=5, reservas={PRIORIDADE_LEITURA: 0})
+    for _ in range(5):
+        assert limitador.adquirir(PRIORIDADE_LEITURA) == 0.0
+    inicio = time.monotonic()
+    limitador.adquirir(PRIORIDADE_LEITURA)
+    assert time.monotonic() - inicio >= 0.015  # 1 token a 50/s = 20 ms
+
+
+def test_reserva_guarda_tokens_para_ordens():
+    limitador = LimitadorBroker(taxa=1, rajada=10, esperas={PRIORIDADE_LEITURA: 0, PRIORIDADE_FUNDO: 0})
+    # fundo só consome acima de 75% do balde, leitura acima de 50%
+    for _ in range(2):
+        limitador.adquirir(PRIORIDADE_FUNDO)
+    with pytest.raises(BrokerSobrecarregado):
+        limitador.adquirir(PRIORIDADE_FUNDO)
+    for _ in range(3):
+        limitador.adquirir(PRIORIDADE_LEITURA)
+    with pytest.raises(BrokerSobrecarregado) as erro:
+        limitador.adquirir(PRIORIDADE_LEITURA)
+    assert erro.value.retry_after > 0
+    # ordens usam o que sobrou
+    for _ in range(5):
+        assert limitador.adquirir(PRIORIDADE_ORDEM) == 0.0
+
+
+def test_ordem_passa_na_frente_das_leituras_na_fila():
+    limitador = LimitadorBroker(taxa=20, rajada=1, reservas={PRIORIDADE_LEITURA: 0},
+                                esperas={PRIORIDADE_LEITURA: 5})
+    limitador.adquirir(PRIORIDADE_ORDEM)  # esvazia o balde
+    atendidas = []
+
+    def chamar(nome, prioridade):
+        limitador.adquirir(prioridade)
+        atendidas.append(nome)
+
+    leituras = [threading.Thread(target=chamar, args=(f"leitura{i}", PRIORIDADE_LEITURA)) for i in range(3)]
+    for t in leituras:
+        t.start()
+    while limitador.estado()['fila'].get('leitura', 0) < 3:
+        time.sleep(0.001)
+    ordem = threading.Thread(target=chamar, args=("ordem", PRIORIDADE_ORDEM))
+    ordem.start()
+    for t in leituras + [ordem]:
+        t.join(5)
+    assert atendidas[0] == "ordem"
+    assert limitador.estado()['fila'] == {}
+
+
+def test_rajada_minima_cobre_todas_as_reservas():
+    assert LimitadorBroker.rajada_minima() == 4.0
+    assert LimitadorBroker.rajada_minima({PRIORIDADE_FUNDO: 0.9}) == pytest.approx(10.0)
+
+
+def test_balde_pequeno_nao_trava_leituras_e_fundo():
+    # com rajada 2, a reserva de fundo (75%) exigiria 2.5 tokens: mais do que o balde comporta
+    limitador = LimitadorBroker(50, 2)
+    assert limitador.adquirir(PRIORIDADE_FUNDO) == 0.0
+    assert limitador.adquirir(PRIORIDADE_FUNDO) > 0
+    assert limitador.adquirir(PRIORIDADE_LEITURA) >= 0
+    assert limitador.adquirir(PRIORIDADE_ORDEM) >= 0
+    minimo = LimitadorBroker(50, 1)
+    for _ in range(3):
+        minimo.adquirir(PRIORIDADE_FUNDO)
+    assert LimitadorBroker(50, 0.5).rajada == 1.0
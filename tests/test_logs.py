@@ -0,0 +1,91 @@
+import json
+import logging
+import queue
+import sys
+
+from API import logs
+from API.logs import AMOSTRAR, FilaLogs, FormatoJSON, LimiteTaxa, configurar_logs, encerrar_logs
+from API.metricas import LOGS_DESCARTADOS
+
+
+def registro(mensagem='Conta alterada para: %s', args=('REAL',), nivel=logging.INFO, linha=10, exc_info=None,
+             amostrar=False):
+    record = logging.LogRecord('root', nivel, '/app/API/trader.py', linha, mensagem, args, exc_info)
+    if amostrar:
+        record.__dict__.update(AMOSTRAR)
+    return record
+
+
+def test_formato_json():
+    linha = json.loads(FormatoJSON().format(registro()))
+    assert linha['mensagem'] == 'Conta alterada para: REAL'
+    assert linha['nivel'] == 'INFO' and linha['origem'] == 'trader:10'
+    assert 'excecao' not in linha and 'suprimidas' not in linha
+
+
+def test_limite_por_ponto_de_log():
+    limite = LimiteTaxa(taxa=0.001, rajada=3)
+    antes = LOGS_DESCARTADOS.valor('limite')
+    assert [limite.filter(registro(amostrar=True)) for _ in range(5)] == [True, True, True, False, False]
+    # outro ponto de log tem o próprio balde; avisos e erros nunca são descartados
+    assert limite.filter(registro(linha=11, amostrar=True))
+    assert all(limite.filter(registro(nivel=logging.WARNING, amostrar=True)) for _ in range(10))
+    assert LOGS_DESCARTADOS.valor('limite') - antes == 2
+
+    limite._baldes[('root', '/app/API/trader.py', 10)][0] = 1
+    liberado = registro(amostrar=True)
+    assert limite.filter(liberado) and liberado.suprimidas == 2
+    assert json.loads(FormatoJSON().format(liberado))['suprimidas'] == 2
+
+
+def test_limite_so_vale_para_pontos_marcados():
+    limite = LimiteTaxa(taxa=0.001, rajada=1)
+    antes = LOGS_DESCARTADOS.valor('limite')
+    # auditoria de ordens (INFO sem marca) nunca é amostrada, mesmo em rajada
+    assert all(limite.filter(registro('Ordem %s liquidada', (i,), linha=497)) for i in range(50))
+    assert LOGS_DESCARTADOS.valor('limite') == antes
+    assert [limite.filter(registro(nivel=logging.DEBUG, amostrar=True)) for _ in range(3)] == [True, False, False]
+
+
+def test_fila_cheia_descarta_sem_bloquear():
+    fila = FilaLogs(queue.Queue(maxsize=1))
+    antes = LOGS_DESCARTADOS.valor('fila_cheia')
+    fila.handle(registro())
+    fila.handle(registro())
+    assert fila.queue.qsize() == 1
+    assert LOGS_DESCARTADOS.valor('fila_cheia') - antes == 1
+
+
+def test_excecao_chega_como_texto():
+    try:
+        raise ValueError("falhou")
+    except ValueError:
+        preparado = FilaLogs(queue.Queue()).prepare(registro('Erro: %s', ('x',), logging.ERROR, exc_info=sys.exc_info()))
+    assert preparado.exc_info is None and preparado.args is None
+    linha = json.loads(FormatoJSON().format(preparado))
+    assert linha['mensagem'] == 'Erro: x' and 'ValueError: falhou' in linha['excecao']
+
+
+def test_configurar_logs_grava_json_lines(tmp_path, monkeypatch):
+    monkeypatch.setenv('LOG_DIR', str(tmp_path))
+    monkeypatch.setenv('LOG_STDERR', 'false')
+    monkeypatch.setenv('WEB_CONCURRENCY', '1')
+    raiz = logging.getLogger()
+    handlers, nivel = list(raiz.handlers), raiz.level
+    monkeypatch.setattr(logs, '_listener', None)
+    try:
+        configurar_logs('teste')
+        for i in range(30):
+            logging.info("Ordem %s liquidada", i)
+        logging.getLogger('API.trader').warning("aviso")
+        encerrar_logs()
+    finally:
+        for handler in list(raiz.handlers):
+            raiz.removeHandler(handler)
+        for handler in handlers:
+            raiz.addHandler(handler)
+        raiz.setLevel(nivel)
+    linhas = [json.loads(l) for l in (tmp_path / 'teste.jsonl').read_text().splitlines()]
+    # o limite padrão (5/s, rajada 20) não corta registros de ordens, que não são marcados com AMOSTRAR
+    assert [(l['logger'], l['mensagem']) for l in linhas] == (
+        [('root', f"Ordem {i} liquidada") for i in range(30)] + [('API.trader', 'aviso')])
@@ -0,0 +1,69 @@
+import os
+import threading
+import time
+from API.metricas import RegistroMetricas, medir_lock, ESPERA_LOCK, AGUARDANDO_LOCK
+
+def test_histograma_exporta_buckets_acumulados():
+    registro = RegistroMetricas()
+    h = registro.histograma('teste_segundos', 'ajuda', ('etapa',), buckets=(0.01, 0.1))
+    h.observar(0.005, 'a')
+    h.observar(0.05, 'a')
+    h.observar(5, 'a')
+    texto = registro.exportar()
+    assert '# TYPE teste_segundos histogram' in texto
+    assert 'teste_segundos_bucket{etapa="a",le="0.01"} 1' in texto
+    assert 'teste_segundos_bucket{etapa="a",le="0.1"} 2' in texto
+    assert 'teste_segundos_bucket{etapa="a",le="+Inf"} 3' in texto
+    assert 'teste_segundos_count{etapa="a"} 3' in texto
+
+def test_contador_medidor_e_escape():
+    registro = RegistroMetricas()
+    c = registro.contador('teste_total', 'ajuda', ('motivo',))
+    c.inc('aspas "x"')
+    c.inc('aspas "x"', valor=2)
+    registro.medidor('teste_fila', 'ajuda', funcao=lambda: 7)
+    texto = registro.exportar()
+    assert 'teste_total{motivo="aspas \\"x\\""} 3' in texto
+    assert 'teste_fila 7' in texto
+    # registrar de novo com o mesmo nome devolve a métrica existente
+    assert registro.contador('teste_total', 'ajuda', ('motivo',)) is c
+
+def test_medir_lock_registra_espera_e_fila():
+    lock = threading.Lock()
+    antes = ESPERA_LOCK.contagem('teste')
+
+    def aguardar():
+        with medir_lock(lock, 'teste'):
+            pass
+
+    lock.acquire()
+    t = threading.Thread(target=aguardar)
+    t.start()
+    time.sleep(0.05)
+    assert AGUARDANDO_LOCK.valor('teste') == 1
+    lock.release()
+    t.join(1)
+    assert AGUARDANDO_LOCK.valor('teste') == 0
+    assert ESPERA_LOCK.contagem('teste') == antes + 1
+
+
+def test_metricas_agregadas_entre_workers(tmp_path):
+    diretorio = str(tmp_path)
+    workers = [RegistroMetricas(worker='1'), RegistroMetricas(worker='2')]
+    for i, registro in enumerate(workers, 1):
+        registro.contador('teste_total', 'ajuda', ('conta',)).inc('REAL', valor=i)
+        registro.histograma('teste_segundos', 'ajuda', buckets=(0.1,)).observar(0.08 * i)
+        registro.medidor('teste_fila', 'ajuda', funcao=lambda i=i: i * 10)
+    workers[0].gravar(diretorio)
+    # o scrape cai no worker 2, que responde pelos dois
+    texto = workers[1].exportar(diretorio, validade=60)
+    assert 'teste_total{conta="REAL"} 3' in texto
+    assert 'teste_segundos_bucket{le="0.1"} 1' in texto and 'teste_segundos_count 2' in texto
+    assert 'teste_fila{worker="1"} 10' in texto and 'teste_fila{worker="2"} 20' in texto
+    assert texto.count('# TYPE teste_total counter') == 1
+
+    # worker 1 parou de gravar: o medidor dele some, os contadores continuam somando
+    antigo = time.time() - 120
+    os.utime(tmp_path / 'metricas-1.json', (antigo, antigo))
+    texto = workers[1].exportar(diretorio, validade=60)
+    assert 'teste_fila{worker="1"}' not in texto and 'teste_total{conta="REAL"} 3' in texto
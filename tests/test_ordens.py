@@ -0,0 +1,81 @@
+import queue
+import threading
+import time
+import pytest
+from API.ordens import FilaOrdens
+
+def _aguardar(fila, id_ordem, status, timeout=2.0):
+    limite = time.time() + timeout
+    while time.time() < limite:
+        registro = fila.obter(id_ordem)
+        if registro['status'] == status:
+            return registro
+        time.sleep(0.005)
+    raise AssertionError(f"ordem {id_ordem} não chegou em {status}")
+
+def test_ordem_enviada():
+    fila = FilaOrdens(lambda ordem: ({'order_id': 123, 'ativo': ordem['ativo']}, None), workers=1)
+    registro = fila.enviar({'ativo': 'EURUSD'})
+    assert registro['status'] == 'queued'
+    final = _aguardar(fila, registro['id'], 'submitted')
+    assert final['order_id'] == 123
+    assert final['timestamps']['queued'] <= final['timestamps']['submitting'] <= final['timestamps']['submitted']
+
+def test_ordem_rejeitada():
+    fila = FilaOrdens(lambda ordem: (None, "Ordem rejeitada na Binária"), workers=1)
+    registro = fila.enviar({'ativo': 'EURUSD'})
+    final = _aguardar(fila, registro['id'], 'rejected')
+    assert final['mensagem'] == "Ordem rejeitada na Binária"
+
+def test_excecao_no_envio_rejeita():
+    def falhar(ordem):
+        raise RuntimeError("broker fora")
+    fila = FilaOrdens(falhar, workers=1)
+    registro = fila.enviar({'ativo': 'EURUSD'})
+    assert _aguardar(fila, registro['id'], 'rejected')['mensagem'] == "broker fora"
+
+def test_client_order_id_repetido_nao_duplica():
+    enviados = []
+    fila = FilaOrdens(lambda ordem: (enviados.append(ordem) or {'order_id': 1}, None), workers=1)
+    fila.enviar({'ativo': 'EURUSD'}, 'abc')
+    fila.enviar({'ativo': 'EURUSD'}, 'abc')
+    _aguardar(fila, 'abc', 'submitted')
+    assert len(enviados) == 1
+
+def test_fila_cheia():
+    liberar = threading.Event()
+    def executar(ordem):
+        liberar.wait()
+        return {'order_id': 1}, None
+    fila = FilaOrdens(executar, workers=1, max_fila=1)
+    primeira = fila.enviar({'ativo': 'A'})
+    _aguardar(fila, primeira['id'], 'submitting')  # worker ocupado
+    fila.enviar({'ativo': 'B'})
+    with pytest.raises(queue.Full):
+        fila.enviar({'ativo': 'C'})
+    liberar.set()
+
+def test_ordem_desconhecida():
+    fila = FilaOrdens(lambda ordem: ({}, None), workers=0)
+    assert fila.obter('nao-existe') is None
+
+def test_status_compartilhado_entre_workers(tmp_path):
+    from API.historico import HistoricoTrades
+    # dois workers do gunicorn: cada um com a sua fila, o mesmo banco
+    historico_a = HistoricoTrades(str(tmp_path / 'historico.db'), intervalo=0.01)
+    historico_b = HistoricoTrades(str(tmp_path / 'historico.db'), intervalo=0.01)
+    enviados = []
+    worker_a = FilaOrdens(lambda ordem: (enviados.append(ordem) or {'order_id': 7}, None), workers=1, historico=historico_a)
+    worker_b = FilaOrdens(lambda ordem: (enviados.append(ordem) or {'order_id': 8}, None), workers=1, historico=historico_b)
+
+    registro = worker_a.enviar({'ativo': 'EURUSD'}, 'abc')
+    assert worker_b.obter('abc')['status'] in ('queued', 'submitting', 'submitted')
+    _aguardar(worker_a, 'abc', 'submitted')
+    historico_a.aguardar_gravacao()
+    remoto = worker_b.obter('abc')
+    assert remoto['status'] == 'submitted' and remoto['order_id'] == 7 and remoto['ordem'] == {'ativo': 'EURUSD'}
+
+    # o mesmo client_order_id em outro worker devolve a ordem original
+    assert worker_b.enviar({'ativo': 'EURUSD'}, 'abc')['id'] == registro['id']
+    assert len(enviados) == 1
+    assert worker_b.obter('nao-existe') is None
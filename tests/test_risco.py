@@ -0,0 +1,149 @@
+import time
+
+import pytest
+
+from API.risco import MotorRisco
+
+
+def test_sem_limites_aprova_e_acumula_exposicao():
+    motor = MotorRisco()
+    r1, motivo = motor.reservar('practice', 'EURUSD', 10, 1000, 1)
+    r2, _ = motor.reservar('PRACTICE', 'EURUSD', 5, 990, 1)
+    assert r1 and r2 and motivo is None
+    conta = motor.estado()['contas']['PRACTICE']
+    assert conta['exposicao'] == 15
+    assert conta['posicoes'] == 2
+    assert conta['por_ativo'] == {'EURUSD': {'posicoes': 2, 'valor': 15}}
+
+
+def test_limites_de_posicoes():
+    motor = MotorRisco({'max_posicoes': 3, 'max_posicoes_por_ativo': 2})
+    assert motor.reservar('PRACTICE', 'EURUSD', 1, 100, 1)[0]
+    assert motor.reservar('PRACTICE', 'EURUSD', 1, 100, 1)[0]
+    reserva, motivo = motor.reservar('PRACTICE', 'EURUSD', 1, 100, 1)
+    assert reserva is None and 'EURUSD' in motivo
+    assert motor.reservar('PRACTICE', 'GBPUSD', 1, 100, 1)[0]
+    reserva, motivo = motor.reservar('PRACTICE', 'USDJPY', 1, 100, 1)
+    assert reserva is None and '3 posições' in motivo
+    # contas são independentes
+    assert motor.reservar('REAL', 'USDJPY', 1, 100, 1)[0]
+
+
+def test_exposicao_percentual_da_banca():
+    motor = MotorRisco({'max_exposicao_percentual': 10})
+    assert motor.reservar('PRACTICE', 'EURUSD', 60, 1000, 1)[0]
+    # o saldo já veio debitado da primeira ordem: banca = 940 + 60
+    reserva, motivo = motor.reservar('PRACTICE', 'EURUSD', 50, 940, 1)
+    assert reserva is None and 'Exposição' in motivo
+    assert motor.reservar('PRACTICE', 'EURUSD', 40, 940, 1)[0]
+
+
+def test_cancelar_libera_e_liquidar_soma_resultado_do_dia():
+    motor = MotorRisco({'max_perda_diaria': 25})
+    r1, _ = motor.reservar('PRACTICE', 'EURUSD', 10, 1000, 1)
+    r2, _ = motor.reservar('PRACTICE', 'EURUSD', 10, 990, 1)
+    motor.cancelar(r2)
+    motor.confirmar(r1, 123)
+    motor.liquidar(123, -10)
+    motor.liquidar(123, -10)  # liquidação repetida é ignorada
+    conta = motor.estado()['contas']['PRACTICE']
+    assert conta['exposicao'] == 0 and conta['posicoes'] == 0 and conta['por_ativo'] == {}
+    assert conta['resultado_dia'] == -10
+    # perda do dia (10) + pior caso da nova ordem (20) passa do limite de 25
+    reserva, motivo = motor.reservar('PRACTICE', 'EURUSD', 20, 990, 1)
+    assert reserva is None and 'perda diária' in motivo
+    assert motor.reservar('PRACTICE', 'EURUSD', 15, 990, 1)[0]
+
+
+def test_kill_switch_global_e_por_conta():
+    motor = MotorRisco()
+    motor.ativar_kill_switch('manutenção', 'REAL')
+    reserva, motivo = motor.reservar('REAL', 'EURUSD', 1, 100, 1)
+    assert reserva is None and 'manutenção' in motivo
+    assert motor.reservar('PRACTICE', 'EURUSD', 1, 100, 1)[0]
+    motor.ativar_kill_switch('notícia')
+    assert motor.reservar('PRACTICE', 'EURUSD', 1, 100, 1)[0] is None
+    motor.desativar_kill_switch()
+    motor.desativar_kill_switch('REAL')
+    assert motor.reservar('REAL', 'EURUSD', 1, 100, 1)[0]
+
+
+def test_atualizar_limites():
+    motor = MotorRisco()
+    assert motor.atualizar_limites(max_posicoes='1')['max_posicoes'] == 1
+    assert motor.reservar('PRACTICE', 'EURUSD', 1, 100, 1)[0]
+    assert motor.reservar('PRACTICE', 'EURUSD', 1, 100, 1)[0] is None
+    with pytest.raises(ValueError):
+        motor.atualizar_limites(limite_inexistente=1)
+
+
+def test_posicao_sem_liquidacao_expira(monkeypatch):
+    import API.risco as risco
+    monkeypatch.setattr(risco, 'FOLGA_LIQUIDACAO', 0)
+    motor = MotorRisco({'max_posicoes': 1})
+    reserva, _ = motor.reservar('PRACTICE', 'EURUSD', 1, 100, 0)
+    motor.confirmar(reserva, 1)
+    time.sleep(0.01)
+    assert motor.reservar('PRACTICE', 'EURUSD', 1, 100, 1)[0]
+    assert motor.estado()['contas']['PRACTICE']['posicoes'] == 1
+
+
+def test_duracoes_misturadas_expiram_pelo_vencimento(monkeypatch):
+    import API.risco as risco
+    monkeypatch.setattr(risco, 'FOLGA_LIQUIDACAO', 0)
+    motor = MotorRisco()
+    longa, _ = motor.reservar('PRACTICE', 'EURUSD', 5, 100, 60)
+    curta, _ = motor.reservar('PRACTICE', 'GBPUSD', 1, 100, 0)
+    motor.confirmar(curta, 'nunca-liquida')
+    time.sleep(0.01)
+    # a curta, criada depois da longa, vence primeiro e sai da exposição
+    assert motor.estado()['contas']['PRACTICE']['por_ativo'] == {'EURUSD': {'posicoes': 1, 'valor': 5}}
+    motor.liquidar('nunca-liquida', -1)
+    assert motor.estado()['contas']['PRACTICE']['resultado_dia'] == 0
+
+
+def test_estado_compartilhado_entre_workers(tmp_path):
+    caminho = str(tmp_path / 'historico.db')
+    # dois workers do mesmo tenant e um de outro tenant no mesmo arquivo
+    a = MotorRisco({'max_posicoes': 2, 'max_perda_diaria': 15}, caminho=caminho, tenant='t1')
+    b = MotorRisco({'max_posicoes': 2, 'max_perda_diaria': 15}, caminho=caminho, tenant='t1')
+    outro = MotorRisco({'max_posicoes': 2}, caminho=caminho, tenant='t2')
+
+    r1, _ = a.reservar('PRACTICE', 'EURUSD', 5, 100, 1)
+    assert b.reservar('PRACTICE', 'EURUSD', 5, 100, 1)[0]
+    reserva, motivo = a.reservar('PRACTICE', 'EURUSD', 1, 100, 1)
+    assert reserva is None and '2 posições' in motivo
+    assert outro.reservar('PRACTICE', 'EURUSD', 1, 100, 1)[0]
+
+    # a liquidação vista por um worker entra na perda do dia do outro
+    a.confirmar(r1, 77)
+    b.liquidar(77, -5)
+    assert b.estado()['contas']['PRACTICE']['resultado_dia'] == -5
+    reserva, motivo = b.reservar('PRACTICE', 'EURUSD', 6, 100, 1)
+    assert reserva is None and 'perda diária' in motivo
+
+    # kill switch e limites acionados em um worker valem para o outro
+    b.ativar_kill_switch('notícia')
+    assert 'notícia' in a.reservar('PRACTICE', 'EURUSD', 1, 100, 1)[1]
+    assert outro.reservar('PRACTICE', 'EURUSD', 1, 100, 1)[0]
+    b.desativar_kill_switch()
+    a.atualizar_limites(max_posicoes=5)
+    assert b.estado()['limites']['max_posicoes'] == 5
+
+    # a sessão descartada e recriada (pool de tenants) encontra o mesmo estado
+    recriado = MotorRisco({'max_posicoes': 2}, caminho=caminho, tenant='t1')
+    assert recriado.estado()['contas']['PRACTICE']['posicoes'] == 1
+
+
+def test_totais_acompanham_as_posicoes(tmp_path):
+    motor = MotorRisco(caminho=str(tmp_path / 'historico.db'))
+    reservas = [motor.reservar('PRACTICE', ativo, 2, 1000, 1)[0] for ativo in ('EURUSD', 'EURUSD', 'GBPUSD', 'USDJPY')]
+    motor.cancelar(reservas[0])
+    motor.confirmar(reservas[2], 'g1')
+    motor.liquidar('g1', 1.7)
+    conta = motor.estado()['contas']['PRACTICE']
+    assert conta['posicoes'] == 2 and conta['exposicao'] == 4
+    assert conta['por_ativo'] == {'EURUSD': {'posicoes': 1, 'valor': 2}, 'USDJPY': {'posicoes': 1, 'valor': 2}}
+    # os totais batem com a soma das posições gravadas
+    totais = motor._conn.execute("SELECT COUNT(*), SUM(valor) FROM risco_posicoes").fetchone()
+    assert totais == (conta['posicoes'], conta['exposicao'])
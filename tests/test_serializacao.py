@@ -0,0 +1,56 @@
+import gzip
+import json
+
+import pytest
+from werkzeug.datastructures import MIMEAccept
+
+from API import serializacao
+from API.serializacao import TIPO_JSON, codificar, colunar, comprimir, negociar
+
+VELAS = [
+    {'id': 1, 'from': 60, 'to': 120, 'open': 1.1, 'close': 1.2, 'min': 1.0, 'max': 1.3, 'volume': 10},
+    {'id': 2, 'from': 120, 'to': 180, 'open': 1.2, 'close': 1.15, 'min': 1.1, 'max': 1.25, 'volume': 7},
+]
+
+
+def test_colunar_gera_arrays_paralelos():
+    colunas = colunar(VELAS)
+    assert list(colunas) == ['from', 'open', 'max', 'min', 'close', 'volume']
+    assert colunas['from'] == [60, 120]
+    assert colunas['close'] == [1.2, 1.15]
+    assert colunar([]) == {campo: [] for campo in colunas}
+
+
+def test_codificar_json_e_msgpack():
+    dados = {'status': 'sucesso', 'velas': colunar(VELAS)}
+    assert json.loads(codificar(dados)) == dados
+    msgpack = pytest.importorskip('msgpack')
+    assert msgpack.unpackb(codificar(dados, 'application/msgpack')) == dados
+
+
+def test_codificar_sem_dependencias_opcionais(monkeypatch):
+    monkeypatch.setattr(serializacao, 'orjson', None)
+    monkeypatch.setattr(serializacao, 'msgpack', None)
+    assert json.loads(codificar({'a': [1, 2]})) == {'a': [1, 2]}
+    assert negociar(MIMEAccept([('application/msgpack', 1)])) is None
+    with pytest.raises(ValueError):
+        codificar({}, 'application/msgpack')
+
+
+def test_negociar():
+    pytest.importorskip('msgpack')
+    assert negociar(MIMEAccept()) == TIPO_JSON
+    assert negociar(MIMEAccept([('*/*', 1)])) == TIPO_JSON
+    assert negociar(MIMEAccept([('application/x-msgpack', 1)])) == 'application/x-msgpack'
+    assert negociar(MIMEAccept([('application/json', 0.5), ('application/msgpack', 1)])) == 'application/msgpack'
+    assert negociar(MIMEAccept([('text/html', 1)])) is None
+
+
+def test_comprimir_so_acima_do_minimo():
+    pequeno = b'x' * 100
+    assert comprimir(pequeno, minimo=1024) == (pequeno, False)
+    grande = codificar({'velas': colunar(VELAS * 500)})
+    corpo, comprimido = comprimir(grande, minimo=1024)
+    assert comprimido and len(corpo) < len(grande)
+    assert gzip.decompress(corpo) == grande
+    assert comprimir(grande, minimo=-1) == (grande, False)
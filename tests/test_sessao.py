@@ -0,0 +1,92 @@
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import ModuleType, SimpleNamespace
+import pytest
+from API.sessao import SessaoBroker
+
+BALANCE_IDS = {'REAL': 11, 'PRACTICE': 44}
+PERFIL = {'balances': [{'id': 11, 'type': 1}, {'id': 44, 'type': 4}]}
+
+
+class BrokerContaGlobal:
+    """Imita a biblioteca: change_balance troca uma conta global que buy() lê no envio."""
+    def __init__(self):
+        self.balance_id = None
+        self.ordens = {}
+        self.trocas = 0
+
+    def get_profile_ansyc(self):
+        return PERFIL
+
+    def change_balance(self, modo):
+        self.trocas += 1
+        self.balance_id = BALANCE_IDS[modo]
+
+    def buy(self, valor, ativo, acao, duracao):
+        time.sleep(random.uniform(0, 0.001))  # janela em que outra thread poderia trocar a conta
+        self.ordens[ativo] = self.balance_id
+        return True, ativo
+
+
+class WebsocketFalso:
+    """Imita o canal websocket: responde cada request_id de forma assíncrona."""
+    def __init__(self):
+        self.buy_multi_option = {}
+        self.timesync = SimpleNamespace(server_timestamp=time.time())
+        self.ordens = {}
+
+    def send_websocket_request(self, name, msg, request_id):
+        def responder():
+            time.sleep(random.uniform(0, 0.002))
+            self.ordens[request_id] = msg['body']['user_balance_id']
+            self.buy_multi_option[request_id] = {'id': request_id}
+        threading.Thread(target=responder).start()
+
+
+@pytest.fixture
+def iqoptionapi_falsa(monkeypatch):
+    """Só o que _abrir_opcao importa da biblioteca: ACTIVES e get_expiration_time."""
+    pacote = ModuleType('iqoptionapi')
+    pacote.constants = ModuleType('iqoptionapi.constants')
+    pacote.constants.ACTIVES = {'EURUSD': 1}
+    pacote.expiration = ModuleType('iqoptionapi.expiration')
+    pacote.expiration.get_expiration_time = lambda timestamp, duracao: (timestamp - timestamp % 60 + 60 * duracao, 0)
+    for nome, modulo in (('iqoptionapi', pacote), ('iqoptionapi.constants', pacote.constants),
+                         ('iqoptionapi.expiration', pacote.expiration)):
+        monkeypatch.setitem(sys.modules, nome, modulo)
+    return pacote
+
+
+def _disparar(sessao, total=400):
+    sinais = [('REAL' if i % 2 else 'PRACTICE', i) for i in range(total)]
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        resultados = list(pool.map(
+            lambda s: (s[0], sessao.comprar(s[0], 2.0, f"ATIVO-{s[1]}", 'call', 1)), sinais
+        ))
+    return resultados
+
+def test_stress_modo_troca_de_conta():
+    broker = BrokerContaGlobal()
+    sessao = SessaoBroker(broker)
+    sessao.carregar_balance_ids()
+    for conta, (check, order_id) in _disparar(sessao):
+        assert check
+        assert broker.ordens[order_id] == BALANCE_IDS[conta]
+
+def test_stress_modo_balance_id(iqoptionapi_falsa):
+    broker = BrokerContaGlobal()
+    broker.api = WebsocketFalso()
+    sessao = SessaoBroker(broker)
+    sessao.carregar_balance_ids()
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        resultados = list(pool.map(
+            lambda i: (i % 2, sessao.comprar('REAL' if i % 2 else 'PRACTICE', 2.0, 'EURUSD', 'call', 1)),
+            range(400)
+        ))
+    for real, (check, req_id) in resultados:
+        assert check
+        assert broker.api.ordens[req_id] == (11 if real else 44)
+    assert broker.trocas == 0  # nenhuma troca global de conta
@@ -0,0 +1,62 @@
+import time
+import pytest
+from API.simulador import Latencia, SimuladorIQOption
+
+def _simulador(**kwargs):
+    kwargs.setdefault('latencia', 'fixed:0')
+    sim = SimuladorIQOption('a@b.c', 'x', semente=1, **kwargs)
+    sim.connect()
+    return sim
+
+def test_latencias():
+    import random
+    rng = random.Random(1)
+    assert Latencia('fixed:50', rng).amostrar() == 0.05
+    assert all(0.02 <= Latencia('uniform:20:30', rng).amostrar() <= 0.03 for _ in range(50))
+    assert Latencia('lognormal:80:0.5', rng).amostrar() > 0
+
+def test_saldos_e_contas():
+    sim = _simulador()
+    balances = sim.get_balances()['msg']
+    assert {b['type'] for b in balances} == {1, 4}
+    sim.change_balance('REAL')
+    assert sim.get_balance() == 1000.0
+
+def test_candles_deterministicos():
+    sim = _simulador()
+    a = sim.get_candles('EURUSD', 60, 50, 1_700_000_000)
+    b = sim.get_candles('EURUSD', 60, 10, 1_700_000_000)
+    assert len(a) == 50 and a[-10:] == b
+    assert all(v['min'] <= min(v['open'], v['close']) and v['max'] >= max(v['open'], v['close']) for v in a)
+    assert [v['from'] for v in a] == sorted(v['from'] for v in a)
+    assert sim.get_candles('NAOEXISTE', 60, 10, 1_700_000_000) is None
+
+def test_compra_liquida_e_credita():
+    sim = _simulador(taxa_win=1.0, payout=0.8, escala_tempo=0.001)
+    check, order_id = sim.buy(100, 'EURUSD', 'call', 1)
+    assert check
+    assert sim.get_balance() == 9900.0
+    limite = time.time() + 2
+    while order_id not in sim.api.socket_option_closed and time.time() < limite:
+        time.sleep(0.01)
+    assert sim.api.socket_option_closed[order_id]['msg']['win'] == 'win'
+    assert sim.get_balance() == 10080.0
+    assert sim.api.profile.balance == 10080.0  # push de saldo
+
+def test_injecao_de_falhas():
+    sim = _simulador(taxa_falha=1.0)
+    assert sim.buy(10, 'EURUSD', 'call', 1) == (False, "Simulated rejection")
+    sim.derrubar_conexao()
+    assert not sim.check_connect()
+    with pytest.raises(ConnectionError):
+        sim.buy(10, 'EURUSD', 'call', 1)
+    sim.connect()
+    assert sim.check_connect()
+
+def test_catalogo_e_ativo_fechado(monkeypatch):
+    monkeypatch.setenv('SIM_CLOSED_ASSETS', 'GBPUSD')
+    sim = _simulador()
+    horarios = sim.get_all_open_time()
+    assert horarios['turbo']['EURUSD']['open'] and not horarios['turbo']['GBPUSD']['open']
+    assert sim.get_all_profit()['EURUSD']['turbo'] == sim.payout
+    assert sim.buy(10, 'GBPUSD', 'call', 1) == (False, "Asset is closed")
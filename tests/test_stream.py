@@ -0,0 +1,130 @@
+import queue
+import threading
+import time
+from API.stream import DistribuidorCandles
+
+class FonteRealtime:
+    """Imita o dicionário {from: candle} que o websocket mantém por assinatura."""
+    def __init__(self):
+        self.velas = {}
+        self.inicios = []
+        self.paradas = []
+
+    def iniciar_stream_candles(self, ativo, tamanho):
+        self.inicios.append((ativo, tamanho))
+
+    def parar_stream_candles(self, ativo, tamanho):
+        self.paradas.append((ativo, tamanho))
+
+    def ler_stream_candles(self, ativo, tamanho):
+        return dict(self.velas)
+
+def test_uma_assinatura_para_varios_clientes():
+    fonte = FonteRealtime()
+    distribuidor = DistribuidorCandles(fonte, intervalo=0.01)
+    fila_a = distribuidor.assinar('EURUSD', 1)
+    fila_b = distribuidor.assinar('EURUSD', 1)
+    assert fonte.inicios == [('EURUSD', 60)]
+    assert distribuidor.clientes() == {'EURUSD:M1': 2}
+    distribuidor.cancelar('EURUSD', 1, fila_a)
+    distribuidor.cancelar('EURUSD', 1, fila_b)
+    assert fonte.paradas == [('EURUSD', 60)]
+
+def test_publica_candle_ao_fechar():
+    fonte = FonteRealtime()
+    distribuidor = DistribuidorCandles(fonte, intervalo=0.01)
+    fonte.velas = {60: {'from': 60, 'close': 1.0}}
+    fila_a = distribuidor.assinar('EURUSD', 1)
+    fila_b = distribuidor.assinar('EURUSD', 1)
+    time.sleep(0.05)  # observador já viu o candle 60 aberto
+    fonte.velas = {60: {'from': 60, 'close': 1.1}, 120: {'from': 120, 'close': 1.2}}
+    assert fila_a.get(timeout=1) == {'from': 60, 'close': 1.1}
+    assert fila_b.get(timeout=1) == {'from': 60, 'close': 1.1}
+    distribuidor.cancelar('EURUSD', 1, fila_a)
+    distribuidor.cancelar('EURUSD', 1, fila_b)
+
+def test_cliente_lento_nao_bloqueia():
+    distribuidor = DistribuidorCandles(FonteRealtime(), max_fila=2)
+    fila = queue.Queue(maxsize=2)
+    assinatura = {'clientes': {fila}}
+    for i in range(5):
+        distribuidor._publicar(assinatura, {'from': i})
+    assert [fila.get_nowait()['from'], fila.get_nowait()['from']] == [3, 4]
+
+def test_falha_ao_assinar_nao_deixa_assinatura_orfa():
+    fonte = FonteRealtime()
+    distribuidor = DistribuidorCandles(fonte, intervalo=0.01)
+    falhar = [True]
+    iniciar = fonte.iniciar_stream_candles
+
+    def iniciar_instavel(ativo, tamanho):
+        if falhar[0]:
+            raise ConnectionError("reconectando")
+        iniciar(ativo, tamanho)
+
+    fonte.iniciar_stream_candles = iniciar_instavel
+    try:
+        distribuidor.assinar('EURUSD', 1)
+        assert False, "deveria propagar a falha do broker"
+    except ConnectionError:
+        pass
+    assert distribuidor.clientes() == {}
+
+    # o próximo cliente assina de novo e recebe candles normalmente
+    falhar[0] = False
+    fonte.velas = {60: {'from': 60, 'close': 1.0}}
+    fila = distribuidor.assinar('EURUSD', 1)
+    time.sleep(0.05)
+    fonte.velas = {60: {'from': 60, 'close': 1.1}, 120: {'from': 120, 'close': 1.2}}
+    assert fila.get(timeout=1) == {'from': 60, 'close': 1.1}
+    assert fonte.inicios == [('EURUSD', 60)]
+    distribuidor.cancelar('EURUSD', 1, fila)
+
+
+class FonteContada(FonteRealtime):
+    """Fonte lenta que registra inícios de um stream já ativo e paradas de um stream inexistente."""
+    def __init__(self):
+        super().__init__()
+        self.ativos = set()
+        self.erros = []
+        self._lock = threading.Lock()
+
+    def iniciar_stream_candles(self, ativo, tamanho):
+        with self._lock:
+            if (ativo, tamanho) in self.ativos:
+                self.erros.append(('iniciado duas vezes', ativo, tamanho))
+            self.ativos.add((ativo, tamanho))
+        super().iniciar_stream_candles(ativo, tamanho)
+        time.sleep(0.001)  # a resposta do broker demora: um cancelar pode chegar antes
+
+    def parar_stream_candles(self, ativo, tamanho):
+        super().parar_stream_candles(ativo, tamanho)
+        time.sleep(0.001)
+        with self._lock:
+            if (ativo, tamanho) not in self.ativos:
+                self.erros.append(('parado sem estar ativo', ativo, tamanho))
+            self.ativos.discard((ativo, tamanho))
+
+
+def test_assinar_e_cancelar_concorrentes_nao_deixam_stream_orfao():
+    fonte = FonteContada()
+    distribuidor = DistribuidorCandles(fonte, intervalo=0.01)
+    falhas = []
+
+    def alternar():
+        for i in range(100):
+            time.sleep(0.0005 * (i % 3))  # varia o encaixe entre as duas threads
+            fila = distribuidor.assinar('EURUSD', 1)
+            # enquanto há cliente, o stream no broker tem que estar de pé
+            if ('EURUSD', 60) not in fonte.ativos:
+                falhas.append('stream parado com cliente ativo')
+            distribuidor.cancelar('EURUSD', 1, fila)
+
+    threads = [threading.Thread(target=alternar) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+    assert not falhas and not fonte.erros
+    assert fonte.ativos == set() and distribuidor.clientes() == {}
+    assert len(fonte.inicios) == len(fonte.paradas) > 0
@@ -0,0 +1,142 @@
+import json
+import threading
+from collections import Counter
+
+import pytest
+
+from API.tenants import (TENANT_PADRAO, PoolTenants, TenantDesconhecido, TenantEmOutroShard,
+                         carregar_tenants, shard_do_tenant)
+
+
+class TraderFalso:
+    estado_conexao = 'pronto'
+
+    def __init__(self):
+        self.encerrado = False
+        self.abertas = 0
+
+    def ordens_em_aberto(self):
+        return self.abertas
+
+    def encerrar(self):
+        self.encerrado = True
+
+
+class SessaoFalsa:
+    def __init__(self, tenant):
+        self.tenant = tenant
+        self.trader = TraderFalso()
+        self.usado_em = 0
+        self.em_uso = 0
+
+    def ocupada(self):
+        return self.em_uso > 0 or self.trader.ordens_em_aberto() > 0
+
+    def encerrar(self):
+        self.trader.encerrar()
+
+
+def credenciais(n):
+    return {f"t{i}": (f"t{i}@x.com", 'senha') for i in range(n)}
+
+
+def test_shard_estavel_e_distribuido():
+    tenants = [f"conta-{i}" for i in range(2000)]
+    shards = [shard_do_tenant(t, 4) for t in tenants]
+    assert shards == [shard_do_tenant(t, 4) for t in tenants]
+    assert all(400 < n < 600 for n in Counter(shards).values())
+    assert all(shard_do_tenant(t, 1) == 0 for t in tenants[:10])
+
+    # um shard a mais só move tenants para o shard novo (~1/5 deles)
+    movidos = [t for t, s in zip(tenants, shards) if shard_do_tenant(t, 5) != s]
+    assert all(shard_do_tenant(t, 5) == 4 for t in movidos)
+    assert 300 < len(movidos) < 500
+
+
+def test_carregar_tenants(tmp_path):
+    arquivo = tmp_path / 'tenants.json'
+    arquivo.write_text(json.dumps({'cliente-1': {'email': 'a@x.com', 'senha': 's'}}))
+    assert carregar_tenants(arquivo) == {'cliente-1': ('a@x.com', 's')}
+
+    for invalido in ({'x y': {'email': 'a', 'senha': 's'}}, {TENANT_PADRAO: {'email': 'a', 'senha': 's'}},
+                     {'cliente-2': {'email': 'a'}}):
+        arquivo.write_text(json.dumps(invalido))
+        with pytest.raises(ValueError):
+            carregar_tenants(arquivo)
+
+
+def test_pool_lru_encerra_a_sessao_menos_usada():
+    abertas = []
+    pool = PoolTenants(lambda tenant, _: abertas.append(tenant) or SessaoFalsa(tenant), credenciais(5), max_sessoes=2)
+    t0, t1 = pool.obter('t0'), pool.obter('t1')
+    assert pool.obter('t0') is t0
+    pool.obter('t2')
+    assert t1.trader.encerrado and not t0.trader.encerrado
+    assert len(pool) == 2 and abertas == ['t0', 't1', 't2']
+    assert [s['tenant'] for s in pool.estado()['sessoes']] == ['t0', 't2']
+    assert pool.obter('t1') is not t1 and pool.encerradas == 2
+
+
+def test_pool_padrao_desconhecido_e_outro_shard():
+    padrao = SessaoFalsa(TENANT_PADRAO)
+    tenants = credenciais(20)
+    pool = PoolTenants(lambda tenant, _: SessaoFalsa(tenant), tenants, padrao=padrao, shard=0, shards=2)
+    assert pool.obter(TENANT_PADRAO) is padrao
+    with pytest.raises(TenantDesconhecido):
+        pool.obter('nao-existe')
+    fora = next(t for t in tenants if shard_do_tenant(t, 2) == 1)
+    with pytest.raises(TenantEmOutroShard) as erro:
+        pool.obter(fora)
+    assert erro.value.shard == 1
+    assert pool.estado()['tenants_neste_shard'] == sum(1 for t in tenants if shard_do_tenant(t, 2) == 0)
+
+
+def test_pool_abre_cada_tenant_uma_vez_sob_concorrencia():
+    aberturas = Counter()
+    liberar = threading.Event()
+
+    def abrir(tenant, _):
+        aberturas[tenant] += 1
+        liberar.wait(1)
+        return SessaoFalsa(tenant)
+
+    pool = PoolTenants(abrir, credenciais(1))
+    resultados = []
+    threads = [threading.Thread(target=lambda: resultados.append(pool.obter('t0'))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    liberar.set()
+    for thread in threads:
+        thread.join()
+    assert aberturas == {'t0': 1}
+    assert len({id(s) for s in resultados}) == 1
+
+
+def test_pool_nao_encerra_sessao_em_uso_ou_com_ordens_abertas():
+    pool = PoolTenants(lambda tenant, _: SessaoFalsa(tenant), credenciais(4), max_sessoes=1)
+    t0 = pool.obter('t0', reter=True)
+    t1 = pool.obter('t1')
+    # t0 está numa requisição e t1 acabou de abrir: o pool passa do limite até uma ficar livre
+    assert len(pool) == 2 and not t0.trader.encerrado and not t1.trader.encerrado
+    t1.trader.abertas = 1
+    pool.soltar(t0)
+    assert t0.trader.encerrado and not t1.trader.encerrado and len(pool) == 1
+    t1.trader.abertas = 0
+    pool.obter('t2')
+    assert t1.trader.encerrado and pool.encerradas == 2
+
+
+def test_pool_falha_ao_abrir_nao_deixa_lock_para_tras():
+    falhar = [True]
+
+    def abrir(tenant, _):
+        if falhar[0]:
+            raise RuntimeError("login recusado")
+        return SessaoFalsa(tenant)
+
+    pool = PoolTenants(abrir, credenciais(1))
+    with pytest.raises(RuntimeError):
+        pool.obter('t0')
+    assert pool._abrindo == {}
+    falhar[0] = False
+    assert pool.obter('t0').tenant == 't0' and pool._abrindo == {}
@@ -0,0 +1,122 @@
+import os
+os.environ.setdefault('IQ_SIMULATOR', 'true')
+
+import threading
+import time
+import pytest
+from API import trader as modulo_trader
+from API.simulador import SimuladorIQOption
+
+@pytest.fixture
+def novo_trader(monkeypatch, tmp_path):
+    monkeypatch.setenv('HISTORY_DB_PATH', str(tmp_path / 'historico.db'))
+    monkeypatch.setenv('CONNECT_RETRY_SECONDS', '0.05')
+    monkeypatch.setattr(modulo_trader, 'IQ_Option',
+                        lambda email, senha: SimuladorIQOption(email, senha, latencia='fixed:20', semente=1))
+    criados = []
+
+    def criar(**env):
+        for chave, valor in env.items():
+            monkeypatch.setenv(chave, valor)
+        modulo_trader.IQ_LOGIN_ATTEMPTED = False
+        t = modulo_trader.Trader()
+        criados.append(t)
+        return t
+
+    yield criar
+    for t in criados:
+        t.encerrar()
+
+def test_login_em_background_e_aquecimento(novo_trader, monkeypatch):
+    liberar = threading.Event()
+    retornou = threading.Event()
+    original = SimuladorIQOption.connect
+
+    def connect(self, sms_code=None):
+        # login travado até o teste liberar: o construtor não pode estar esperando por ele
+        liberar.wait(10)
+        try:
+            return original(self)
+        finally:
+            retornou.set()
+
+    monkeypatch.setattr(SimuladorIQOption, 'connect', connect)
+    inicio = time.perf_counter()
+    try:
+        t = novo_trader(WARMUP_CANDLES='EURUSD:1:10')
+        assert time.perf_counter() - inicio < 1.0
+        assert t.estado_conexao == 'conectando' and not t.pronto.is_set() and not retornou.is_set()
+        assert not t.status_conexao()['pronto']
+    finally:
+        liberar.set()
+    assert t.pronto.wait(2)
+    status = t.status_conexao()
+    assert status['pronto'] and status['estado'] == 'pronto' and status['tentativas'] == 1
+    # saldos, moeda e candles já estão em cache
+    assert t.estado_contas.obter('REAL')['moeda'] == 'USD'
+    assert t.cache_candles.estatisticas()['series'] == 1
+
+def test_tentativas_ate_conectar(novo_trader, monkeypatch):
+    falhas = {'restantes': 2}
+    original = SimuladorIQOption.connect
+
+    def connect(self, sms_code=None):
+        if falhas['restantes']:
+            falhas['restantes'] -= 1
+            return False, '{"code": "requests_limit_exceeded"}'
+        return original(self)
+
+    monkeypatch.setattr(SimuladorIQOption, 'connect', connect)
+    t = novo_trader()
+    assert t.pronto.wait(3)
+    assert t.tentativas_conexao == 3 and t.ultimo_erro is None
+
+def test_desiste_apos_maximo_de_tentativas(novo_trader, monkeypatch):
+    monkeypatch.setattr(SimuladorIQOption, 'connect', lambda self, sms_code=None: (False, 'invalid_credentials'))
+    t = novo_trader(CONNECT_MAX_ATTEMPTS='2')
+    t._conexao_thread.join(2)
+    status = t.status_conexao()
+    assert status['estado'] == 'falha' and not status['pronto']
+    assert status['tentativas'] == 2 and status['ultimo_erro'] == 'invalid_credentials'
+
+def test_queda_do_websocket_reconecta_em_background(novo_trader, monkeypatch):
+    # checagem periódica desligada: a queda só pode ser percebida pelo on_close do websocket
+    t = novo_trader(KEEPALIVE_SECONDS='3600')
+    assert t.pronto.wait(2)
+    iniciados = []
+    monkeypatch.setattr(t.stream_candles.fonte, 'iniciar_stream_candles', lambda a, n: iniciados.append((a, n)))
+    t.stream_candles._assinaturas[('EURUSD', 1)] = {'clientes': {object()}, 'parar': None}
+
+    t.api.derrubar_conexao()
+    assert t.estado_conexao == 'reconectando' and not t.pronto.is_set()
+    assert t.pronto.wait(2)
+    status = t.status_conexao()
+    assert status['pronto'] and status['reconexoes'] == 1
+    assert iniciados == [('EURUSD', 60)]
+
+def test_trade_durante_reconexao_aguarda_a_sessao(novo_trader, monkeypatch):
+    t = novo_trader(KEEPALIVE_SECONDS='3600', CONNECT_RETRY_SECONDS='0.1')
+    assert t.pronto.wait(2)
+    falhas = {'restantes': 1}
+    original = SimuladorIQOption.connect
+
+    def connect(self, sms_code=None):
+        if falhas['restantes']:
+            falhas['restantes'] -= 1
+            return False, 'timeout'
+        return original(self)
+
+    monkeypatch.setattr(SimuladorIQOption, 'connect', connect)
+    t.api.derrubar_conexao()
+    check, order_id = t.comprar_ativo('EURUSD', 1, 'call', 1, 'PRACTICE')
+    assert check and order_id
+    assert t.reconexoes == 1
+
+def test_trade_falha_se_a_sessao_nao_volta_no_prazo(novo_trader, monkeypatch):
+    t = novo_trader(KEEPALIVE_SECONDS='3600', RECONNECT_TRADE_WAIT_SECONDS='0.1')
+    assert t.pronto.wait(2)
+    monkeypatch.setattr(SimuladorIQOption, 'connect', lambda self, sms_code=None: (False, 'timeout'))
+    t.api.derrubar_conexao()
+    inicio = time.perf_counter()
+    assert t.comprar_ativo('EURUSD', 1, 'call', 1, 'PRACTICE') == (False, None)
+    assert time.perf_counter() - inicio < 1
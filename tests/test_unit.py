@@ -2,6 +2,7 @@
 import pytest
 from API.gerenciamento import GerenciadorMultiConta
 
+
 def test_entrada_padrao():
     config = {'entrada_padrao': 10.0, 'limite_maximo': 20.0}
     gerenciador = GerenciadorMultiConta(config)
@@ -9,6 +10,7 @@ def test_entrada_padrao():
     valor = gerenciador.get_proxima_entrada('PRACTICE', banca)
     assert valor == 100.0  # 10% de 1000
 
+
 def test_entrada_customizada():
     config = {'entrada_padrao': 10.0, 'limite_maximo': 20.0}
     gerenciador = GerenciadorMultiConta(config)
@@ -16,6 +18,7 @@ def test_entrada_customizada():
     valor = gerenciador.get_proxima_entrada('PRACTICE', banca, 15)
     assert valor == 150.0  # 15% de 1000
 
+
 def test_entrada_limite():
     config = {'entrada_padrao': 10.0, 'limite_maximo': 20.0}
     gerenciador = GerenciadorMultiConta(config)
@@ -23,6 +26,7 @@ def test_entrada_limite():
     valor = gerenciador.get_proxima_entrada('PRACTICE', banca, 20)
     assert valor == 200.0  # 20% de 1000
 
+
 def test_entrada_acima_limite():
     config = {'entrada_padrao': 10.0, 'limite_maximo': 20.0}
     gerenciador = GerenciadorMultiConta(config)
@@ -30,9 +34,52 @@ def test_entrada_acima_limite():
     valor = gerenciador.get_proxima_entrada('PRACTICE', banca, 50)
     assert valor == 200.0  # Limite de 20% de 1000
 
+
 def test_entrada_minima():
     config = {'entrada_padrao': 10.0, 'limite_maximo': 20.0}
     gerenciador = GerenciadorMultiConta(config)
     banca = 10
     valor = gerenciador.get_proxima_entrada('PRACTICE', banca)
-    assert valor == 2.0  # 10% de 10 seria 1, mas mínimo é 2 
\ No newline at end of file
+    assert valor == 2.0  # 10% de 10 seria 1, mas mínimo é 2
+
+
+def test_estatisticas_incrementais():
+    gerenciador = GerenciadorMultiConta({'entrada_padrao': 10.0, 'limite_maximo': 20.0})
+    for lucro in [8.5, 8.5, -10, -10, -10, 0, 8.5]:
+        gerenciador.registrar_resultado('PRACTICE', lucro)
+    estado = gerenciador.get_estatisticas('PRACTICE')
+    assert estado['total_wins'] == 3
+    assert estado['total_losses'] == 3
+    assert estado['total_empates'] == 1
+    assert estado['winrate'] == 50.0
+    assert estado['sequencia_atual'] == 1
+    assert estado['maior_sequencia_wins'] == 2
+    assert estado['maior_sequencia_losses'] == 3
+    assert estado['lucro_total'] == -4.5
+    assert estado['drawdown_maximo'] == 30.0  # pico 17 -> vale -13
+    assert estado['drawdown_atual'] == 21.5
+
+
+def test_estatisticas_isoladas_e_reset():
+    gerenciador = GerenciadorMultiConta({'entrada_padrao': 10.0, 'limite_maximo': 20.0})
+    gerenciador.registrar_resultado('REAL', 5)
+    gerenciador.registrar_resultado('PRACTICE', -5)
+    assert gerenciador.get_estatisticas('REAL')['total_wins'] == 1
+    assert gerenciador.get_estatisticas('PRACTICE')['total_wins'] == 0
+    gerenciador.resetar_estatisticas('REAL')
+    assert gerenciador.get_estatisticas('REAL')['total_wins'] == 0
+    assert gerenciador.get_estatisticas('PRACTICE')['total_losses'] == 1
+
+
+def test_estatisticas_compartilhadas_entre_workers(tmp_path):
+    caminho = str(tmp_path / 'historico.db')
+    config = {'entrada_padrao': 10.0, 'limite_maximo': 20.0}
+    a = GerenciadorMultiConta(config, caminho=caminho, tenant='t1')
+    b = GerenciadorMultiConta(config, caminho=caminho, tenant='t1')
+    outro = GerenciadorMultiConta(config, caminho=caminho, tenant='t2')
+    a.registrar_resultado('REAL', 5)
+    b.registrar_resultado('REAL', -3)
+    assert a.get_estatisticas('REAL')['lucro_total'] == 2 and b.get_estatisticas('REAL')['sequencia_atual'] == -1
+    assert outro.get_estatisticas('REAL')['total_wins'] == 0
+    b.resetar_estatisticas('REAL')
+    assert a.get_estatisticas('REAL')['total_losses'] == 0